@@ -2,4 +2,9 @@ from django.apps import AppConfig
 
 class DiscourseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'discourse'
\ No newline at end of file
+    name = 'discourse'
+
+    def ready(self):
+        # модель/онтология/лексиконды алдын ала жүктеу (POLISENT_WARMUP); /ready осыны күтеді
+        from .warmup import start_warmup
+        start_warmup()
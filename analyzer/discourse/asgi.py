@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'discourse.settings')
+# талдау endpoint-терінің async нұсқалары (шектеулі inference пулы, 429/503 backpressure)
+os.environ.setdefault('POLISENT_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -0,0 +1,185 @@
+# analyzer/discourse/bench.py
+"""
+Анализ конвейерінің кезеңдік микро-бенчмарктары (`manage.py benchmark`).
+
+Мәтіндер discourse_data.json-нан алынады, ұзын сөз/пікірсайыс синтетикалық түрде
+солардан құралады (seed тұрақты – жүгірістер салыстырмалы). Әр кезең бірнеше рет
+өлшенеді; нәтиже – JSON (median/min/mean/p95, мс), оны сақталған baseline-мен
+салыстырып, баяулаған кезеңдер белгіленеді.
+"""
+import json
+import platform
+import random
+import statistics
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+DATA_PATH = Path(__file__).resolve().parent / "discourse_data.json"
+SPEAKERS = ["Асқар", "Берік", "Модератор"]
+
+
+class Stage(NamedTuple):
+    name: str
+    run: Callable[[], object]
+    setup: Optional[Callable[[], None]] = None   # әр қайталау алдында, уақытқа кірмейді
+    items: int = 1                                # бір жүгірістегі мәтін/құжат саны
+
+
+class Skip(Exception):
+    """Кезеңге керек ресурс жоқ (модель, rdflib т.б.) – нәтижеде себебімен көрсетіледі."""
+
+
+def load_texts(path=DATA_PATH) -> List[str]:
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    return [str(row["Мағынасы"]) for rows in data.values() for row in rows
+            if isinstance(row, dict) and row.get("Мағынасы")]
+
+
+def make_corpus(n_texts: int = 200, speech_sentences: int = 2000, debate_turns: int = 400,
+                seed: int = 13) -> Dict:
+    rnd = random.Random(seed)
+    texts = load_texts()
+    sents = [s.strip() for t in texts for s in t.split(".") if len(s.strip()) > 20]
+    debate = "\n".join(f"{SPEAKERS[i % len(SPEAKERS)]}: {rnd.choice(sents)}."
+                       + (" Бұл дұрыс емес?" if i % 5 == 0 else "")
+                       for i in range(debate_turns))
+    return {
+        "texts": rnd.sample(texts, min(n_texts, len(texts))),
+        "speech": " ".join(rnd.choice(sents) + "." for _ in range(speech_sentences)),
+        "debate": debate,
+    }
+
+
+def build_stages(corpus: Dict) -> List[Stage]:
+    from . import views
+    from .campaign_onto_rules import detect_regex
+    from .debate_rules import analyze_debate
+    from .onto_runtime import build_ontology, load_graph, match_text_with_ontology
+    from .pd_analyzer import build_index_from_json, score_text
+    from .speech_rules import analyze_speech
+
+    texts = corpus["texts"]
+    index = build_index_from_json(views.PD_JSON_PATH)
+
+    def each(fn):
+        return lambda: [fn(t) for t in texts]
+
+    def onto_graph():
+        try:
+            import rdflib  # noqa: F401
+        except ImportError:
+            raise Skip("rdflib орнатылмаған")
+        load_graph.cache_clear()
+        return load_graph()
+
+    def zero_shot():
+        try:
+            engine = views.get_nli_engine()
+        except Exception as e:
+            raise Skip(f"NLI моделі жүктелмеді: {str(e).splitlines()[0] if str(e) else type(e).__name__}")
+        d = views.FORM_DEFAULTS
+        tasks = [views.base_task(t, d["domain"], d["source"], d["task"]) for t in texts[:16]]
+        return lambda: engine.classify(tasks)
+
+    def cascade():
+        model = views.get_cascade()
+        if model is None:
+            raise Skip("каскад артефакты жоқ (manage.py train_cascade)")
+        return each(model.classify)
+
+    stages = [
+        Stage("lexicon.build_index", lambda: build_index_from_json(views.PD_JSON_PATH)),
+        Stage("lexicon.score_text", each(lambda t: score_text(t, index)), items=len(texts)),
+        Stage("onto.load_graph", onto_graph),
+        Stage("onto.build_label_index", build_ontology),   # snapshot + Aho-Corasick (реестр builder-і)
+        Stage("onto.match_text", each(match_text_with_ontology), items=len(texts)),
+        Stage("regex.detect", each(detect_regex), items=len(texts)),
+        Stage("regex.detect_long", lambda: detect_regex(corpus["speech"])),
+        Stage("speech.analyze_long", lambda: analyze_speech(corpus["speech"])),
+        Stage("debate.analyze_long", lambda: analyze_debate(corpus["debate"])),
+        Stage("fallback", each(lambda t: views._fallback(t, "emotion")), items=len(texts)),
+    ]
+    try:
+        stages.append(Stage("zero_shot.classify", zero_shot(), items=16))
+    except Skip as e:
+        stages.append(Stage("zero_shot.classify", _raiser(e)))
+    try:
+        stages.append(Stage("cascade.classify", cascade(), items=len(texts)))
+    except Skip as e:
+        stages.append(Stage("cascade.classify", _raiser(e)))
+    return stages
+
+
+def _raiser(exc):
+    def run():
+        raise exc
+    return run
+
+
+def time_stage(stage: Stage, repeat: int = 5, warmup: int = 1) -> Dict:
+    try:
+        for _ in range(warmup):
+            if stage.setup:
+                stage.setup()
+            stage.run()
+    except Skip as e:
+        return {"skipped": str(e)}
+    samples = []
+    for _ in range(repeat):
+        if stage.setup:
+            stage.setup()
+        t0 = time.perf_counter()
+        stage.run()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    samples.sort()
+    median = statistics.median(samples)
+    return {
+        "median_ms": round(median, 3),
+        "min_ms": round(samples[0], 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))], 3),
+        "repeat": repeat,
+        "items": stage.items,
+        "per_item_ms": round(median / max(1, stage.items), 4),
+    }
+
+
+def run_suite(stages: List[Stage], repeat: int = 5, only: Optional[List[str]] = None,
+              on_stage: Optional[Callable[[str, Dict], None]] = None) -> Dict:
+    results = {}
+    for stage in stages:
+        if only and not any(o in stage.name for o in only):
+            continue
+        results[stage.name] = time_stage(stage, repeat=repeat)
+        if on_stage:
+            on_stage(stage.name, results[stage.name])
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "node": platform.node(),
+            "repeat": repeat,
+        },
+        "stages": results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = 0.2, min_delta_ms: float = 1.0) -> Dict:
+    """median бойынша: threshold-тан көп және min_delta_ms-тен үлкен баяулау – регрессия."""
+    rows, regressions, improvements = {}, [], []
+    base_stages = baseline.get("stages", {})
+    for name, cur in current.get("stages", {}).items():
+        base = base_stages.get(name)
+        if not base or "median_ms" not in base or "median_ms" not in cur:
+            continue
+        b, c = base["median_ms"], cur["median_ms"]
+        ratio = c / b if b else float("inf")
+        rows[name] = {"baseline_ms": b, "current_ms": c, "ratio": round(ratio, 3)}
+        if c - b > min_delta_ms and ratio > 1 + threshold:
+            regressions.append(name)
+        elif b - c > min_delta_ms and ratio < 1 - threshold:
+            improvements.append(name)
+    return {"stages": rows, "regressions": regressions, "improvements": improvements,
+            "same_node": baseline.get("meta", {}).get("node") == current.get("meta", {}).get("node")}
@@ -1,7 +1,12 @@
+import logging
+import os
 import re
 from functools import lru_cache
 from typing import List, Dict
 from .onto_runtime import match_text_with_ontology
+from .metrics import inc
+
+logger = logging.getLogger(__name__)
 
 # Қысқа домендік regex триггерлер (ереже)
 REGEX_RULES = {
@@ -36,23 +41,68 @@ REGEX_RULES = {
     ],
 }
 
+# --- Біріктірілген сканер: барлық ереже бір өрнекте, бір өтуде
+# `.*`/`.+` шексіз аралықтары жол ішінде RX_MAX_GAP таңбамен шектеледі (backtracking қорғанысы)
+RX_MAX_GAP = int(os.getenv("POLISENT_RX_MAX_GAP", "200"))
+# "re" (әдепкі) немесе "regex" (PyPI regex орнатылған болса; RX_TIMEOUT секундтық шек қолданылады)
+RX_BACKEND = os.getenv("POLISENT_RX_BACKEND", "re")
+RX_TIMEOUT = float(os.getenv("POLISENT_RX_TIMEOUT", "1.0"))
+
+_UNBOUNDED_DOT = re.compile(r"(?<!\\)\.([*+])")
+
+def _bounded(pattern: str) -> str:
+    return _UNBOUNDED_DOT.sub(
+        lambda m: "[^\\n]{%d,%d}" % (0 if m.group(1) == "*" else 1, RX_MAX_GAP), pattern)
+
+def _rx_engine():
+    if RX_BACKEND == "regex":
+        try:
+            import regex
+            return regex
+        except ImportError:
+            pass
+    return re
+
 @lru_cache(maxsize=1)
-def _compiled():
-    import re
-    flags = re.I | re.U
-    return {k:[re.compile(p, flags) for p in ps] for k,ps in REGEX_RULES.items()}
+def _scanner():
+    """
+    Өрнек: (?=p0|p1|…) – кемі бір ереже басталатын позицияны табады,
+    содан кейін әр ереже (?=(?P<rI>pI))| түрінде сол позицияда тексеріледі.
+    Әр ереженің жеке finditer нәтижесі (қабаттаспау) detect_regex-те қалпына келтіріледі.
+    """
+    rules = [(device, pat) for device, pats in REGEX_RULES.items() for pat in pats]
+    bodies = [_bounded(p) for _, p in rules]
+    prefilter = "|".join(f"(?:{b})" for b in bodies)
+    probes = "".join(f"(?:(?=(?P<r{i}>{b}))|)" for i, b in enumerate(bodies))
+    engine = _rx_engine()
+    rx = engine.compile(f"(?=(?:{prefilter})){probes}", engine.I | engine.U)
+    groups = [rx.groupindex[f"r{i}"] for i in range(len(rules))]
+    return rules, rx, groups, engine is not re
 
 def detect_regex(text: str) -> List[dict]:
+    rules, rx, groups, timed = _scanner()
+    found = [[] for _ in rules]
+    last_end = [0] * len(rules)
+    kw = {"timeout": RX_TIMEOUT} if timed else {}
+    try:
+        for m in rx.finditer(text, **kw):
+            for i, g in enumerate(groups):
+                s, e = m.span(g)
+                if s >= 0 and s >= last_end[i]:
+                    found[i].append((s, e))
+                    last_end[i] = e
+    except TimeoutError:
+        logger.warning("detect_regex: regex timeout, ішінара нәтиже")
+        inc("polisent_errors_total", stage="regex_timeout")
     hits = []
-    for device, regs in _compiled().items():
-        for rx in regs:
-            for m in rx.finditer(text):
-                hits.append({
-                    "device": device,
-                    "pattern": rx.pattern,
-                    "match": m.group(0),
-                    "span": [m.start(), m.end()],
-                })
+    for (device, pattern), spans in zip(rules, found):
+        for s, e in spans:
+            hits.append({
+                "device": device,
+                "pattern": pattern,
+                "match": text[s:e],
+                "span": [s, e],
+            })
     return hits
 
 def summarize_devices(hits: List[dict], onto_hits: List[dict]) -> Dict[str,int]:
@@ -84,10 +134,10 @@ def polarity_prior_from_onto(onto_hits: List[dict]) -> str|None:
     if "бейтарап" in pols: return "бейтарап"
     return None
 
-def detect_campaign_with_ontology(text: str) -> dict:
-    """EREJE + ONTO: матчтар, device санағы, полярлық приор."""
-    rx_hits   = detect_regex(text)
-    onto_hits = match_text_with_ontology(text)
+def detect_campaign_with_ontology(text: str, ctx=None) -> dict:
+    """EREJE + ONTO: матчтар, device санағы, полярлық приор (ctx – ортақ DocContext)."""
+    rx_hits   = ctx.rx_hits if ctx is not None else detect_regex(text)
+    onto_hits = ctx.onto_hits if ctx is not None else match_text_with_ontology(text)
     dev_count = summarize_devices(rx_hits, onto_hits)
     rule_pred = rule_sentiment_emotion(dev_count)
     onto_prior = polarity_prior_from_onto(onto_hits)
@@ -0,0 +1,201 @@
+# analyzer/discourse/cascade.py
+"""
+Тактика үшін арзан-алдымен каскад: hashed n-gram белгілері + softmax регрессия (тек numpy).
+
+`manage.py train_cascade` discourse_data.json-дағы белгіленген терминдерден (flag == 1)
+модель үйретіп, .npz артефакт сақтайды (салмақтар + JSON meta: нұсқа, дерек хэші,
+holdout метрикалары, ұсынылған шек). Runtime-та модель сенімділігі шектен жоғары болса,
+тактика жауабы осы жерден беріледі; қалғандары ғана XNLI zero-shot-қа жіберіледі.
+
+  POLISENT_CASCADE            auto (артефакт болса қосулы) | on | off
+  POLISENT_CASCADE_PATH       артефакт жолы (әдепкі data/tactic_cascade.npz)
+  POLISENT_CASCADE_THRESHOLD  сенімділік шегі (әдепкі – артефакттағы ұсыныс)
+"""
+import hashlib
+import json
+import re
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+FORMAT = 1
+WORD_RE = re.compile(r"\w+", re.U)
+
+
+class HashedFeaturizer:
+    """Сөз (1..word_n) және сөз ішіндегі таңба (char_min..char_max) n-грамдары -> таңбалы hash, log(1+tf), L2."""
+
+    def __init__(self, n_features: int = 1 << 18, word_n: int = 2, char_min: int = 3, char_max: int = 5):
+        self.n_features = n_features
+        self.word_n = word_n
+        self.char_min = char_min
+        self.char_max = char_max
+
+    def config(self) -> Dict:
+        return {"n_features": self.n_features, "word_n": self.word_n,
+                "char_min": self.char_min, "char_max": self.char_max}
+
+    def grams(self, text: str) -> Counter:
+        words = WORD_RE.findall(text.lower())
+        c: Counter = Counter()
+        for n in range(1, self.word_n + 1):
+            for i in range(len(words) - n + 1):
+                c["w:" + " ".join(words[i:i + n])] += 1
+        for w in words:
+            padded = f" {w} "
+            for n in range(self.char_min, self.char_max + 1):
+                for i in range(len(padded) - n + 1):
+                    c["c:" + padded[i:i + n]] += 1
+        return c
+
+    def transform(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(индекстер, мәндер) – сирек вектор; crc32 процестер арасында тұрақты (hash() емес)."""
+        acc: Dict[int, float] = {}
+        for g, n in self.grams(text).items():
+            h = zlib.crc32(g.encode("utf-8"))
+            idx = h % self.n_features
+            sign = 1.0 if (h >> 31) & 1 else -1.0
+            acc[idx] = acc.get(idx, 0.0) + sign * np.log1p(n)
+        if not acc:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        idx = np.fromiter(acc.keys(), dtype=np.int64, count=len(acc))
+        val = np.fromiter(acc.values(), dtype=np.float32, count=len(acc))
+        norm = float(np.linalg.norm(val))
+        return idx, (val / norm if norm else val)
+
+
+def load_tactic_dataset(path) -> Tuple[List[str], List[Tuple[str, List[str]]]]:
+    """discourse_data.json -> (тактикалар, [(термин. мағынасы, [тактикалар flag==1])])."""
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    tactics = [str(k) for k in data.keys()]
+    rows: Dict[object, Dict] = {}
+    for tactic, items in data.items():
+        for row in items or []:
+            if not isinstance(row, dict) or "№" not in row:
+                continue
+            flag = next((v for k, v in row.items() if k not in ("№", "Терминдер", "Мағынасы")), None)
+            entry = rows.setdefault(row["№"], {"term": str(row.get("Терминдер", "")).strip(),
+                                              "mean": str(row.get("Мағынасы") or "").strip(), "tactics": []})
+            if flag == 1:
+                entry["tactics"].append(str(tactic))
+    out = []
+    for e in rows.values():
+        if e["tactics"]:
+            text = f"{e['term']}. {e['mean']}" if e["mean"] else e["term"]
+            out.append((text, e["tactics"]))
+    return tactics, out
+
+
+def _softmax(z: np.ndarray) -> np.ndarray:
+    z = z - z.max(axis=-1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+class CascadeModel:
+    def __init__(self, labels: Sequence[str], W: np.ndarray, b: np.ndarray,
+                 featurizer: HashedFeaturizer, meta: Optional[Dict] = None):
+        self.labels = list(labels)
+        self.W = W
+        self.b = b
+        self.featurizer = featurizer
+        self.meta = meta or {}
+
+    @property
+    def version(self) -> str:
+        return self.meta.get("version", "")
+
+    def logits(self, feats: Tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+        idx, val = feats
+        return val @ self.W[idx] + self.b if len(idx) else self.b.copy()
+
+    def predict_proba(self, text: str) -> np.ndarray:
+        return _softmax(self.logits(self.featurizer.transform(text)))
+
+    def classify(self, text: str) -> Dict:
+        p = self.predict_proba(text)
+        top = list(reversed(p.argsort(kind="stable")))
+        return {"labels": [self.labels[i] for i in top], "scores": [float(p[i]) for i in top]}
+
+    # --- үйрету
+    @classmethod
+    def train(cls, texts: Sequence[str], targets: Sequence[Sequence[str]], labels: Sequence[str],
+              featurizer: HashedFeaturizer, epochs: int = 30, lr: float = 0.5, l2: float = 1e-5,
+              seed: int = 13) -> "CascadeModel":
+        """Мини-batch-сіз SGD (сирек жаңарту); бірнеше тактикалы мысалдың мақсаты – тең үлестірім."""
+        labels = list(labels)
+        K, D = len(labels), featurizer.n_features
+        X = [featurizer.transform(t) for t in texts]
+        Y = np.zeros((len(texts), K), dtype=np.float32)
+        for i, tg in enumerate(targets):
+            for t in tg:
+                Y[i, labels.index(t)] = 1.0 / len(tg)
+        W = np.zeros((D, K), dtype=np.float32)
+        b = np.zeros(K, dtype=np.float32)
+        rnd = np.random.default_rng(seed)
+        for epoch in range(epochs):
+            step = lr / (1.0 + epoch * 0.1)
+            for i in rnd.permutation(len(X)):
+                idx, val = X[i]
+                p = _softmax(val @ W[idx] + b if len(idx) else b)
+                g = p - Y[i]
+                W[idx] -= step * (np.outer(val, g) + l2 * W[idx])
+                b -= step * g
+        return cls(labels, W, b, featurizer)
+
+    # --- артефакт
+    def save(self, path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = dict(self.meta)
+        meta.update({"format": FORMAT, "labels": self.labels, "featurizer": self.featurizer.config()})
+        h = hashlib.sha256(self.W.tobytes())
+        h.update(self.b.tobytes())
+        meta.setdefault("created", time.strftime("%Y-%m-%dT%H:%M:%S"))
+        meta["version"] = f"{meta['created'][:10]}-{h.hexdigest()[:12]}"
+        self.meta = meta
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez_compressed(tmp, W=self.W.astype(np.float16), b=self.b,
+                            meta=np.frombuffer(json.dumps(meta, ensure_ascii=False).encode("utf-8"), dtype=np.uint8))
+        tmp.replace(path)
+        return path
+
+    @classmethod
+    def load(cls, path) -> "CascadeModel":
+        with np.load(str(path), allow_pickle=False) as z:
+            meta = json.loads(bytes(z["meta"]).decode("utf-8"))
+            if meta.get("format") != FORMAT:
+                raise ValueError(f"Cascade артефакт форматы {meta.get('format')}, күтілгені {FORMAT}")
+            W = z["W"].astype(np.float32)
+            b = z["b"].astype(np.float32)
+        return cls(meta["labels"], W, b, HashedFeaturizer(**meta["featurizer"]), meta)
+
+
+THRESHOLDS = tuple(round(0.3 + 0.05 * i, 2) for i in range(14))   # 0.30 .. 0.95
+
+
+def threshold_table(model: CascadeModel, texts: Sequence[str], targets: Sequence[Sequence[str]],
+                    thresholds: Sequence[float] = THRESHOLDS) -> List[Dict]:
+    """Әр шек үшін: қамту (жауап берілген үлес) және сол жауаптардың дәлдігі (top-1 ∈ мақсаттар)."""
+    preds = [model.classify(t) for t in texts]
+    table = []
+    for th in thresholds:
+        answered = [(p, tg) for p, tg in zip(preds, targets) if p["scores"][0] >= th]
+        correct = sum(p["labels"][0] in tg for p, tg in answered)
+        table.append({"threshold": th, "coverage": len(answered) / max(1, len(texts)),
+                      "precision": correct / len(answered) if answered else None})
+    return table
+
+
+def pick_threshold(table: List[Dict], target_precision: float, min_answered: int = 5,
+                   n: int = 0, default: float = 0.8) -> float:
+    """Дәлдігі target_precision-нан кем емес ең төмен шек (жауаптар саны тым аз болса – есепке алынбайды)."""
+    for row in table:
+        if row["precision"] is not None and row["precision"] >= target_precision \
+                and row["coverage"] * n >= min_answered:
+            return row["threshold"]
+    return default
@@ -0,0 +1,206 @@
+# analyzer/discourse/columnar.py
+"""
+Пакеттік нәтижелерді бағаналы кестелерге жазу (Parquet немесе Arrow IPC).
+
+Кірістірілген нәтиже (speech.items[].targets[], debate.turns[].mentions[], campaign.hits.*)
+қалыпты кестелерге жазықталады, барлығы doc_id арқылы байланысады:
+
+  documents   – құжаттың қорытынды белгісі/тактикасы/қатесі, индекс нұсқалары
+  segments    – speech сөйлемдері мен debate репликалары (seg – құжат ішіндегі реті)
+  mentions    – онтология сәйкестіктері (seg бос – құжат деңгейі, campaign)
+  regex_hits  – campaign regex ережелерінің сәйкестіктері
+  stance      – нысана (speech.stance) және спикер (debate.by_speaker) бойынша жиынтық
+
+IRI, белгі, kind сияқты қайталанатын бағаналар dictionary-encoded (Arrow dictionary типі).
+Файлдар <output>/<кесте>/part-NNNNN.<parquet|arrow> – әр flush() бір part; директория
+pyarrow.dataset / DuckDB / pandas арқылы бүтін кесте ретінде оқылады. Тоқтап қалған жұмыс
+truncate(n) арқылы соңғы checkpoint-тегі part-қа дейін қайтарылады.
+
+flatten() pyarrow-сыз жұмыс істейді; жазу үшін pyarrow керек (міндетті емес тәуелділік).
+"""
+from pathlib import Path
+from typing import Dict, List, Optional
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+# бағана типтері: str, dict (dictionary-encoded жол), f32, i32, i64, bool, list_dict
+TABLES = {
+    "documents": [
+        ("doc_id", "str"), ("index", "i64"), ("domain", "dict"), ("source", "dict"), ("task", "dict"),
+        ("kind", "dict"), ("label", "dict"), ("score", "f32"),
+        ("tactic", "dict"), ("tactic_score", "f32"), ("tactic_source", "dict"),
+        ("onto_prior", "dict"), ("fused_label", "dict"), ("fused_score", "f32"),
+        ("warning", "str"), ("error", "str"), ("ontology_version", "dict"), ("lexicon_version", "dict"),
+    ],
+    "segments": [
+        ("doc_id", "str"), ("seg", "i32"), ("kind", "dict"), ("speaker", "dict"), ("start", "i32"), ("end", "i32"),
+        ("text", "str"), ("sentiment", "dict"), ("score", "f32"), ("address", "dict"),
+        ("attack", "bool"), ("question", "bool"), ("defend", "bool"), ("concede", "bool"),
+    ],
+    "mentions": [
+        ("doc_id", "str"), ("seg", "i32"), ("source", "dict"), ("start", "i32"), ("end", "i32"), ("match", "str"),
+        ("iri", "dict"), ("label", "dict"), ("kind", "dict"), ("class", "dict"),
+        ("devices", "list_dict"), ("polarity", "dict"), ("domain", "list_dict"),
+    ],
+    "regex_hits": [
+        ("doc_id", "str"), ("device", "dict"), ("pattern", "dict"), ("start", "i32"), ("end", "i32"), ("match", "str"),
+    ],
+    "stance": [
+        ("doc_id", "str"), ("scope", "dict"), ("key", "dict"), ("kind", "dict"), ("label", "dict"),
+        ("pos", "i32"), ("neg", "i32"), ("neutral", "i32"),
+    ],
+}
+
+
+def _span(h):
+    s = h.get("span") or (None, None)
+    return s[0], s[1]
+
+
+def _mention(doc_id, seg, source, h) -> dict:
+    start, end = _span(h)
+    labels = h.get("labels") or []
+    return {
+        "doc_id": doc_id, "seg": seg, "source": source, "start": start, "end": end, "match": h.get("match"),
+        "iri": h.get("iri") or h.get("inst"), "label": labels[0] if labels else None,
+        "kind": h.get("kind"), "class": h.get("class"),
+        "devices": h.get("onto_devices") or [], "polarity": h.get("onto_polarity"),
+        "domain": h.get("onto_domain") or [],
+    }
+
+
+def flatten(row: dict) -> Dict[str, List[dict]]:
+    """analyze_corpus жолы ({"index", "id", "domain"?, "source"?, "task"?, "result"|"error"|"errors"}) -> {кесте: [жол, ...]}."""
+    out: Dict[str, List[dict]] = {name: [] for name in TABLES}
+    doc_id = str(row.get("id", row.get("index")))
+    r = row.get("result") or {}
+    error = row.get("error") or (str(row["errors"]) if row.get("errors") else None)
+    tz = r.get("tactic_zero_shot") or {}
+    camp = r.get("campaign") or {}
+    versions = r.get("index_versions") or {}
+    kind = next((k for k in ("campaign", "speech", "debate") if k in r), "base" if r else None)
+    out["documents"].append({
+        "doc_id": doc_id, "index": row.get("index"),
+        "domain": row.get("domain"), "source": row.get("source"), "task": row.get("task"),
+        "kind": kind, "label": r.get("label"), "score": r.get("score"),
+        "tactic": tz.get("label"), "tactic_score": tz.get("score"), "tactic_source": tz.get("source"),
+        "onto_prior": camp.get("onto_prior"), "fused_label": (camp.get("fused") or {}).get("label"),
+        "fused_score": (camp.get("fused") or {}).get("score"),
+        "warning": r.get("warning"), "error": error,
+        "ontology_version": versions.get("ontology"), "lexicon_version": versions.get("lexicon"),
+    })
+
+    sp = r.get("speech")
+    if sp:
+        for i, it in enumerate(sp.get("items", [])):
+            start, end = _span(it)
+            out["segments"].append({
+                "doc_id": doc_id, "seg": i, "kind": "sentence", "speaker": None, "start": start, "end": end,
+                "text": it.get("text"), "sentiment": it.get("sentiment"), "score": it.get("score"),
+                "address": it.get("address"),
+            })
+            out["mentions"].extend(_mention(doc_id, i, "speech", h) for h in it.get("targets", []))
+        for st in sp.get("stance", []):
+            votes = st.get("votes") or {}
+            out["stance"].append({"doc_id": doc_id, "scope": "target", "key": st.get("iri"), "kind": st.get("kind"),
+                                  "label": st.get("label"), "pos": votes.get("pos"), "neg": votes.get("neg")})
+
+    db = r.get("debate")
+    if db:
+        for i, t in enumerate(db.get("turns", [])):
+            flags = t.get("flags") or {}
+            start, end = _span(t)
+            out["segments"].append({
+                "doc_id": doc_id, "seg": i, "kind": "turn", "speaker": t.get("speaker"), "start": start, "end": end,
+                "text": t.get("text"), "sentiment": t.get("sentiment"), "score": t.get("score"),
+                **{f: flags.get(f) for f in ("attack", "question", "defend", "concede")},
+            })
+            out["mentions"].extend(_mention(doc_id, i, "debate", h) for h in t.get("mentions", []))
+        for speaker, c in (db.get("by_speaker") or {}).items():
+            pos, neg, neu = c.get("оң", 0), c.get("теріс", 0), c.get("бейтарап", 0)
+            label = max((("теріс", neg), ("оң", pos), ("бейтарап", neu)), key=lambda x: x[1])[0] if pos or neg or neu else None
+            out["stance"].append({"doc_id": doc_id, "scope": "speaker", "key": speaker, "label": label,
+                                  "pos": pos, "neg": neg, "neutral": neu})
+
+    if camp:
+        hits = camp.get("hits") or {}
+        for h in hits.get("regex", []):
+            start, end = _span(h)
+            out["regex_hits"].append({"doc_id": doc_id, "device": h.get("device"), "pattern": h.get("pattern"),
+                                      "start": start, "end": end, "match": h.get("match")})
+        out["mentions"].extend(_mention(doc_id, None, "campaign", h) for h in hits.get("ontology", []))
+    return out
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError(f"Parquet/Arrow шығысы үшін pyarrow керек (pip install pyarrow): {e}") from e
+    return pyarrow
+
+
+def arrow_schema(table: str):
+    pa = _require_pyarrow()
+    dict_str = pa.dictionary(pa.int32(), pa.string())
+    types = {"str": pa.string(), "dict": dict_str, "f32": pa.float32(), "i32": pa.int32(), "i64": pa.int64(),
+             "bool": pa.bool_(), "list_dict": pa.list_(dict_str)}
+    return pa.schema([(name, types[t]) for name, t in TABLES[table]])
+
+
+class ColumnarWriter:
+    """Жолдарды жадта жинап, flush() сайын әр кестеге бір part файлын жазады."""
+
+    def __init__(self, root, fmt: str = "parquet", compression: str = "zstd"):
+        if fmt not in FORMATS:
+            raise ValueError(f"Белгісіз формат: {fmt} (күтілгені: {', '.join(FORMATS)})")
+        _require_pyarrow()
+        self.root = Path(root)
+        self.fmt = fmt
+        self.compression = compression
+        self.parts = 0
+        self._buf: Dict[str, List[dict]] = {name: [] for name in TABLES}
+
+    def _files(self):
+        return self.root.glob(f"*/part-*{FORMATS[self.fmt]}")
+
+    def truncate(self, parts: Optional[int] = 0) -> None:
+        """part >= parts файлдарын өшіру (checkpoint-тен кейін жартылай жазылғандар); 0 – бәрін."""
+        self.parts = parts or 0
+        for f in self._files():
+            try:
+                n = int(f.name.split("-", 1)[1].split(".", 1)[0])
+            except ValueError:
+                continue
+            if n >= self.parts:
+                f.unlink()
+
+    def write(self, row: dict) -> None:
+        for name, rows in flatten(row).items():
+            self._buf[name].extend(rows)
+
+    def flush(self) -> int:
+        """Жиналған жолдарды жазу; қайтарым – жазылған part саны (checkpoint-ке)."""
+        if not any(self._buf.values()):
+            return self.parts
+        pa = _require_pyarrow()
+        for name, rows in self._buf.items():
+            if not rows:
+                continue
+            schema = arrow_schema(name)
+            table = pa.Table.from_pylist(rows, schema=schema)
+            path = self.root / name / f"part-{self.parts:05d}{FORMATS[self.fmt]}"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + ".tmp")
+            if self.fmt == "parquet":
+                import pyarrow.parquet as pq
+                pq.write_table(table, tmp, compression=self.compression)
+            else:
+                import pyarrow.ipc as ipc
+                opts = ipc.IpcWriteOptions(compression=self.compression)
+                with ipc.new_file(str(tmp), schema, options=opts) as w:
+                    w.write_table(table)
+            tmp.replace(path)
+            rows.clear()
+        self.parts += 1
+        return self.parts
@@ -3,6 +3,7 @@ import re
 from typing import List, Dict
 from functools import lru_cache
 from .onto_actor_topic import find_mentions, tag_actor_topic
+from .doc_context import DocContext
 
 SPEAKER_LINE = re.compile(r"^\s*([A-ZӘӨҰҮҚҒІА-Я][^\:]{0,60})\:\s*(.+)$", re.U)  # "Спикер: сөз..."
 DASH_DIALOG  = re.compile(r"^\s*[-—]\s*(.+)$", re.U)
@@ -22,26 +23,36 @@ def segment_debate(text: str) -> List[Dict]:
     Екі форматты қолдаймыз:
     1) "Аты-жөн: реплика"
     2) "— реплика" (спикер аты онтологиядан/контексттен анықталуы мүмкін; қазір unknown)
+    Әр репликаның "segments" өрісі – реплика мәтінінің бастапқы text ішіндегі [start, end] аралықтары.
     """
-    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
     turns = []
-    for ln in lines:
+    pos = 0
+    for raw in text.splitlines(keepends=True):
+        line_start, pos = pos, pos + len(raw)
+        ln = raw.strip()
+        if not ln:
+            continue
+        off = line_start + len(raw) - len(raw.lstrip())
         m = SPEAKER_LINE.match(ln)
         if m:
-            turns.append({"speaker": m.group(1).strip(), "text": m.group(2).strip()})
+            turns.append({"speaker": m.group(1).strip(), "text": m.group(2).strip(),
+                          "segments": [[off + m.start(2), off + m.end(2)]]})
             continue
         m2 = DASH_DIALOG.match(ln)
         if m2:
-            turns.append({"speaker": "unknown", "text": m2.group(1).strip()})
+            turns.append({"speaker": "unknown", "text": m2.group(1).strip(),
+                          "segments": [[off + m2.start(1), off + m2.end(1)]]})
             continue
         # егер формат толық емес болса — бір блокқа жинай саламыз
         if turns and turns[-1]["speaker"] == "unknown":
             turns[-1]["text"] += " " + ln
+            turns[-1]["segments"].append([off, off + len(ln)])
         else:
-            turns.append({"speaker": "unknown", "text": ln})
+            turns.append({"speaker": "unknown", "text": ln, "segments": [[off, off + len(ln)]]})
     return turns
 
-def analyze_turn(turn: Dict) -> Dict:
+def analyze_turn(turn: Dict, mentions: List[Dict] = None) -> Dict:
+    """mentions – DocContext-тен кесілген сәйкестіктер; берілмесе реплика мәтінінен ізделеді."""
     rx = _compiled_lex()
     txt = turn["text"]
     lab = "бейтарап"; score = 0.5
@@ -54,18 +65,49 @@ def analyze_turn(turn: Dict) -> Dict:
     elif ccd:  lab, score = "оң",    0.66  # жұмсақ позитив
     elif dfd:  lab, score = "бейтарап", 0.55
     # адресат/нысана: онтологияға сүйеніп кім туралы айтылғанын табамыз
-    onto = tag_actor_topic(find_mentions(txt))
-    return {
+    onto = tag_actor_topic(find_mentions(txt)) if mentions is None else mentions
+    out = {
         "speaker": turn["speaker"],
         "text": txt,
         "sentiment": lab, "score": score,
         "flags": {"attack": atk, "question": qst, "defend": dfd, "concede": ccd},
         "mentions": onto,   # actor/org/topic
     }
+    if turn.get("segments"):
+        # стенограммадағы [басы, соңы] – mentions span-дарымен позиция бойынша біріктіру үшін (RESULT_SCHEMA 6)
+        out["span"] = [turn["segments"][0][0], turn["segments"][-1][1]]
+    return out
+
+def _to_source(turn: Dict, pos: int, end: bool = False) -> int:
+    """Реплика мәтініндегі офсет -> стенограмма офсеті (сегменттер мәтінде бір бос орынмен біріккен)."""
+    cum = 0
+    for s, e in turn["segments"]:
+        n = e - s
+        if (cum < pos <= cum + n) if end else (cum <= pos < cum + n):
+            return s + pos - cum
+        cum += n + 1
+    return turn["segments"][-1][1]
+
+def turn_mentions(turn: Dict) -> List[Dict]:
+    """
+    Бастапқы нұсқадағыдай онтология реплика мәтінінің өзінде ізделеді (спикер префиксі мен
+    реплика шекарасы сәйкестікке кірмейді; жалғас жолдар бос орынмен бірігеді), span-дар
+    стенограмма офсетіне аударылады (RESULT_SCHEMA 6).
+    """
+    hits = tag_actor_topic(find_mentions(turn["text"]))
+    for h in hits:
+        s, e = h["span"]
+        h["span"] = [_to_source(turn, s), _to_source(turn, e, end=True)]
+    return hits
 
-def analyze_debate(text: str) -> Dict:
+def analyze_debate(text: str, ctx: DocContext = None) -> Dict:
+    """
+    Әр реплика өз мәтінінде талданады; mentions span-дары – бастапқы text бойынша офсет.
+    ctx – интерфейс үйлесімділігі үшін (құжат деңгейіндегі mentions репликаға кесілмейді:
+    шекарадағы label-дер бастапқы нұсқадағыдай табылуы үшін).
+    """
     turns = segment_debate(text)
-    results = [analyze_turn(t) for t in turns]
+    results = [analyze_turn(t, mentions=turn_mentions(t)) for t in turns]
     # Спикерге жинақтау
     by_speaker: Dict[str, Dict[str,int]] = {}
     for r in results:
@@ -0,0 +1,281 @@
+# analyzer/discourse/debate_session.py
+"""
+Тікелей эфирдегі пікірсайысты инкременттік талдау (сессия) және SSE үшін өзгерістер легі.
+
+analyze_debate әр шақыруда бүкіл стенограмманы қайта бөліп, әр репликаны қайта талдайды –
+өсіп жатқан мәтінді бірнеше секунд сайын жіберсе, жалпы жұмыс квадраттық. Сессия алдыңғы
+мәтінді, реплика нәтижелерін және by_speaker жиынтығын сақтайды:
+
+  * жаңа мәтіннің ескімен ортақ префиксі табылады; сол префикс ішінде аяқталған және
+    артынан басқа реплика басталған репликалар «жабық» – қайта бөлінбейді;
+  * қалған құйрық (бірінші ашық репликаның жолынан бастап) қана segment_debate-тен өтеді;
+  * (speaker, text, offset) өзгермеген реплика қайта талданбайды, басқалары analyze_turn-нен
+    өтеді (онтология – тек сол реплика мәтініне), by_speaker орнында түзетіледі;
+  * әр өзгеріс seq нөмірімен delta болып шектеулі журналға түседі (SSE клиенттері
+    Last-Event-ID арқылы жалғасады; журналдан шығып қалса – толық snapshot).
+
+Нәтиже пішіні analyze_debate-пен бірдей: {"turns", "by_speaker"}; span-дар стенограмма бойынша.
+Онтология нұсқасы ауысса (индекс реестрі), барлық реплика қайта талданады.
+Сессиялар процесс жадында: бірнеше worker болса, бір сессияның сұраулары бір worker-ге
+(sticky) баруы керек.
+
+  POLISENT_DEBATE_SESSIONS   бір процестегі сессиялар шегі (әдепкі 64; ескісі шығарылады)
+  POLISENT_DEBATE_TTL        белсенді емес сессияның өмірі, секунд (әдепкі 3600)
+  POLISENT_DEBATE_BACKLOG    SSE үшін сақталатын delta саны (әдепкі 256)
+  POLISENT_DEBATE_MAX_CHARS  стенограмма шегі (әдепкі 2 000 000)
+"""
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+from .debate_rules import analyze_turn, segment_debate, turn_mentions
+from .index_registry import registry
+from .metrics import inc, register_collector, timed
+
+MAX_SESSIONS = int(os.getenv("POLISENT_DEBATE_SESSIONS", "64"))
+SESSION_TTL = float(os.getenv("POLISENT_DEBATE_TTL", "3600"))
+BACKLOG = int(os.getenv("POLISENT_DEBATE_BACKLOG", "256"))
+MAX_CHARS = int(os.getenv("POLISENT_DEBATE_MAX_CHARS", "2000000"))
+
+SENTIMENTS = ("оң", "теріс", "бейтарап")
+
+
+# str.splitlines бөлгіштері – segment_debate жолдарды осылар бойынша бөледі
+_LINE_BREAKS = frozenset("\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029")
+
+
+def _line_start(text: str, pos: int) -> int:
+    """pos тұрған жолдың басы (splitlines мағынасында; \r\n – бір бөлгіш, \n-нен кейін басталады)."""
+    while pos > 0 and text[pos - 1] not in _LINE_BREAKS:
+        pos -= 1
+    return pos
+
+
+def _common_prefix(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    if a[:n] == b[:n]:
+        return n
+    lo, hi = 0, n   # екілік іздеу: кесінді салыстыру C деңгейінде жүреді
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class DebateSession:
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.text = ""
+        self.turns: List[Dict] = []        # segment_debate шығысы (segments – стенограмма офсеттері)
+        self.results: List[Dict] = []      # analyze_turn нәтижелері
+        self.by_speaker: Dict[str, Dict[str, int]] = {}
+        self.seq = 0
+        self.closed = False
+        self.onto_version: Optional[str] = None
+        self.touched = time.time()
+        self._log: deque = deque(maxlen=max(1, BACKLOG))
+        self._cond = threading.Condition()
+        self._async_waiters: set = set()     # (loop, asyncio.Event) – async SSE view-лері
+
+    # --- күй
+    def snapshot(self) -> Dict:
+        with self._cond:
+            return {"id": self.id, "seq": self.seq, "closed": self.closed, "chars": len(self.text),
+                    "turns": list(self.results), "by_speaker": {k: dict(v) for k, v in self.by_speaker.items()}}
+
+    def _count(self, result: Dict, sign: int, touched: set) -> None:
+        sp = result["speaker"]
+        counts = self.by_speaker.setdefault(sp, dict.fromkeys(SENTIMENTS, 0))
+        counts[result["sentiment"]] += sign
+        touched.add(sp)
+        if not any(counts.values()):
+            del self.by_speaker[sp]
+
+    # --- жаңарту
+    def append(self, chunk: str) -> Dict:
+        with self._cond:
+            return self._update(self.text + chunk)
+
+    def update(self, text: str) -> Dict:
+        """Бүкіл (өскен немесе түзетілген) стенограмма; тек өзгерген репликалар талданады."""
+        with self._cond:
+            return self._update(text)
+
+    def _stable_count(self, prefix: int) -> int:
+        """Ортақ префикс ішінде аяқталған, артынан басқа реплика басталған репликалар саны."""
+        k = 0
+        while k + 1 < len(self.turns) and self.turns[k]["segments"][-1][1] < prefix \
+                and self.turns[k + 1]["segments"][0][0] < prefix:
+            k += 1
+        return k
+
+    @registry.pinned()
+    def _update(self, text: str) -> Dict:
+        if self.closed:
+            raise ValueError("Сессия жабылған")
+        if len(text) > MAX_CHARS:
+            raise ValueError(f"Стенограмма {MAX_CHARS} таңбадан аспауы керек")
+        self.touched = time.time()
+        version = registry.version("ontology")
+        if version != self.onto_version:
+            # онтология жаңарды – бұрынғы mentions ескі нұсқадан, бәрі қайта талданады
+            self.onto_version, keep = version, 0
+        else:
+            prefix = _common_prefix(self.text, text)
+            keep = self._stable_count(prefix)
+        # құйрық бірінші ашық реплика жолының басынан қайта бөлінеді (keep < len(turns) әрқашан)
+        start = _line_start(text, self.turns[keep]["segments"][0][0]) if keep else 0
+        with timed("debate_segment"):
+            tail = segment_debate(text[start:])
+        for t in tail:
+            t["segments"] = [[s + start, e + start] for s, e in t["segments"]]
+        new_turns = self.turns[:keep] + tail
+
+        # ескі нәтижені қайта қолдану: реплика сол орында, сол спикер, сол мәтін
+        old = {(t["speaker"], t["text"], t["segments"][0][0], t["segments"][-1][1]): r
+               for t, r in zip(self.turns[keep:], self.results[keep:])}
+        results = self.results[:keep]
+        reused = 0
+        with timed("debate_turns"):
+            for t in tail:
+                key = (t["speaker"], t["text"], t["segments"][0][0], t["segments"][-1][1])
+                r = old.get(key)
+                if r is None:
+                    r = analyze_turn(t, mentions=turn_mentions(t))
+                else:
+                    reused += 1
+                results.append(r)
+        inc("polisent_debate_turns_total", reused, result="reused")
+        inc("polisent_debate_turns_total", len(tail) - reused, result="analyzed")
+
+        # бірінші өзгерген реплика – delta сол жерден басталады
+        first = keep
+        while first < min(len(results), len(self.results)) and results[first] is self.results[first]:
+            first += 1
+        touched: set = set()
+        for r in self.results[first:]:
+            self._count(r, -1, touched)
+        for r in results[first:]:
+            self._count(r, +1, touched)
+
+        changed = first < max(len(results), len(self.results))
+        self.text, self.turns, self.results = text, new_turns, results
+        delta = {"seq": self.seq, "from": first, "count": len(results), "turns": results[first:],
+                 "by_speaker": {sp: dict(self.by_speaker[sp]) if sp in self.by_speaker else None
+                                for sp in sorted(touched)}}
+        if changed:
+            self.seq += 1
+            delta["seq"] = self.seq
+            self._log.append(delta)
+            self._notify()
+        return delta
+
+    def close(self) -> None:
+        with self._cond:
+            self.closed = True
+            self.seq += 1
+            self._log.append({"seq": self.seq, "closed": True})
+            self._notify()
+
+    def _notify(self) -> None:
+        self._cond.notify_all()
+        for loop, ev in list(self._async_waiters):
+            try:
+                loop.call_soon_threadsafe(ev.set)
+            except RuntimeError:   # loop жабылған – клиент кеткен
+                self._async_waiters.discard((loop, ev))
+
+    # --- SSE
+    def events_since(self, seq: int) -> Tuple[List[Dict], bool]:
+        """(seq-тен кейінгі delta-лар, толық snapshot керек пе) – журналдан шығып қалса True."""
+        with self._cond:
+            return self._since(seq)
+
+    def _since(self, seq: int) -> Tuple[List[Dict], bool]:
+        if seq >= self.seq:
+            return [], False
+        if not self._log or self._log[0]["seq"] > seq + 1:
+            return [], True
+        return [d for d in self._log if d["seq"] > seq], False
+
+    def wait(self, seq: int, timeout: float) -> Tuple[List[Dict], bool]:
+        """seq-тен жаңа delta пайда болғанша (немесе timeout) күту."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > seq, timeout=timeout)
+            return self._since(seq)
+
+    async def wait_async(self, seq: int, timeout: float) -> Tuple[List[Dict], bool]:
+        """wait() нұсқасы event loop үшін: ағын ұсталмайды, хабар call_soon_threadsafe арқылы келеді."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._cond:
+            if self.seq > seq:
+                return self._since(seq)
+            self._async_waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._cond:
+                self._async_waiters.discard(waiter)
+        return self.events_since(seq)
+
+
+class SessionStore:
+    """Процестегі сессиялар: LRU + TTL (белсенді емес сессиялар шығарылады)."""
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, ttl: float = SESSION_TTL):
+        self.max_sessions = max(1, max_sessions)
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, DebateSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _evict(self) -> None:
+        now = time.time()
+        for sid, s in list(self._sessions.items()):
+            if now - s.touched > self.ttl:
+                self._sessions.pop(sid).close()
+        while len(self._sessions) >= self.max_sessions:
+            self._sessions.popitem(last=False)[1].close()
+
+    def create(self) -> DebateSession:
+        with self._lock:
+            self._evict()
+            s = DebateSession(uuid.uuid4().hex)
+            self._sessions[s.id] = s
+            return s
+
+    def get(self, session_id: str) -> Optional[DebateSession]:
+        with self._lock:
+            s = self._sessions.get(session_id)
+            if s is not None:
+                self._sessions.move_to_end(session_id)
+            return s
+
+    def close(self, session_id: str) -> bool:
+        with self._lock:
+            s = self._sessions.pop(session_id, None)
+        if s is None:
+            return False
+        s.close()
+        return True
+
+
+sessions = SessionStore()
+
+
+def _session_metrics():
+    yield "polisent_debate_sessions", "gauge", {}, len(sessions)
+
+
+register_collector(_session_metrics)
@@ -0,0 +1,107 @@
+# analyzer/discourse/doc_context.py
+"""
+Бір құжатқа ортақ анализ контексті.
+
+analyze_text ішінде speech/debate/campaign/lexicon бөліктері бір мәтінді қайта-қайта
+өңдемеуі үшін нормализация, сөйлем шекаралары, офсеттері бар токендер, онтология
+және regex сәйкестіктері осында бір-ақ рет, керек болған кезде ғана есептеледі.
+Сөйлем/реплика деңгейіндегі нәтижелер – осы жалпы тізімдердің кесінділері.
+"""
+import re
+from bisect import bisect_left, bisect_right
+from functools import cached_property
+from typing import Dict, List, Tuple
+
+from .campaign_onto_rules import detect_regex
+from .metrics import timed
+from .onto_actor_topic import find_mentions, tag_actor_topic
+from .onto_runtime import iter_label_hits, match_text_with_ontology
+from .pd_analyzer import tokenize_spans
+
+_SENT_END = re.compile(r"[.!?]+")
+
+
+def sent_tokenize(text: str) -> List[Tuple[int, int, str]]:
+    # Өте қарапайым бөлгіш: .!? бойынша, тырнақшаны елемей
+    spans, start = [], 0
+    for m in _SENT_END.finditer(text):
+        end = m.end()
+        chunk = text[start:end].strip()
+        if chunk:
+            spans.append((start, end, chunk))
+        start = end
+    tail = text[start:].strip()
+    if tail:
+        spans.append((start, start+len(tail), tail))
+    return spans
+
+
+class SpanIndex:
+    """
+    Сәйкестіктерді басталу офсеті бойынша сұрыптап сақтайды: [s, e) ішіндегілер bisect арқылы
+    табылады, тек сол аралықта басталатындар қаралады. Қайтарым реті – бастапқы тізімдегі рет.
+    """
+
+    def __init__(self, hits: List[Dict]):
+        self.hits = hits
+        self._order = sorted(range(len(hits)), key=lambda i: hits[i]["span"][0])
+        self._starts = [hits[i]["span"][0] for i in self._order]
+
+    def within(self, s: int, e: int) -> List[Dict]:
+        lo = bisect_left(self._starts, s)
+        hi = bisect_right(self._starts, e, lo)
+        idx = sorted(i for i in self._order[lo:hi] if self.hits[i]["span"][1] <= e)
+        return [self.hits[i] for i in idx]
+
+
+class DocContext:
+    def __init__(self, text: str):
+        self.text = text
+
+    @cached_property
+    def sentences(self) -> List[Tuple[int, int, str]]:
+        return sent_tokenize(self.text)
+
+    @cached_property
+    def tokens(self) -> List[Tuple[int, int, str]]:
+        """(start, end, token) – лексикон токендері бастапқы офсеттерімен."""
+        return tokenize_spans(self.text)
+
+    @cached_property
+    def pd_tokens(self) -> List[str]:
+        """score_text(tokens=...) үшін – pd_analyzer.tokenize() нәтижесімен бірдей."""
+        return [t for _, _, t in self.tokens]
+
+    @cached_property
+    def label_hits(self) -> List[Tuple[int, int, str]]:
+        with timed("onto_match"):
+            return list(iter_label_hits(self.text))
+
+    @cached_property
+    def onto_hits(self) -> List[Dict]:
+        """campaign пішіні: inst/labels/onto_devices/onto_polarity."""
+        return match_text_with_ontology(self.text, label_hits=self.label_hits)
+
+    @cached_property
+    def mentions(self) -> List[Dict]:
+        """speech/debate пішіні: iri/labels/kind (actor/org/topic)."""
+        return tag_actor_topic(find_mentions(self.text, label_hits=self.label_hits))
+
+    @cached_property
+    def rx_hits(self) -> List[Dict]:
+        with timed("regex"):
+            return detect_regex(self.text)
+
+    @cached_property
+    def mention_index(self) -> SpanIndex:
+        return SpanIndex(self.mentions)
+
+    @cached_property
+    def rx_index(self) -> SpanIndex:
+        return SpanIndex(self.rx_hits)
+
+    def mentions_in(self, s: int, e: int) -> List[Dict]:
+        return self.mention_index.within(s, e)
+
+    def rx_hits_in(self, s: int, e: int) -> List[Dict]:
+        return self.rx_index.within(s, e)
@@ -0,0 +1,215 @@
+# analyzer/discourse/index_registry.py
+"""
+Лексикон/онтология индекстерінің нұсқаланған реестрі: процесті қайта қоспай жаңарту.
+
+Әр индекс (атау, бастапқы файлдар, builder) тіркеледі. Фондық ағын POLISENT_INDEX_RELOAD_SEC
+сайын файлдардың өлшемі/mtime-ын тексереді; өзгерсе, мазмұн хэші салыстырылады (тек
+touch болса – қайта құрылмайды), индекс сол ағында толық құрылып, дайын болғанда бір
+сілтемемен ауыстырылады. Құру сәтсіз болса, ескі нұсқа қалады.
+
+Сұрау бойы бір нұсқа: `with registry.pinned():` (немесе декоратор) ішінде get() әр индекстің
+алғаш алынған нұсқасын қайтарады – ауыстыру жүріп жатқан сұрауға әсер етпейді.
+Нұсқа = бастапқы файлдар мазмұнының қысқа хэші; нәтижеде және кэш кілтінде көрсетіледі.
+
+  POLISENT_INDEX_RELOAD_SEC   тексеру аралығы, секунд (әдепкі 5; 0 – бақылау сөнеді)
+"""
+import contextvars
+import hashlib
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, NamedTuple, Optional, Sequence, Tuple
+
+from .metrics import inc, register_collector
+
+logger = logging.getLogger(__name__)
+
+RELOAD_SEC = float(os.getenv("POLISENT_INDEX_RELOAD_SEC", "5"))
+
+_PINNED: contextvars.ContextVar[Optional[Dict[str, "Entry"]]] = contextvars.ContextVar("polisent_index_pin",
+                                                                                       default=None)
+
+
+class Entry(NamedTuple):
+    version: str
+    value: Any
+    signature: Tuple
+    built: float
+
+
+class _Spec(NamedTuple):
+    sources: Callable[[], Sequence[Path]]   # нұсқаны анықтайтын файлдар
+    watch: Callable[[], Sequence[Path]]     # қосымша бақыланатындар (мыс. snapshot)
+    builder: Callable[[], Any]
+
+
+def _signature(paths: Sequence[Path]) -> Tuple:
+    out = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+            out.append((str(p), st.st_size, st.st_mtime_ns))
+        except OSError:
+            out.append((str(p), None, None))
+    return tuple(out)
+
+
+def content_digest(paths: Sequence[Path]) -> str:
+    """Индекс нұсқасы: файлдар мазмұнының қысқа хэші (артефактілер де осымен белгіленеді)."""
+    h = hashlib.sha256()
+    for p in paths:
+        try:
+            with open(p, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+        except OSError:
+            h.update(b"<missing>")
+        h.update(b"\0")
+    return h.hexdigest()[:12]
+
+
+class IndexRegistry:
+    def __init__(self, interval: float = RELOAD_SEC):
+        self.interval = interval
+        self._specs: Dict[str, _Spec] = {}
+        self._entries: Dict[str, Entry] = {}
+        self._build_lock = threading.RLock()
+        self._failed: Dict[str, Tuple] = {}     # сәтсіз құрылған қолтаңба – файл қайта өзгергенше қайталанбайды
+        self._digests: Dict[str, Tuple[Tuple, str]] = {}   # әлі құрылмаған индекстің (қолтаңба, хэш)
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+
+    def register(self, name: str, sources: Callable[[], Sequence[Path]], builder: Callable[[], Any],
+                 watch: Callable[[], Sequence[Path]] = lambda: ()) -> None:
+        self._specs[name] = _Spec(sources, watch, builder)
+        self._entries.pop(name, None)
+
+    def _paths(self, spec: _Spec) -> Sequence[Path]:
+        return [Path(p) for p in (*spec.sources(), *spec.watch())]
+
+    def _build(self, name: str) -> Entry:
+        spec = self._specs[name]
+        sig = _signature(self._paths(spec))
+        version = content_digest([Path(p) for p in spec.sources()])
+        value = spec.builder()
+        return Entry(version, value, sig, time.time())
+
+    def _current(self, name: str) -> Entry:
+        entry = self._entries.get(name)
+        if entry is None:
+            with self._build_lock:
+                entry = self._entries.get(name)
+                if entry is None:
+                    entry = self._entries[name] = self._build(name)
+        self._ensure_watcher()
+        return entry
+
+    def entry(self, name: str) -> Entry:
+        pinned = _PINNED.get()
+        if pinned is not None:
+            entry = pinned.get(name)
+            if entry is None:
+                entry = pinned[name] = self._current(name)
+            return entry
+        return self._current(name)
+
+    def get(self, name: str) -> Any:
+        return self.entry(name).value
+
+    def version(self, name: str) -> str:
+        """Индексті құрмай-ақ нұсқасы (әлі құрылмаған болса – файл хэші)."""
+        pinned = _PINNED.get()
+        entry = (pinned or {}).get(name) or self._entries.get(name)
+        if entry is not None:
+            return entry.version
+        self._ensure_watcher()
+        paths = [Path(p) for p in self._specs[name].sources()]
+        sig = _signature(paths)
+        memo = self._digests.get(name)
+        if memo is None or memo[0] != sig:
+            memo = self._digests[name] = (sig, content_digest(paths))
+        return memo[1]
+
+    def versions(self) -> Dict[str, str]:
+        return {name: self.version(name) for name in self._specs}
+
+    @contextmanager
+    def pinned(self):
+        """Блок ішінде әр индекстің бір нұсқасы қолданылады (ішкі pinned() сыртқысын жалғастырады)."""
+        if _PINNED.get() is not None:
+            yield
+            return
+        token = _PINNED.set(dict(self._entries))
+        try:
+            yield
+        finally:
+            _PINNED.reset(token)
+
+    # --- өзгерісті бақылау
+    def reload(self, name: str, force: bool = False) -> bool:
+        """Файл өзгерген болса (немесе force) – қайта құрып, ауыстыру. Қайтарым: ауыстырылды ма."""
+        spec = self._specs[name]
+        with self._build_lock:
+            old = self._entries.get(name)
+            if old is None:
+                return False          # әлі ешкім сұрамаған – алғаш get() кезінде құрылады
+            sig = _signature(self._paths(spec))
+            if not force and (sig == old.signature or sig == self._failed.get(name)):
+                return False
+            if not force and content_digest([Path(p) for p in spec.sources()]) == old.version \
+                    and _signature(list(map(Path, spec.watch()))) == old.signature[len(spec.sources()):]:
+                self._entries[name] = old._replace(signature=sig)   # тек touch
+                return False
+            t0 = time.perf_counter()
+            try:
+                entry = self._build(name)
+            except Exception as e:
+                self._failed[name] = sig
+                inc("polisent_index_reloads_total", index=name, result="error")
+                logger.warning("Индекс %s қайта құрылмады (ескі нұсқа %s қалды): %s", name, old.version, e)
+                return False
+            self._failed.pop(name, None)
+            self._entries[name] = entry   # атомарлы ауыстыру: жаңа сұраулар жаңа нұсқаны алады
+        inc("polisent_index_reloads_total", index=name, result="ok")
+        logger.info("Индекс %s жаңартылды: %s -> %s (%.2f с)", name, old.version, entry.version,
+                    time.perf_counter() - t0)
+        return entry.version != old.version or force
+
+    def check(self) -> None:
+        for name in list(self._specs):
+            self.reload(name)
+
+    def _ensure_watcher(self) -> None:
+        if self.interval <= 0:
+            return
+        # fork-тан кейін ағын балаға өтпейді – процесс ауысса, қайта іске қосамыз
+        if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+            with self._build_lock:
+                if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                    return
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._loop, name="polisent-index-watch", daemon=True)
+                self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception as e:   # бақылаушы ағын өлмеуі керек
+                logger.warning("Индекс бақылауы сәтсіз: %s", e)
+
+
+registry = IndexRegistry()
+
+
+def _registry_metrics():
+    for name, entry in list(registry._entries.items()):
+        yield "polisent_index_info", "gauge", {"index": name, "version": entry.version}, 1.0
+        yield "polisent_index_age_seconds", "gauge", {"index": name}, time.time() - entry.built
+
+
+register_collector(_registry_metrics)
@@ -0,0 +1,112 @@
+# analyzer/discourse/inference_pool.py
+"""
+Async view-лер үшін модель inference-ін шектеулі пулда орындау және backpressure.
+
+Модель шақыратын жұмыс (analyze_documents) event loop-та емес, жеке ThreadPoolExecutor-да
+жүреді; бір уақытта ең көбі POLISENT_INFER_CONCURRENCY жұмыс орындалады. Орын бос
+болмаса, сұрау кезекке тұрады: кезек толы (POLISENT_INFER_QUEUE) – бірден 429,
+POLISENT_INFER_QUEUE_TIMEOUT секундта орын босамаса – 503. Екеуінде де Retry-After.
+Шектеу процесс бойынша ортақ (threading семафоры): WSGI астындағы async view-лерде
+әр сұраудың өз event loop-ы болса да, жалпы шек сақталады.
+
+Модельсіз (тек ереже/лексикон) жұмыстар бұл пулға кірмейді – пул бос емес кезде де жүреді.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Callable
+
+from .metrics import STAGE_METRIC, inc, observe, register_collector
+
+INFER_CONCURRENCY = int(os.getenv("POLISENT_INFER_CONCURRENCY", "2"))
+INFER_QUEUE = int(os.getenv("POLISENT_INFER_QUEUE", "16"))
+INFER_QUEUE_TIMEOUT = float(os.getenv("POLISENT_INFER_QUEUE_TIMEOUT", "10"))
+
+
+class Saturated(Exception):
+    """Пул толы: status – 429 (кезек толы) немесе 503 (кезекте күту уақыты бітті)."""
+
+    def __init__(self, status: int, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class InferencePool:
+    def __init__(self, concurrency: int = INFER_CONCURRENCY, max_queue: int = INFER_QUEUE,
+                 queue_timeout: float = INFER_QUEUE_TIMEOUT):
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = max(0.0, queue_timeout)
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._waiting = 0
+        self._executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix="polisent-infer")
+        # кезектегілер орын күткенде event loop-ты бұғаттамауы үшін – жеке, кезек өлшеміндей пул
+        self._waiters = ThreadPoolExecutor(max(1, self.max_queue), thread_name_prefix="polisent-infer-wait")
+
+    def stats(self):
+        with self._lock:
+            return {"inflight": self._inflight, "waiting": self._waiting,
+                    "concurrency": self.concurrency, "max_queue": self.max_queue}
+
+    async def _acquire(self) -> None:
+        if self._slots.acquire(blocking=False):
+            return
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                inc("polisent_infer_rejected_total", reason="queue_full")
+                raise Saturated(429, "Модель пулы бос емес: кезек толы", retry_after=1)
+            self._waiting += 1
+        fut = self._waiters.submit(self._slots.acquire, True, self.queue_timeout)
+        try:
+            ok = await asyncio.wrap_future(fut)
+        except asyncio.CancelledError:
+            # клиент кетті – кейін алынған орын босатылсын
+            fut.add_done_callback(lambda f: not f.cancelled() and f.result() and self._slots.release())
+            raise
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if not ok:
+            inc("polisent_infer_rejected_total", reason="timeout")
+            raise Saturated(503, f"Модель пулында {self.queue_timeout:g} с ішінде орын босамады",
+                            retry_after=max(1, int(self.queue_timeout)))
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """fn(*args, **kwargs) – пулда; толы болса Saturated. Сұрау тоқтатылса да fn аяқталғанда орын босайды."""
+        t0 = time.perf_counter()
+        await self._acquire()
+        observe(STAGE_METRIC, time.perf_counter() - t0, stage="infer_queue_wait")
+        with self._lock:
+            self._inflight += 1
+        try:
+            fut = self._executor.submit(partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        # орын event loop-қа емес, жұмыстың өзіне байланған: loop жабылса да босайды
+        fut.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(fut)
+
+    def _release(self) -> None:
+        with self._lock:
+            self._inflight -= 1
+        self._slots.release()
+
+
+@lru_cache(maxsize=1)
+def get_pool() -> InferencePool:
+    pool = InferencePool()
+    register_collector(_pool_metrics)
+    return pool
+
+
+def _pool_metrics():
+    st = get_pool().stats()
+    yield "polisent_infer_inflight", "gauge", {}, st["inflight"]
+    yield "polisent_infer_waiting", "gauge", {}, st["waiting"]
@@ -0,0 +1,127 @@
+# analyzer/discourse/kk_stem.py
+"""
+Қазақ тілінің жеңіл жұрнақ/жалғау қиғыш стеммері (лексикон мен онтология сәйкестігі үшін).
+
+Сөз соңынан оңнан солға қарай қабаттар ретімен (жіктік -> септік -> тәуелдік -> көптік ->
+етістік формалары -> сөзжасам, әр қабат ең көбі бір рет) ең ұзын жалғау қиылады.
+Әр қабаттың жалғаулары кері (reversed) trie-ге бір рет компиляцияланады – сәйкестік сөз
+соңынан бір өтуде табылады. Түбір тым қысқарып кетпеуі үшін қалдық кемі MIN_STEM әріп
+(бір әріптік жалғауда +1, төрт әріптіде −1) және кемі бір дауысты болуы керек.
+Соңында дыбыс алмасуы қалпына келтіріледі (кітабы/кітап, халқымыз/халық).
+Нәтиже token -> stem шектеулі LRU-да сақталады (POLISENT_STEM_CACHE).
+
+Мақсат – морфологиялық талдау емес, тұрақты кілт: мәтіндегі сөз бен лексикон термині
+бір функциямен қиылады да, сәйкестік hash бойынша ізделеді.
+
+  POLISENT_MATCH_MODE   prefix (әдепкі, бұрынғы префикс сәйкестігі) | stem
+"""
+import os
+from functools import lru_cache
+from typing import Dict, List, Sequence
+
+MATCH_MODE = os.getenv("POLISENT_MATCH_MODE", "prefix").lower()
+STEM_CACHE = int(os.getenv("POLISENT_STEM_CACHE", "65536"))
+MIN_STEM = 3
+STEM_VERSION = 2   # қию ережелері өзгерсе көтеріңіз (нәтиже кэшінің кілтіне кіреді)
+VOWELS = set("аәеиоөұүыіэюяё")
+
+LAYERS: List[Sequence[str]] = [
+    # жіктік (баяндауыштық) жалғаулар
+    ("мын", "мін", "бын", "бін", "пын", "пін", "мыз", "міз", "быз", "біз", "пыз", "піз",
+     "сың", "сің", "сыз", "сіз", "сыңдар", "сіңдер", "сыздар", "сіздер"),
+    # септік жалғаулары
+    ("ның", "нің", "дың", "дің", "тың", "тің",
+     "ға", "ге", "қа", "ке", "на", "не", "а", "е",
+     "ны", "ні", "ды", "ді", "ты", "ті", "н",
+     "да", "де", "та", "те", "нда", "нде",
+     "дан", "ден", "тан", "тен", "нан", "нен",
+     "мен", "бен", "пен", "менен", "бенен", "пенен"),
+    # тәуелдік жалғаулары
+    ("ымыз", "іміз", "мыз", "міз", "ыңыз", "іңіз", "ңыз", "ңіз",
+     "ым", "ім", "м", "ың", "ің", "ң", "сы", "сі", "ы", "і"),
+    # көптік жалғаулары
+    ("лар", "лер", "дар", "дер", "тар", "тер"),
+    # етістік: есімше, өткен шақ, көсемше, тұйық етістік, шартты рай, мақсат
+    ("ған", "ген", "қан", "кен", "атын", "етін", "йтын", "йтін",
+     # бір дауыссыз -п/-й (ойлап, ойлай) атаулы түбірдің өз әрпімен шатасады (кітап, сарай) –
+     # тек дауыстымен басталатын -ып/-іп көсемшесі қиылады
+     "ды", "ді", "ты", "ті", "ып", "іп", "у", "ю",
+     "мақ", "мек", "бақ", "бек", "пақ", "пек", "са", "се"),
+    # сөзжасам: -лық/-шыл/-шы (жемқорлық -> жемқор, саясатшы -> саясат)
+    ("лық", "лік", "дық", "дік", "тық", "тік", "шыл", "шіл", "шы", "ші"),
+]
+
+
+class _SuffixLayer:
+    """Кері trie: сөз соңынан жүріп, қиюға болатын ең ұзын жалғау ұзындығын табу."""
+    __slots__ = ("root",)
+
+    def __init__(self, suffixes: Sequence[str]):
+        self.root: Dict = {}
+        for suf in suffixes:
+            node = self.root
+            for ch in reversed(suf):
+                node = node.setdefault(ch, {})
+            node[""] = len(suf)
+
+    def longest(self, word: str) -> int:
+        node, best = self.root, 0
+        for i in range(len(word) - 1, -1, -1):
+            node = node.get(word[i])
+            if node is None:
+                break
+            n = node.get("")
+            if n and _stem_ok(word[:-n], n):
+                best = n
+        return best
+
+
+def _stem_ok(rest: str, suffix_len: int) -> bool:
+    # қысқа жалғау түбірдің өз әрпі болуы ықтимал – қалдыққа көбірек әріп талап етеміз
+    need = MIN_STEM + 1 if suffix_len == 1 else (MIN_STEM if suffix_len < 4 else MIN_STEM - 1)
+    return len(rest) >= need and any(ch in VOWELS for ch in rest)
+
+
+_LAYERS = [_SuffixLayer(l) for l in LAYERS]
+
+
+# жалғау алдындағы үндестік: кітаб(ы) -> кітап, жүрег(і) -> жүрек, тарағ(ы) -> тарақ
+_DEVOICE = {"б": "п", "г": "к", "ғ": "қ"}
+
+
+def _alternate(w: str) -> str:
+    """Дыбыс алмасуын қалпына келтіру: қатаңдау (б/г/ғ -> п/к/қ) және түскен дауысты (халқ -> халық, ерк -> ерік)."""
+    if len(w) < 3:
+        return w
+    if w[-1] in _DEVOICE:
+        w = w[:-1] + _DEVOICE[w[-1]]
+    # ық/ік түбірлері тәуелдік/септік алдында дауыстысын түсіреді: халық -> халқы
+    if w[-1] in "қк" and w[-2] in "лр" and w[-3] in VOWELS:
+        w = w[:-1] + ("ы" if w[-1] == "қ" else "і") + w[-1]
+    return w
+
+
+def _stem(token: str) -> str:
+    """Әр қадамда қалған қабаттардың ең ұзын жалғауы қиылады, келесі қадам тек одан кейінгі (солдағы) қабаттарда."""
+    w = token.lower()
+    start = 0
+    while start < len(_LAYERS):
+        best, at = 0, -1
+        for i in range(start, len(_LAYERS)):
+            n = _LAYERS[i].longest(w)
+            if n > best:
+                best, at = n, i
+        if not best:
+            break
+        w = w[:-best]
+        start = at + 1
+    # жалғаусыз сөзге де қолданылады – мәтін мен лексикон кілттері бір пішінге келеді
+    return _alternate(w)
+
+
+stem = lru_cache(maxsize=STEM_CACHE)(_stem)
+stem.__doc__ = "token -> түбір (шектеулі LRU мемоизациямен)."
+
+
+def stem_phrase(phrase: str) -> str:
+    return " ".join(stem(w) for w in phrase.split())
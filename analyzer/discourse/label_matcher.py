@@ -0,0 +1,114 @@
+# analyzer/discourse/label_matcher.py
+"""
+Онтология label-дері үшін токендік Aho-Corasick автоматы.
+
+Мәтін бос орын бойынша токендерге бөлінеді (шеткі тыныс белгілері алынып,
+кіші әріпке келтіріледі), барлық label бір өтуде табылады: қабаттасқан және
+қайталанған тіркестердің әрқайсысы өз дұрыс офсетімен қайтарылады.
+Іздеу құны label санына тәуелді емес.
+"""
+import re
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+WORD_RE = re.compile(r"\S+")
+EDGE_PUNCT = ".,;:!?\"'«»“”„()[]{}<>…—–-/\\*"
+
+
+def norm_token(tok: str) -> str:
+    return tok.lower().strip(EDGE_PUNCT)
+
+
+def label_tokens(label: str) -> Tuple[str, ...]:
+    return tuple(t for t in (norm_token(x) for x in label.split()) if t)
+
+
+def text_tokens(text: str) -> List[Tuple[int, int, Optional[str]]]:
+    """(start, end, key) – key None болса (тек тыныс белгісі), тіркес осы жерде үзіледі."""
+    out = []
+    for m in WORD_RE.finditer(text):
+        raw = m.group(0)
+        key = norm_token(raw)
+        if not key:
+            out.append((m.start(), m.end(), None))
+            continue
+        lead = len(raw) - len(raw.lstrip(EDGE_PUNCT))
+        trail = len(raw) - len(raw.rstrip(EDGE_PUNCT))
+        out.append((m.start() + lead, m.end() - trail, key))
+    return out
+
+
+class LabelMatcher:
+    """keys – label индексінің кілттері; find() әр сәйкестікке сол кілттерді қайтарады."""
+
+    def __init__(self, keys: Iterable[str], key_fn: Optional[Callable[[str], str]] = None):
+        # key_fn – токен кілті (мыс. kk_stem.stem): label мен мәтін токендері бірдей түрлендіріледі
+        self._key_fn = key_fn
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        self._patterns: List[Tuple[int, List[str]]] = []   # (токен саны, индекс кілттері)
+        by_tokens: Dict[Tuple[str, ...], int] = {}
+        for key in keys:
+            toks = label_tokens(key)
+            if key_fn is not None:
+                toks = tuple(key_fn(t) for t in toks)
+            if not toks:
+                continue
+            pid = by_tokens.get(toks)
+            if pid is None:
+                pid = by_tokens[toks] = len(self._patterns)
+                self._patterns.append((len(toks), []))
+                self._insert(toks, pid)
+            self._patterns[pid][1].append(key)
+        self._link()
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def _insert(self, toks: Tuple[str, ...], pid: int) -> None:
+        state = 0
+        for t in toks:
+            nxt = self._goto[state].get(t)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][t] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(pid)
+
+    def _link(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for t, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and t not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(t, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str, max_tokens: Optional[int] = None) -> List[Tuple[int, int, List[str]]]:
+        """Барлық сәйкестік: (start, end, индекс кілттері), (start, end) бойынша сұрыпталған."""
+        toks = text_tokens(text)
+        hits = []
+        state = 0
+        for i, (_, end, key) in enumerate(toks):
+            if key is None:
+                state = 0
+                continue
+            if self._key_fn is not None:
+                key = self._key_fn(key)
+            while state and key not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(key, 0)
+            for pid in self._out[state]:
+                n, keys = self._patterns[pid]
+                if max_tokens is None or n <= max_tokens:
+                    hits.append((toks[i - n + 1][0], end, keys))
+        hits.sort(key=lambda h: (h[0], h[1]))
+        return hits
@@ -0,0 +1,268 @@
+# analyzer/discourse/management/commands/analyze_corpus.py
+"""
+Корпусты пакеттік анализдеу: JSONL (әр жолда {"id"?, "text", "domain"?, "source"?, "task"?, "tactic"?, "use_model"?})
+немесе discourse_data.json пішініндегі файл -> JSONL нәтиже, кіріс ретімен.
+--format parquet|arrow – JSONL орнына бағаналы кестелер директориясы (discourse/columnar.py).
+
+Құжаттар пакеттерге бөлініп, процестер пулына таратылады; әр worker модель/онтология/лексиконды
+бір рет жүктейді. Шығыс файлына әр --checkpoint-every пакет сайын <output>.ckpt жазылады –
+тоқтап қалған жұмыс келесі іске қосылуда сол жерден жалғасады (JSONL – байт офсеті, бағаналы
+шығыс – part нөмірі бойынша).
+"""
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from discourse.columnar import FORMATS, ColumnarWriter
+from discourse.forms import AnalyzerForm
+from discourse.views import FORM_DEFAULTS, _json_flag
+
+logger = logging.getLogger(__name__)
+
+CKPT_SUFFIX = ".ckpt"
+
+
+def _iter_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                raise CommandError(f"{path}:{lineno}: JSON оқылмады: {e}")
+            yield {"text": item} if isinstance(item, str) else item
+
+
+def _iter_discourse_json(data):
+    """discourse_data.json: {тактика: [{"№", "Терминдер", "Мағынасы", ...}, ...]} – мәтін = термин + мағынасы."""
+    for tactic, rows in data.items():
+        for row in rows or []:
+            if not isinstance(row, dict) or not row.get("Мағынасы"):
+                continue
+            term = str(row.get("Терминдер", "")).strip()
+            text = str(row["Мағынасы"]).strip()
+            yield {"id": f"{tactic}:{row.get('№', '')}", "text": f"{term}. {text}" if term else text}
+
+
+def iter_documents(path):
+    path = Path(path)
+    if path.suffix == ".jsonl":
+        yield from _iter_jsonl(path)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict) and "documents" not in data:
+        yield from _iter_discourse_json(data)
+    else:
+        items = data.get("documents", []) if isinstance(data, dict) else data
+        for item in items:
+            yield {"text": item} if isinstance(item, str) else item
+
+
+def _prepare(index, item, defaults, tactic, use_model=True):
+    """(index, id, doc немесе None, қате) – API-дегідей AnalyzerForm және JSON boolean жалаулары тексеріледі."""
+    if not isinstance(item, dict):
+        return index, index, None, {"__all__": ["Құжат объект немесе мәтін болуы керек"]}
+    doc_id = item.get("id", index)
+    form = AnalyzerForm({**defaults, **{k: item[k] for k in ("text", "domain", "source", "task") if k in item}})
+    if not form.is_valid():
+        return index, doc_id, None, form.errors.get_json_data()
+    doc = dict(form.cleaned_data)
+    for name, default in (("tactic", tactic), ("use_model", use_model)):
+        try:
+            doc[name] = _json_flag(item, name, default)
+        except ValueError as e:
+            # форма қателерімен бірдей пішін: жол қате болып жазылады, жұмыс тоқтамайды
+            return index, doc_id, None, {name: [{"message": str(e), "code": "invalid"}]}
+    return index, doc_id, doc, None
+
+
+def _init_worker(threads):
+    """Пул worker-і: Django + модель/онтология/лексикон бір рет жүктеледі."""
+    import django
+    django.setup()
+    if threads:
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+    from discourse import views
+    from discourse.onto_runtime import get_onto
+    views.get_pd_index()
+    views.get_tactic_labels()
+    try:
+        views.get_nli_engine()
+    except Exception as e:
+        logger.warning("NLI моделі жүктелмеді, фолбэк қолданылады: %s", e)
+    try:
+        get_onto()
+    except Exception as e:
+        logger.warning("Онтология жүктелмеді: %s", e)
+
+
+def _meta(index, doc_id, doc):
+    """Нәтиже жолының басы: сүзгілеу үшін domain/source/task бірге жазылады."""
+    return {"index": index, "id": doc_id, "domain": doc["domain"], "source": doc["source"], "task": doc["task"]}
+
+
+def analyze_batch(batch):
+    """batch: [(index, id, doc, error)] -> [нәтиже жолы]. Пакет құласа, құжаттар жеке-жеке қайта жүреді."""
+    from discourse.views import analyze_documents
+    rows = [{"index": i, "id": doc_id, "errors": err} for i, doc_id, doc, err in batch if doc is None]
+    good = [(i, doc_id, doc) for i, doc_id, doc, _ in batch if doc is not None]
+    try:
+        results = analyze_documents([doc for _, _, doc in good])
+        rows += [{**_meta(i, doc_id, doc), "result": r} for (i, doc_id, doc), r in zip(good, results)]
+    except Exception:
+        for i, doc_id, doc in good:
+            try:
+                rows.append({**_meta(i, doc_id, doc), "result": analyze_documents([doc])[0]})
+            except Exception as e:
+                rows.append({**_meta(i, doc_id, doc), "error": f"{type(e).__name__}: {e}"})
+    rows.sort(key=lambda r: r["index"])
+    return rows
+
+
+class Command(BaseCommand):
+    help = "JSONL/discourse_data.json корпусын процестер пулымен анализдеп, JSONL-ге жазу (үзілген жерден жалғасады)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help="Кіріс: .jsonl немесе .json (discourse_data.json пішіні де)")
+        parser.add_argument("--output", required=True, help="Нәтиже JSONL файлы (parquet/arrow – директория)")
+        parser.add_argument("--format", choices=["jsonl", *FORMATS], default="jsonl",
+                            help="parquet/arrow: documents/segments/mentions/regex_hits/stance кестелері (pyarrow керек)")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Процестер саны (1 – пулсыз, осы процесте)")
+        parser.add_argument("--batch-size", type=int, default=32, help="Бір worker тапсырмасындағы құжат саны")
+        parser.add_argument("--checkpoint-every", type=int, default=10, help="Неше пакет сайын checkpoint жазылады")
+        parser.add_argument("--domain", default=FORM_DEFAULTS.get("domain"))
+        parser.add_argument("--source", default=FORM_DEFAULTS.get("source"))
+        parser.add_argument("--task", default=FORM_DEFAULTS.get("task"))
+        parser.add_argument("--no-tactic", action="store_true", help="Тактиканы zero-shot жіктемеу")
+        parser.add_argument("--no-model", action="store_true",
+                            help="Модельсіз (use_model=false): фолбэк + лексикон тактикасы; жол өзі true бере алады")
+        parser.add_argument("--restart", action="store_true", help="Checkpoint-ті елемей, басынан бастау")
+
+    def handle(self, *args, **opts):
+        src = Path(opts["input"])
+        if not src.exists():
+            raise CommandError(f"Кіріс файлы жоқ: {src}")
+        out_path = Path(opts["output"])
+        ckpt_path = out_path.with_name(out_path.name + CKPT_SUFFIX)
+        batch_size = max(1, opts["batch_size"])
+        workers = max(1, opts["workers"])
+        every = max(1, opts["checkpoint_every"])
+        defaults = {**FORM_DEFAULTS, **{k: opts[k] for k in ("domain", "source", "task") if opts[k]}}
+        tactic = not opts["no_tactic"]
+        use_model = not opts["no_model"]
+        fmt = opts["format"]
+        columnar = None
+        if fmt != "jsonl":
+            try:
+                columnar = ColumnarWriter(out_path, fmt)
+            except ImportError as e:
+                raise CommandError(str(e))
+
+        done, offset = 0, 0
+        if ckpt_path.exists() and not opts["restart"]:
+            ckpt = json.loads(ckpt_path.read_text(encoding="utf-8"))
+            if ckpt.get("input") != str(src.resolve()):
+                raise CommandError(f"{ckpt_path} басқа кіріске тиесілі ({ckpt.get('input')}); --restart қолданыңыз")
+            if ckpt.get("format", "jsonl") != fmt:
+                raise CommandError(f"{ckpt_path} {ckpt.get('format', 'jsonl')} форматында басталған; --restart қолданыңыз")
+            if ckpt.get("complete"):
+                self.stdout.write(self.style.SUCCESS(f"Бұрын аяқталған: {ckpt['done']} құжат -> {out_path}"))
+                return
+            done, offset = ckpt["done"], ckpt.get("parts" if columnar else "bytes", 0)
+            self.stdout.write(f"Checkpoint-тен жалғасу: {done} құжат өңделген")
+        elif out_path.exists() and not opts["restart"]:
+            raise CommandError(f"{out_path} бар, бірақ checkpoint жоқ; қайта жазу үшін --restart қолданыңыз")
+
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        if columnar:
+            out = None
+            # checkpoint-тен кейін жазылған part-тар қайта есептеледі
+            columnar.truncate(offset)
+        else:
+            out = open(out_path, "r+b" if offset else "wb")
+            # checkpoint-тен кейін жазылып үлгерген (жартылай) жолдар қайта есептеледі
+            out.seek(offset)
+            out.truncate()
+
+        def checkpoint(n, complete=False):
+            if columnar:
+                position = {"parts": columnar.flush()}
+            else:
+                out.flush()
+                os.fsync(out.fileno())
+                position = {"bytes": out.tell()}
+            tmp = ckpt_path.with_name(ckpt_path.name + ".tmp")
+            tmp.write_text(json.dumps({"input": str(src.resolve()), "done": n, "format": fmt, **position,
+                                       "complete": complete}), encoding="utf-8")
+            os.replace(tmp, ckpt_path)
+
+        checkpoint(done)
+
+        def batches():
+            batch = []
+            for i, item in enumerate(iter_documents(src)):
+                if i < done:
+                    continue
+                batch.append(_prepare(i, item, defaults, tactic, use_model))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+        n, n_batches, t0 = done, 0, time.time()
+
+        def write(rows):
+            nonlocal n, n_batches
+            for row in rows:
+                if columnar:
+                    columnar.write(row)
+                else:
+                    out.write((json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8"))
+            n += len(rows)
+            n_batches += 1
+            if n_batches % every == 0:
+                checkpoint(n)
+                rate = (n - done) / max(time.time() - t0, 1e-9)
+                self.stdout.write(f"{n} құжат ({rate:.1f} құжат/с)")
+
+        try:
+            if workers == 1:
+                _init_worker(0)
+                for batch in batches():
+                    write(analyze_batch(batch))
+            else:
+                threads = max(1, (os.cpu_count() or 1) // workers)
+                with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(threads,)) as pool:
+                    # жадты шектеу: бір уақытта workers*2 пакет қана жолда, нәтиже кіріс ретімен жазылады
+                    pending = deque()
+                    for batch in batches():
+                        pending.append(pool.apply_async(analyze_batch, (batch,)))
+                        if len(pending) >= workers * 2:
+                            write(pending.popleft().get())
+                    while pending:
+                        write(pending.popleft().get())
+            checkpoint(n, complete=True)
+        except KeyboardInterrupt:
+            self.stderr.write(f"Тоқтатылды; соңғы checkpoint: {ckpt_path}")
+            raise
+        finally:
+            if out is not None:
+                out.close()
+        self.stdout.write(self.style.SUCCESS(
+            f"{n - done} құжат өңделді ({time.time() - t0:.1f} с), барлығы {n} -> {out_path}"
+        ))
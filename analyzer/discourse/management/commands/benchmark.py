@@ -0,0 +1,66 @@
+# analyzer/discourse/management/commands/benchmark.py
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from discourse.bench import build_stages, compare, make_corpus, run_suite
+
+
+class Command(BaseCommand):
+    help = "Анализ кезеңдерінің микро-бенчмаркы: JSON нәтиже, baseline-мен салыстыру, регрессияларды белгілеу."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--only", default="", help="Үтірмен бөлінген кезең аттарының бөліктері (мыс. onto,regex)")
+        parser.add_argument("--texts", type=int, default=200, help="discourse_data.json-нан алынатын мәтін саны")
+        parser.add_argument("--speech-sentences", type=int, default=2000)
+        parser.add_argument("--debate-turns", type=int, default=400)
+        parser.add_argument("--output", default=None, help="Нәтиже JSON (әдепкі: stdout)")
+        parser.add_argument("--baseline", default=None, help="Салыстыратын baseline JSON")
+        parser.add_argument("--save-baseline", default=None, help="Осы нәтижені baseline ретінде сақтау")
+        parser.add_argument("--threshold", type=float, default=0.2, help="Регрессия шегі (median, салыстырмалы)")
+        parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Бұдан аз айырма шу деп есептеледі")
+        parser.add_argument("--fail-on-regression", action="store_true")
+
+    def handle(self, *args, **opts):
+        corpus = make_corpus(opts["texts"], opts["speech_sentences"], opts["debate_turns"])
+        only = [o.strip() for o in opts["only"].split(",") if o.strip()]
+
+        def progress(name, res):
+            msg = res.get("skipped") and f"skipped ({res['skipped']})" or f"{res['median_ms']:.2f} ms"
+            self.stderr.write(f"{name:28s} {msg}")
+
+        report = run_suite(build_stages(corpus), repeat=max(1, opts["repeat"]), only=only, on_stage=progress)
+        report["meta"]["corpus"] = {"texts": len(corpus["texts"]), "speech_chars": len(corpus["speech"]),
+                                    "debate_chars": len(corpus["debate"])}
+
+        if opts["baseline"]:
+            path = Path(opts["baseline"])
+            if not path.exists():
+                raise CommandError(f"Baseline жоқ: {path}")
+            report["comparison"] = compare(report, json.loads(path.read_text(encoding="utf-8")),
+                                           threshold=opts["threshold"], min_delta_ms=opts["min_delta_ms"])
+
+        out = json.dumps(report, ensure_ascii=False, indent=2)
+        if opts["output"]:
+            Path(opts["output"]).write_text(out, encoding="utf-8")
+        else:
+            self.stdout.write(out)
+        if opts["save_baseline"]:
+            Path(opts["save_baseline"]).write_text(out, encoding="utf-8")
+
+        cmp = report.get("comparison")
+        if cmp:
+            if not cmp["same_node"]:
+                self.stderr.write("Ескерту: baseline басқа машинада өлшенген – салыстыру дәл болмауы мүмкін")
+            for name in cmp["regressions"]:
+                row = cmp["stages"][name]
+                self.stderr.write(self.style.ERROR(
+                    f"РЕГРЕССИЯ {name}: {row['baseline_ms']:.2f} -> {row['current_ms']:.2f} ms (x{row['ratio']})"))
+            for name in cmp["improvements"]:
+                row = cmp["stages"][name]
+                self.stderr.write(self.style.SUCCESS(
+                    f"жақсарды {name}: {row['baseline_ms']:.2f} -> {row['current_ms']:.2f} ms (x{row['ratio']})"))
+            if cmp["regressions"] and opts["fail_on_regression"]:
+                raise CommandError(f"{len(cmp['regressions'])} кезең баяулады")
@@ -0,0 +1,36 @@
+# analyzer/discourse/management/commands/build_onto_snapshot.py
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from discourse.onto_runtime import ONTO_PATH, ONTO_SNAPSHOT_PATH, compile_graph
+from discourse.onto_snapshot import write_snapshot
+
+
+class Command(BaseCommand):
+    help = "OWL онтологиясын rdflib-сіз жүктелетін бинарлық snapshot-қа компиляциялау."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", default=str(ONTO_PATH), help="OWL/RDF файлы")
+        parser.add_argument("--output", default=None, help="Snapshot жолы (әдепкі: POLISENT_ONTO_SNAPSHOT)")
+
+    def handle(self, *args, **opts):
+        try:
+            from rdflib import Graph
+        except ImportError as e:
+            raise CommandError(f"Snapshot құру үшін rdflib керек: {e}")
+        source = Path(opts["source"])
+        if not source.exists():
+            raise CommandError(f"Ontology not found: {source}")
+        output = Path(opts["output"]) if opts["output"] else ONTO_SNAPSHOT_PATH
+        if opts["output"] is None and source != ONTO_PATH:
+            output = source.with_name(source.name + ".snap")
+
+        g = Graph()
+        g.parse(str(source))
+        payload = compile_graph(g)
+        size = write_snapshot(output, payload, source)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(g)} triple -> {len(payload['label_index'])} label, "
+            f"{len(payload['types'])} типтелген IRI, {len(payload['facts'])} қасиет жазбасы; {output} ({size} байт)"
+        ))
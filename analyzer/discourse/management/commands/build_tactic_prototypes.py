@@ -0,0 +1,44 @@
+# analyzer/discourse/management/commands/build_tactic_prototypes.py
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from discourse import views
+from discourse.index_registry import content_digest
+from discourse.result_cache import source_digest
+from discourse.tactic_prototypes import TacticPrototypes, lexicon_terms
+
+
+class Command(BaseCommand):
+    help = "Лексикон терминдерін энкодермен кодтап, тактика прототиптерінің матрицасын (.npz) сақтау."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lexicon", default=views.PD_JSON_PATH)
+        parser.add_argument("--output", default=views.PROTOTYPES_PATH)
+        parser.add_argument("--batch-size", type=int, default=16)
+        parser.add_argument("--temperature", type=float, default=0.05,
+                            help="softmax(cosine / T): кіші болса, бағалар өткірірек")
+
+    def handle(self, *args, **opts):
+        lexicon = Path(opts["lexicon"])
+        if not lexicon.exists():
+            raise CommandError(f"Лексикон жоқ: {lexicon}")
+        terms = lexicon_terms(lexicon)
+        if not any(terms.values()):
+            raise CommandError("Лексиконда термин жоқ")
+        try:
+            encoder = views.get_text_encoder()
+        except Exception as e:
+            raise CommandError(f"Энкодер жүктелмеді: {str(e).splitlines()[0] if str(e) else type(e).__name__}")
+        encoder.batch_size = max(1, opts["batch_size"])
+
+        t0 = time.perf_counter()
+        protos = TacticPrototypes.build(encoder, terms, temperature=opts["temperature"])
+        protos.meta.update({"model": source_digest(views.MODEL_DIR), "lexicon": content_digest([lexicon])})
+        path = protos.save(opts["output"])
+        self.stdout.write(json.dumps({
+            "path": str(path), "version": protos.version, "tactics": protos.labels,
+            "unique_terms": protos.meta["unique_terms"], "seconds": round(time.perf_counter() - t0, 2),
+        }, ensure_ascii=False))
@@ -0,0 +1,101 @@
+# analyzer/discourse/management/commands/export_onnx.py
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from discourse import views
+from discourse.nli_engine import NLIEngine
+
+
+class Command(BaseCommand):
+    help = ("hf/xnli_mdl-ді ONNX-ке экспорттап, dynamic int8 квантизация жасау; "
+            "--check fp32 torch бағаларымен сәйкестігін тексереді.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model-dir", default=str(views.MODEL_DIR))
+        parser.add_argument("--tokenizer-dir", default=str(views.TOKENIZER_DIR))
+        parser.add_argument("--output-dir", default=str(views.ONNX_DIR))
+        parser.add_argument("--opset", type=int, default=17)
+        parser.add_argument("--no-quantize", action="store_true", help="Тек fp32 model.onnx")
+        parser.add_argument("--check", action="store_true", help="Экспорттан кейін parity тексеру")
+        parser.add_argument("--check-only", action="store_true", help="Экспортсыз, барларын тексеру")
+        parser.add_argument("--samples", type=int, default=32, help="Тексерілетін мәтін саны (discourse_data.json)")
+        parser.add_argument("--tolerance", type=float, default=0.05, help="int8 үшін рұқсат етілген max |Δscore|")
+        parser.add_argument("--min-agreement", type=float, default=0.95, help="int8 top-1 сәйкестігінің төменгі шегі")
+
+    def handle(self, *args, **opts):
+        try:
+            from discourse import onnx_backend as ob
+            import onnxruntime  # noqa: F401
+        except ImportError as e:
+            raise CommandError(f"ONNX backend үшін onnx және onnxruntime керек: {e}")
+        model_dir, out_dir = Path(opts["model_dir"]), Path(opts["output_dir"])
+
+        if not opts["check_only"]:
+            if not model_dir.exists():
+                raise CommandError(f"Model not found: {model_dir}")
+            path = ob.export_onnx(model_dir, out_dir, opset=opts["opset"])
+            self.stdout.write(f"fp32: {path} ({_size_mb(path):.0f} MB)")
+            if not opts["no_quantize"]:
+                q = ob.quantize_onnx(path)
+                self.stdout.write(f"int8: {q} ({_size_mb(q):.0f} MB)")
+
+        if opts["check"] or opts["check_only"]:
+            self._check(ob, model_dir, Path(opts["tokenizer_dir"]), out_dir, opts)
+        self.stdout.write(self.style.SUCCESS(
+            f"Дайын. Қосу үшін: POLISENT_NLI_BACKEND=onnx POLISENT_ONNX_DIR={out_dir}"))
+
+    def _check(self, ob, model_dir, tok_dir, out_dir, opts):
+        from transformers import AutoConfig, AutoTokenizer, pipeline
+
+        tok = AutoTokenizer.from_pretrained(str(tok_dir))
+        config = AutoConfig.from_pretrained(str(model_dir))
+        reference = NLIEngine.from_pipeline(
+            pipeline("zero-shot-classification", model=str(model_dir), tokenizer=tok, device=-1))
+        d = views.FORM_DEFAULTS
+        tasks = []
+        for text in _sample_texts(opts["samples"]):
+            tasks.append(views.base_task(text, d["domain"], d["source"], d["task"]))
+            t_task = views.tactic_task(text)
+            if t_task is not None:
+                tasks.append(t_task)
+        if not tasks:
+            raise CommandError("Тексеруге мәтін табылмады")
+
+        report = {}
+        for name, quantized in (("fp32", False), ("int8", True)):
+            try:
+                path = ob.resolve_model_path(out_dir, quantized=quantized)
+            except FileNotFoundError:
+                continue
+            engine = ob.build_onnx_engine(tok, config, path)
+            report[name] = ob.parity(reference, engine, tasks)
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+
+        worst = report.get("int8") or report.get("fp32")
+        if worst is None:
+            raise CommandError(f"{out_dir} ішінде ONNX моделі жоқ")
+        if worst["max_abs_diff"] > opts["tolerance"] or worst["top1_agreement"] < opts["min_agreement"]:
+            raise CommandError(
+                f"Parity өтпеді: max |Δscore|={worst['max_abs_diff']:.4f} (шегі {opts['tolerance']}), "
+                f"top-1={worst['top1_agreement']:.3f} (шегі {opts['min_agreement']})")
+
+
+def _sample_texts(n):
+    path = Path(views.__file__).resolve().parent / "discourse_data.json"
+    data = json.loads(path.read_text(encoding="utf-8"))
+    out = []
+    for rows in data.values():
+        for row in rows:
+            if isinstance(row, dict) and row.get("Мағынасы"):
+                out.append(str(row["Мағынасы"]))
+    # әр тактикадан біркелкі алу үшін қадаммен таңдаймыз
+    step = max(1, len(out) // max(1, n))
+    return out[::step][:n]
+
+
+def _size_mb(path):
+    path = Path(path)
+    data = path.with_name(path.name + ".data")   # >2GB салмақтар сыртқы файлда
+    return (path.stat().st_size + (data.stat().st_size if data.exists() else 0)) / 1024 ** 2
@@ -0,0 +1,66 @@
+# analyzer/discourse/management/commands/train_cascade.py
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from discourse import views
+from discourse.cascade import CascadeModel, HashedFeaturizer, load_tactic_dataset, pick_threshold, threshold_table
+
+
+class Command(BaseCommand):
+    help = "discourse_data.json-нан тактика каскадын (hashed n-gram + softmax) үйретіп, .npz артефакт сақтау."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--data", default=str(Path(views.__file__).resolve().parent / "discourse_data.json"))
+        parser.add_argument("--output", default=views.CASCADE_PATH)
+        parser.add_argument("--features", type=int, default=18, help="Hash кеңістігі: 2**N белгі")
+        parser.add_argument("--epochs", type=int, default=30)
+        parser.add_argument("--lr", type=float, default=0.5)
+        parser.add_argument("--l2", type=float, default=1e-5)
+        parser.add_argument("--holdout", type=float, default=0.2, help="Шекті таңдауға қалдырылатын үлес")
+        parser.add_argument("--target-precision", type=float, default=0.85,
+                            help="Ұсынылған шек: holdout-та осы дәлдікке жететін ең төмен сенімділік")
+        parser.add_argument("--seed", type=int, default=13)
+
+    def handle(self, *args, **opts):
+        data = Path(opts["data"])
+        if not data.exists():
+            raise CommandError(f"Дерек жоқ: {data}")
+        tactics, rows = load_tactic_dataset(data)
+        labels = views.get_tactic_labels()
+        if set(tactics) != set(labels):
+            raise CommandError(f"Дерек тактикалары {tactics} лексикондағы {labels} тізімімен сәйкес емес")
+        if len(rows) < 20:
+            raise CommandError(f"Белгіленген мысал тым аз: {len(rows)}")
+        texts = [t for t, _ in rows]
+        targets = [y for _, y in rows]
+        feat = HashedFeaturizer(n_features=1 << opts["features"])
+        params = {k: opts[k] for k in ("epochs", "lr", "l2", "seed")}
+
+        # holdout-та шек таңдалады, соңғы модель барлық дерекпен қайта үйретіледі
+        perm = np.random.default_rng(opts["seed"]).permutation(len(rows))
+        n_test = int(len(rows) * opts["holdout"])
+        table, threshold = [], 0.8
+        if n_test:
+            test, train = perm[:n_test], perm[n_test:]
+            probe = CascadeModel.train([texts[i] for i in train], [targets[i] for i in train], labels, feat, **params)
+            table = threshold_table(probe, [texts[i] for i in test], [targets[i] for i in test])
+            threshold = pick_threshold(table, opts["target_precision"], n=n_test)
+            for row in table:
+                prec = "-" if row["precision"] is None else f"{row['precision']:.3f}"
+                self.stderr.write(f"шек {row['threshold']:.2f}  қамту {row['coverage']:.3f}  дәлдік {prec}")
+
+        model = CascadeModel.train(texts, targets, labels, feat, **params)
+        model.meta = {
+            "data": {"path": data.name, "sha256": hashlib.sha256(data.read_bytes()).hexdigest(),
+                     "examples": len(rows)},
+            "params": {**params, "holdout": opts["holdout"], "target_precision": opts["target_precision"]},
+            "holdout": table,
+            "threshold": threshold,
+        }
+        path = model.save(opts["output"])
+        self.stdout.write(json.dumps({"path": str(path), "version": model.version, "threshold": threshold,
+                                      "examples": len(rows)}, ensure_ascii=False))
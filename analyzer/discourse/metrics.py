@@ -0,0 +1,170 @@
+# analyzer/discourse/metrics.py
+"""
+Процесс ішіндегі метрикалар және Prometheus мәтін форматы (/metrics).
+
+Тәуелділіксіз: counter/histogram/gauge жазбалары label жиыны бойынша сақталады.
+  inc("polisent_fallback_total", reason="nli")
+  with timed("speech"): ...          -> polisent_stage_seconds{stage="speech"}
+Мәндер әр worker процесінде бөлек (gunicorn т.б. – әр процесс өзін көрсетеді).
+Кэш сияқты сыртқы күйлер register_collector() арқылы scrape кезінде оқылады.
+"""
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+STAGE_METRIC = "polisent_stage_seconds"
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    STAGE_METRIC: "Анализ кезеңдерінің ұзақтығы (секунд)",
+    "polisent_requests_total": "HTTP сұраулары (endpoint бойынша)",
+    "polisent_documents_total": "Анализделген құжаттар",
+    "polisent_fallback_total": "Фолбэкке түскен жағдайлар (себеп бойынша)",
+    "polisent_errors_total": "Кезеңдердегі қателер",
+    "polisent_nli_batch_pairs": "Жоспарлаушы batch-індегі бірегей NLI жұптары",
+    "polisent_nli_batch_requests": "Жоспарлаушы batch-іне біріккен сұраулар",
+    "polisent_tactic_prune_total": "Лексикон сүзгісі (pruned – кандидаттар қысқарды, full – толық тізім)",
+    "polisent_infer_rejected_total": "Inference пулы толы болғандықтан қайтарылған сұраулар (429/503)",
+    "polisent_infer_inflight": "Inference пулында орындалып жатқан жұмыстар",
+    "polisent_infer_waiting": "Inference пулында орын күтіп тұрған сұраулар",
+    "polisent_index_reloads_total": "Индекстерді қайта құру әрекеттері (ok/error)",
+    "polisent_index_info": "Жүктелген индекс нұсқасы (version белгісінде)",
+    "polisent_index_age_seconds": "Индекс соңғы құрылғаннан бергі уақыт",
+    "polisent_debate_turns_total": "Сессиядағы репликалар (reused – қайта талданбады, analyzed – талданды)",
+    "polisent_debate_sessions": "Процестегі белсенді пікірсайыс сессиялары",
+    "polisent_cascade_total": "Каскад шешімдері (answered – каскад жауап берді, escalated – zero-shot-қа)",
+}
+
+_lock = threading.Lock()
+_counters: Dict[str, Dict[Tuple, float]] = {}
+_histograms: Dict[str, Dict[Tuple, List]] = {}   # labels -> [bucket санақтары..., sum, count]
+_buckets: Dict[str, Tuple[float, ...]] = {}
+_collectors: List[Callable[[], Iterable[Tuple[str, str, Dict[str, str], float]]]] = []
+
+
+def _key(labels: Dict[str, str]) -> Tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1.0, **labels) -> None:
+    k = _key(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[k] = series.get(k, 0.0) + value
+
+
+def observe(name: str, value: float, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **labels) -> None:
+    k = _key(labels)
+    with _lock:
+        bks = _buckets.setdefault(name, tuple(buckets))
+        series = _histograms.setdefault(name, {})
+        row = series.get(k)
+        if row is None:
+            row = series[k] = [0] * len(bks) + [0.0, 0]
+        i = bisect_left(bks, value)
+        if i < len(bks):
+            row[i] += 1   # кумулятивтік емес; render кезінде жинақталады
+        row[-2] += value
+        row[-1] += 1
+
+
+@contextmanager
+def timed(stage: str, metric: str = STAGE_METRIC):
+    """Кезең ұзақтығын histogram-ға жазу; қате болса да уақыт есептеледі (+ polisent_errors_total)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        inc("polisent_errors_total", stage=stage)
+        raise
+    finally:
+        observe(metric, time.perf_counter() - t0, stage=stage)
+
+
+def register_collector(fn: Callable[[], Iterable[Tuple[str, str, Dict[str, str], float]]]) -> None:
+    """fn() -> [(атау, тип "gauge"/"counter", labels, мән)] – scrape кезінде шақырылады."""
+    if fn not in _collectors:
+        _collectors.append(fn)
+
+
+def snapshot() -> Dict:
+    """Тесттер/benchmark үшін: {атау: {labels-tuple: мән немесе [buckets..., sum, count]}}."""
+    with _lock:
+        out = {n: dict(s) for n, s in _counters.items()}
+        out.update({n: {k: list(v) for k, v in s.items()} for n, s in _histograms.items()})
+    return out
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _buckets.clear()
+
+
+def _esc(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    items = list(labels)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_esc(v)}"' for k, v in items) + "}"
+
+
+def _num(v: float) -> str:
+    if not math.isfinite(v):
+        return "NaN" if math.isnan(v) else ("+Inf" if v > 0 else "-Inf")
+    if v == int(v) and abs(v) < 1e15:
+        return str(int(v))
+    return repr(float(v))
+
+
+def _header(lines: List[str], name: str, kind: str) -> None:
+    if name in HELP:
+        lines.append(f"# HELP {name} {HELP[name]}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def render() -> str:
+    """Prometheus text exposition format 0.0.4."""
+    lines: List[str] = []
+    with _lock:
+        counters = {n: dict(s) for n, s in _counters.items()}
+        histograms = {n: {k: list(v) for k, v in s.items()} for n, s in _histograms.items()}
+        buckets = dict(_buckets)
+
+    for name in sorted(counters):
+        _header(lines, name, "counter")
+        for k, v in sorted(counters[name].items()):
+            lines.append(f"{name}{_fmt_labels(k)} {_num(v)}")
+
+    for name in sorted(histograms):
+        _header(lines, name, "histogram")
+        bks = buckets[name]
+        for k, row in sorted(histograms[name].items()):
+            acc = 0
+            for le, n in zip(bks, row):
+                acc += n
+                lines.append(f"{name}_bucket{_fmt_labels(k + (('le', _num(le)),))} {acc}")
+            lines.append(f"{name}_bucket{_fmt_labels(k + (('le', '+Inf'),))} {row[-1]}")
+            lines.append(f"{name}_sum{_fmt_labels(k)} {_num(row[-2])}")
+            lines.append(f"{name}_count{_fmt_labels(k)} {row[-1]}")
+
+    grouped: Dict[str, Tuple[str, List]] = {}
+    for fn in list(_collectors):
+        try:
+            for name, kind, labels, value in fn():
+                grouped.setdefault(name, (kind, []))[1].append((_key(labels), value))
+        except Exception:
+            continue   # бір collector құласа, қалған метрикалар берілсін
+    for name in sorted(grouped):
+        kind, rows = grouped[name]
+        _header(lines, name, kind)
+        for k, v in rows:
+            lines.append(f"{name}{_fmt_labels(k)} {_num(v)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,174 @@
+# analyzer/discourse/nli_engine.py
+"""
+Zero-shot NLI үшін batched қозғалтқыш.
+
+HF zero-shot pipeline әр (мәтін, гипотеза) жұбын бөлек forward-пен өткізеді.
+Мұнда бірнеше тапсырманың (sentiment/emotion + тактика) барлық жұптары бір
+шақыруда жиналады: әр мәтін мен гипотеза бір-ақ рет токенизацияланады, жұптар
+ұзындығы бойынша сұрыпталып, padding-пен batch-терге бөлінеді.
+Қайтарым пішіні pipeline-дікімен бірдей: {"sequence", "labels", "scores"}.
+"""
+import os
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+NLI_BATCH_SIZE = int(os.getenv("POLISENT_NLI_BATCH_SIZE", "16"))
+
+
+class NLITask(NamedTuple):
+    premise: str
+    labels: Sequence[str]
+    hypothesis_template: str
+
+
+def _max_length(tokenizer, config) -> int:
+    # model_max_length кейде 1e30 болып келеді — позициялық эмбеддинг шегіне қысамыз
+    limit = getattr(tokenizer, "model_max_length", None) or 512
+    pos = getattr(config, "max_position_embeddings", None)
+    if pos:
+        limit = min(limit, pos - 2)
+    return int(limit)
+
+
+def _entailment_id(config) -> int:
+    for label, ind in (getattr(config, "label2id", None) or {}).items():
+        if label.lower().startswith("entail"):
+            return int(ind)
+    return -1
+
+
+def _pair_template(tokenizer) -> Tuple[List[int], List[int], List[int]]:
+    """
+    Жұп үшін арнайы токендер үлгісі: prefix + A + middle + B + suffix.
+    build_inputs_with_special_tokens барлық нұсқада жоқ, сондықтан бір рет сынап аламыз.
+    """
+    a = tokenizer("a", add_special_tokens=False)["input_ids"]
+    b = tokenizer("b", add_special_tokens=False)["input_ids"]
+    full = tokenizer("a", "b")["input_ids"]
+    for i in range(len(full)):
+        if full[i:i + len(a)] == a:
+            rest = full[i + len(a):]
+            for j in range(len(rest)):
+                if rest[j:j + len(b)] == b:
+                    return full[:i], rest[:j], rest[j + len(b):]
+    raise ValueError("Токенайзердің жұп үлгісін анықтау мүмкін болмады")
+
+
+def postprocess(labels: Sequence[str], logits: np.ndarray, entailment_id: int,
+                multi_label: bool = False) -> Dict:
+    """pipeline.postprocess-тің көшірмесі: logits [n_labels, n_classes] -> labels/scores."""
+    if multi_label or len(labels) == 1:
+        contradiction_id = -1 if entailment_id == 0 else 0
+        ec = logits[..., [contradiction_id, entailment_id]]
+        scores = (np.exp(ec) / np.exp(ec).sum(-1, keepdims=True))[..., 1]
+    else:
+        ent = logits[..., entailment_id]
+        scores = np.exp(ent) / np.exp(ent).sum(-1, keepdims=True)
+    top = list(reversed(scores.argsort()))
+    return {"labels": [labels[i] for i in top], "scores": scores[top].tolist()}
+
+
+class NLIEngine:
+    """
+    forward(input_ids, attention_mask) -> logits [B, n_classes] (np.ndarray).
+    Backend (torch/ONNX т.б.) тек осы функция арқылы ауысады; backend – оның атауы (кэш кілтіне).
+    """
+
+    def __init__(self, tokenizer, forward: Callable[[np.ndarray, np.ndarray], np.ndarray],
+                 entailment_id: int, max_length: int = 512, batch_size: int = NLI_BATCH_SIZE,
+                 backend: str = "torch"):
+        self.tokenizer = tokenizer
+        self.forward = forward
+        self.backend = backend
+        self.entailment_id = entailment_id
+        self.max_length = max_length
+        self.batch_size = max(1, batch_size)
+        self.pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else 0
+        self._prefix, self._middle, self._suffix = _pair_template(tokenizer)
+        self._n_special = len(self._prefix) + len(self._middle) + len(self._suffix)
+
+    @classmethod
+    def from_pipeline(cls, clf, **kw) -> "NLIEngine":
+        """Бар zero-shot pipeline-нің моделі мен токенайзерін қайта қолданамыз."""
+        import torch
+        model, tok = clf.model, clf.tokenizer
+
+        def forward(input_ids, attention_mask):
+            with torch.inference_mode():
+                out = model(
+                    input_ids=torch.from_numpy(input_ids).to(model.device),
+                    attention_mask=torch.from_numpy(attention_mask).to(model.device),
+                )
+            return out.logits.float().cpu().numpy()
+
+        return cls(tok, forward, _entailment_id(model.config),
+                   max_length=_max_length(tok, model.config), **kw)
+
+    # --- токенизация
+    def _ids(self, text: str, cache: Dict[str, List[int]]) -> List[int]:
+        ids = cache.get(text)
+        if ids is None:
+            ids = self.tokenizer(text, add_special_tokens=False)["input_ids"]
+            cache[text] = ids
+        return ids
+
+    def encode_pairs(self, pairs: Sequence[Tuple[str, str]]) -> List[List[int]]:
+        """only_first truncation: гипотеза қысқармайды, мәтін оң жағынан кесіледі."""
+        cache: Dict[str, List[int]] = {}
+        out = []
+        for premise, hypothesis in pairs:
+            p, h = self._ids(premise, cache), self._ids(hypothesis, cache)
+            room = self.max_length - self._n_special - len(h)
+            if len(p) > room > 0:
+                p = p[:room]
+            out.append(self._prefix + p + self._middle + h + self._suffix)
+        return out
+
+    # --- inference
+    def run_encoded(self, encoded: Sequence[Sequence[int]]) -> np.ndarray:
+        """Ұзындығы жақын тізбектерді бір batch-ке жинап, logits-ті кіріс ретімен қайтарады."""
+        order = sorted(range(len(encoded)), key=lambda i: len(encoded[i]))
+        rows: List[np.ndarray] = [None] * len(encoded)
+        for b in range(0, len(order), self.batch_size):
+            idx = order[b:b + self.batch_size]
+            width = len(encoded[idx[-1]])
+            ids = np.full((len(idx), width), self.pad_id, dtype=np.int64)
+            mask = np.zeros((len(idx), width), dtype=np.int64)
+            for r, i in enumerate(idx):
+                seq = encoded[i]
+                ids[r, :len(seq)] = seq
+                mask[r, :len(seq)] = 1
+            logits = self.forward(ids, mask)
+            for r, i in enumerate(idx):
+                rows[i] = logits[r]
+        return np.stack(rows)
+
+    def score_pairs(self, pairs: Sequence[Tuple[str, str]]) -> np.ndarray:
+        return self.run_encoded(self.encode_pairs(pairs))
+
+    @staticmethod
+    def task_pairs(tasks: Sequence[NLITask]) -> Tuple[List[Tuple[str, str]], List[Tuple[int, int]]]:
+        """Тапсырмалар -> (мәтін, гипотеза) жұптары және әр тапсырманың [s, e) шекарасы."""
+        pairs, bounds = [], []
+        for t in tasks:
+            start = len(pairs)
+            pairs.extend((t.premise, t.hypothesis_template.format(l)) for l in t.labels)
+            bounds.append((start, len(pairs)))
+        return pairs, bounds
+
+    def assemble(self, tasks: Sequence[NLITask], bounds: Sequence[Tuple[int, int]],
+                 logits: Optional[np.ndarray], multi_label: bool = False) -> List[Dict]:
+        results = []
+        for t, (s, e) in zip(tasks, bounds):
+            res = {"sequence": t.premise, "labels": [], "scores": []}
+            if e > s:
+                res.update(postprocess(list(t.labels), logits[s:e], self.entailment_id, multi_label))
+            results.append(res)
+        return results
+
+    def classify(self, tasks: Sequence[NLITask], multi_label: bool = False) -> List[Dict]:
+        """Барлық тапсырманың жұптарын бір шақыруда есептеп, әр тапсырмаға pipeline пішінін береді."""
+        pairs, bounds = self.task_pairs(tasks)
+        logits = self.score_pairs(pairs) if pairs else None
+        return self.assemble(tasks, bounds, logits, multi_label)
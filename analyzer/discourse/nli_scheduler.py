@@ -0,0 +1,130 @@
+# analyzer/discourse/nli_scheduler.py
+"""
+Қатар келген сұраулардың NLI жұптарын бір batch-ке жинайтын micro-batching жоспарлаушы.
+
+Django ағындары classify() шақырады да, күтеді; жалғыз dispatcher ағыны кезектегі
+сұрауларды терезе (POLISENT_NLI_WINDOW_MS) немесе жұп саны (POLISENT_NLI_MAX_BATCH)
+шегіне дейін жинап, барлық жұптарды бір run_encoded()-пен (ұзындық бойынша padding)
+есептейді, нәтижені иелеріне таратады. Модель бос емес кезде жаңа сұраулар өздігінен
+жиналады; жалғыз сұрау терезеден артық күтпейді.
+Интерфейс NLIEngine.classify-пен бірдей.
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .metrics import STAGE_METRIC, observe
+from .nli_engine import NLIEngine, NLITask
+
+NLI_WINDOW_MS = float(os.getenv("POLISENT_NLI_WINDOW_MS", "5"))
+NLI_MAX_BATCH = int(os.getenv("POLISENT_NLI_MAX_BATCH", "64"))
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+class _Request:
+    __slots__ = ("pairs", "enqueued", "done", "logits", "error")
+
+    def __init__(self, pairs: List[Tuple[str, str]]):
+        self.pairs = pairs
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.logits: Optional[np.ndarray] = None
+        self.error: Optional[BaseException] = None
+
+
+class NLIScheduler:
+    def __init__(self, engine: NLIEngine, window_ms: float = NLI_WINDOW_MS, max_batch: int = NLI_MAX_BATCH):
+        self.engine = engine
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._queue: "deque[_Request]" = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+
+    def classify(self, tasks: Sequence[NLITask], multi_label: bool = False) -> List[Dict]:
+        pairs, bounds = self.engine.task_pairs(tasks)
+        logits = self._submit(pairs) if pairs else None
+        return self.engine.assemble(tasks, bounds, logits, multi_label)
+
+    def _submit(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        req = _Request(pairs)
+        with self._cond:
+            self._ensure_thread()
+            self._queue.append(req)
+            self._cond.notify()
+        req.done.wait()
+        if req.error is not None:
+            raise req.error
+        return req.logits
+
+    def _ensure_thread(self) -> None:
+        # fork-тан кейін ағын балаға өтпейді – процесс ауысса, қайта іске қосамыз
+        if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+            if self._pid is not None and self._pid != os.getpid():
+                self._queue.clear()   # ата-процестің кезегі – оның күтушілері мұнда жоқ
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._loop, name="polisent-nli", daemon=True)
+            self._thread.start()
+
+    def _take(self) -> List[_Request]:
+        """Кезектен batch алу: біріншісін күтеміз, содан кейін терезе/шек біткенше жинаймыз."""
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            batch = [self._queue.popleft()]
+            n = len(batch[0].pairs)
+            deadline = time.perf_counter() + self.window
+            while n < self.max_batch:
+                if self._queue:
+                    if n + len(self._queue[0].pairs) > self.max_batch:
+                        break
+                    req = self._queue.popleft()
+                    batch.append(req)
+                    n += len(req.pairs)
+                    continue
+                left = deadline - time.perf_counter()
+                if left <= 0:
+                    break
+                self._cond.wait(left)
+            return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._take()
+            try:
+                self._run(batch)
+            except BaseException as e:
+                for req in batch:
+                    req.error = e
+            finally:
+                for req in batch:
+                    req.done.set()
+
+    def _run(self, batch: List[_Request]) -> None:
+        # бірдей жұптар (бір мәтін бірнеше сұрауда) бір рет есептеледі
+        index: Dict[Tuple[str, str], int] = {}
+        unique: List[Tuple[str, str]] = []
+        rows = []
+        for req in batch:
+            r = []
+            for pair in req.pairs:
+                i = index.get(pair)
+                if i is None:
+                    i = index[pair] = len(unique)
+                    unique.append(pair)
+                r.append(i)
+            rows.append(r)
+        started = time.perf_counter()
+        for req in batch:
+            observe(STAGE_METRIC, started - req.enqueued, stage="nli_queue_wait")
+        observe("polisent_nli_batch_pairs", len(unique), buckets=BATCH_BUCKETS)
+        observe("polisent_nli_batch_requests", len(batch), buckets=BATCH_BUCKETS)
+        logits = self.engine.score_pairs(unique)
+        observe(STAGE_METRIC, time.perf_counter() - started, stage="nli_batch_run")
+        for req, r in zip(batch, rows):
+            req.logits = logits[r]
@@ -0,0 +1,165 @@
+# analyzer/discourse/nli_windows.py
+"""
+Ұзын мәтіндер үшін сөйлем шекарасымен терезелік zero-shot inference.
+
+Мәтін (premise) модельдің ұзындық шегіне сыймаса, sent_tokenize сөйлемдері токен
+бюджетіне (max_length − арнайы токендер − ең ұзын гипотеза) дейін терезелерге жиналады;
+бюджеттен ұзын жалғыз сөйлем токен офсеттері бойынша бөлінеді. Барлық терезелер бір
+batch-те есептеліп, label бағалары біріктіріледі (pooling):
+  mean      – терезелердің орташасы
+  max       – әр label-дің ең үлкен бағасы (single-label-да қайта нормаланады)
+  weighted  – терезе ұзындығымен (токен) салмақталған орташа (әдепкі)
+Нәтижеде "windows": [{"span", "tokens", "labels", "scores"}] – әр терезенің өз бағасы.
+
+  POLISENT_NLI_WINDOWS        auto (тек шектен ұзын мәтін) | always | off
+  POLISENT_NLI_POOLING        weighted | mean | max
+  POLISENT_NLI_WINDOW_TOKENS  терезе бюджеті (0 – модель шегінен есептеледі)
+  POLISENT_NLI_WINDOW_OVERLAP көрші терезелер ортақ сөйлем саны (әдепкі 0)
+"""
+import os
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .doc_context import sent_tokenize
+from .nli_engine import NLIEngine, NLITask
+
+WINDOW_MODE = os.getenv("POLISENT_NLI_WINDOWS", "auto").lower()
+WINDOW_POOLING = os.getenv("POLISENT_NLI_POOLING", "weighted").lower()
+WINDOW_TOKENS = int(os.getenv("POLISENT_NLI_WINDOW_TOKENS", "0"))
+WINDOW_OVERLAP = int(os.getenv("POLISENT_NLI_WINDOW_OVERLAP", "0"))
+POOLINGS = ("mean", "max", "weighted")
+
+
+def _n_tokens(tokenizer, text: str) -> int:
+    return len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+
+# бір таңбаға ең көп токен: sentencepiece (xlm-roberta) ≤ 1 (+ бастапқы ▁), byte-level BPE
+# кирилицада ≤ 2 байт; қор NFKC кеңеюіне де жетеді
+_MAX_TOKENS_PER_CHAR = 2
+
+
+def exceeds_budget(tokenizer, text: str, budget: int) -> bool:
+    """Мәтін бюджеттен ұзын ба; қысқа мәтін таңба санымен шешіледі (токенизациясыз)."""
+    if len(text) * _MAX_TOKENS_PER_CHAR + 1 <= budget:
+        return False
+    return _n_tokens(tokenizer, text) > budget
+
+
+def _split_long(tokenizer, text: str, s: int, e: int, budget: int) -> List[Tuple[int, int, int]]:
+    """Бюджеттен ұзын сөйлемді токен шекарасымен бөлу: [(start, end, токен саны)]."""
+    chunk = text[s:e]
+    if getattr(tokenizer, "is_fast", False):
+        offsets = tokenizer(chunk, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+        out = []
+        for i in range(0, len(offsets), budget):
+            part = offsets[i:i + budget]
+            out.append((s + part[0][0], s + part[-1][1], len(part)))
+        return out
+    # баяу токенайзер: таңба үлесімен шамалаймыз
+    n = _n_tokens(tokenizer, chunk)
+    pieces = -(-n // budget)
+    step = -(-len(chunk) // pieces)
+    return [(s + i, min(e, s + i + step), min(budget, n)) for i in range(0, len(chunk), step)]
+
+
+def split_windows(tokenizer, text: str, budget: int, overlap: int = 0) -> List[Tuple[int, int, int]]:
+    """Сөйлемдерді бюджетке дейін жинау: [(start, end, токен саны)], text[start:end] – терезе."""
+    units: List[Tuple[int, int, int]] = []
+    for s, e, chunk in sent_tokenize(text):
+        # sent_tokenize шеткі бос орынды алып тастайды – нақты офсетті қалпына келтіреміз
+        s = text.find(chunk, s)
+        e = s + len(chunk)
+        n = _n_tokens(tokenizer, chunk)
+        if n > budget:
+            units.extend(_split_long(tokenizer, text, s, e, budget))
+        else:
+            units.append((s, e, n))
+    windows, i = [], 0
+    while i < len(units):
+        j, total = i, 0
+        while j < len(units) and (j == i or total + units[j][2] <= budget):
+            total += units[j][2]
+            j += 1
+        windows.append((units[i][0], units[j - 1][1], total))
+        if j >= len(units):
+            break
+        i = max(i + 1, j - max(0, overlap))
+    return windows
+
+
+def pool_scores(labels: Sequence[str], window_scores: List[Dict[str, float]], weights: Sequence[float],
+                pooling: str = "weighted", multi_label: bool = False) -> Dict:
+    m = np.array([[ws[l] for l in labels] for ws in window_scores], dtype=np.float64)
+    if pooling == "max":
+        scores = m.max(axis=0)
+        if not multi_label and scores.sum() > 0:
+            scores = scores / scores.sum()
+    elif pooling == "mean":
+        scores = m.mean(axis=0)
+    else:
+        w = np.asarray(weights, dtype=np.float64)
+        scores = (m * w[:, None]).sum(axis=0) / max(w.sum(), 1e-12)
+    top = list(reversed(scores.argsort(kind="stable")))
+    return {"labels": [labels[i] for i in top], "scores": [float(scores[i]) for i in top]}
+
+
+class WindowedClassifier:
+    """runner (NLIEngine немесе NLIScheduler) алдындағы қабат; classify() интерфейсі бірдей."""
+
+    def __init__(self, runner, engine: NLIEngine, mode: str = WINDOW_MODE, pooling: str = WINDOW_POOLING,
+                 window_tokens: int = WINDOW_TOKENS, overlap: int = WINDOW_OVERLAP):
+        self.runner = runner
+        self.engine = engine
+        self.mode = mode
+        self.pooling = pooling if pooling in POOLINGS else "weighted"
+        self.window_tokens = window_tokens
+        self.overlap = overlap
+        self._hyp_len: Dict[str, int] = {}
+
+    def budget(self, task: NLITask) -> int:
+        """premise-ке қалатын токен саны: ең ұзын гипотеза мен арнайы токендерден кейін."""
+        hyp = 0
+        for label in task.labels:
+            h = task.hypothesis_template.format(label)
+            if h not in self._hyp_len:
+                self._hyp_len[h] = _n_tokens(self.engine.tokenizer, h)
+            hyp = max(hyp, self._hyp_len[h])
+        room = self.engine.max_length - self.engine._n_special - hyp
+        if self.window_tokens > 0:
+            room = min(room, self.window_tokens)
+        return max(16, room)
+
+    def classify(self, tasks: Sequence[NLITask], multi_label: bool = False) -> List[Dict]:
+        if self.mode == "off":
+            return self.runner.classify(tasks, multi_label)
+        flat: List[NLITask] = []
+        plans = []   # әр тапсырма: (flat ішіндегі [s, e), терезелер немесе None)
+        for t in tasks:
+            budget = self.budget(t)
+            windows = None
+            # auto: қысқа мәтін encode_pairs-тен бұрын екінші рет токенизацияланбайды
+            if self.mode == "always" or exceeds_budget(self.engine.tokenizer, t.premise, budget):
+                windows = split_windows(self.engine.tokenizer, t.premise, budget, self.overlap)
+            start = len(flat)
+            if windows and (len(windows) > 1 or self.mode == "always"):
+                flat.extend(NLITask(t.premise[s:e], t.labels, t.hypothesis_template) for s, e, _ in windows)
+            else:
+                windows = None
+                flat.append(t)
+            plans.append((start, len(flat), windows))
+
+        outs = self.runner.classify(flat, multi_label) if flat else []
+        results = []
+        for t, (s, e, windows) in zip(tasks, plans):
+            if windows is None:
+                results.append(outs[s])
+                continue
+            per = [dict(zip(o["labels"], o["scores"])) for o in outs[s:e]]
+            res = {"sequence": t.premise, "pooling": self.pooling}
+            res.update(pool_scores(list(t.labels), per, [n for _, _, n in windows], self.pooling, multi_label))
+            res["windows"] = [{"span": [ws, we], "tokens": n, "labels": o["labels"], "scores": o["scores"]}
+                              for (ws, we, n), o in zip(windows, outs[s:e])]
+            results.append(res)
+        return results
@@ -0,0 +1,127 @@
+# analyzer/discourse/onnx_backend.py
+"""
+XNLI моделінің ONNX Runtime (CPU) backend-і.
+
+`manage.py export_onnx` hf/xnli_mdl-ді бір рет ONNX-ке экспорттап, dynamic int8
+квантизация жасайды (model.onnx -> model.int8.onnx, meta.json). Runtime-та
+NLIEngine-ге тек forward ауысады: токенизация, batch-теу және postprocess сол күйі,
+сондықтан zero-shot нәтиже пішіні torch backend-імен бірдей.
+onnx/onnxruntime – міндетті емес тәуелділіктер; жоқ болса torch backend қалады.
+"""
+import inspect
+import json
+from pathlib import Path
+from typing import Dict, Sequence
+
+import numpy as np
+
+from .nli_engine import NLIEngine, NLITask, _entailment_id, _max_length
+from .result_cache import source_digest
+
+FP32_NAME = "model.onnx"
+INT8_NAME = "model.int8.onnx"
+META_NAME = "meta.json"
+# >2GB protobuf шегі: xlm-roberta-large fp32 салмақтары сыртқы файлға жазылады
+_PROTO_LIMIT = 2 * 1024 ** 3
+
+
+def export_onnx(model_dir, out_dir, opset: int = 17) -> Path:
+    """AutoModelForSequenceClassification -> model.onnx (batch/ұзындық осьтері динамикалық)."""
+    import torch
+    from transformers import AutoModelForSequenceClassification
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    model = AutoModelForSequenceClassification.from_pretrained(str(model_dir), attn_implementation="eager")
+    model.eval()
+    dummy = torch.ones((2, 8), dtype=torch.long)
+    path = out_dir / FP32_NAME
+    kw = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        kw["dynamo"] = False   # TorchScript экспортері: dynamic_axes тікелей қолдау табады
+    with torch.inference_mode():
+        torch.onnx.export(
+            model, (dummy, torch.ones_like(dummy)), str(path),
+            input_names=["input_ids", "attention_mask"], output_names=["logits"],
+            dynamic_axes={"input_ids": {0: "batch", 1: "seq"},
+                          "attention_mask": {0: "batch", 1: "seq"},
+                          "logits": {0: "batch"}},
+            opset_version=opset, do_constant_folding=True, **kw,
+        )
+    write_meta(out_dir, model_dir, model.config, opset)
+    return path
+
+
+def quantize_onnx(fp32_path, int8_path=None) -> Path:
+    """Dynamic int8 (салмақтар QInt8, активациялар runtime-та) – калибрация деректері керек емес."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    fp32_path = Path(fp32_path)
+    int8_path = Path(int8_path) if int8_path else fp32_path.with_name(INT8_NAME)
+    external = sum(f.stat().st_size for f in fp32_path.parent.iterdir() if f.is_file()) > _PROTO_LIMIT
+    quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8,
+                     use_external_data_format=external)
+    return int8_path
+
+
+def write_meta(out_dir, model_dir, config, opset: int) -> None:
+    meta = {
+        "source": str(model_dir),
+        "source_digest": source_digest(model_dir),
+        "entailment_id": _entailment_id(config),
+        "max_position_embeddings": getattr(config, "max_position_embeddings", None),
+        "opset": opset,
+    }
+    (Path(out_dir) / META_NAME).write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def read_meta(onnx_dir) -> Dict:
+    p = Path(onnx_dir) / META_NAME
+    return json.loads(p.read_text(encoding="utf-8")) if p.exists() else {}
+
+
+def onnx_forward(path, threads: int = 0):
+    """InferenceSession-ді NLIEngine forward-ына орау: (input_ids, attention_mask) -> logits."""
+    import onnxruntime as ort
+
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        opts.intra_op_num_threads = threads
+    sess = ort.InferenceSession(str(path), sess_options=opts, providers=["CPUExecutionProvider"])
+
+    def forward(input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        feed = {"input_ids": input_ids.astype(np.int64), "attention_mask": attention_mask.astype(np.int64)}
+        return sess.run(["logits"], feed)[0].astype(np.float32)
+
+    return forward
+
+
+def build_onnx_engine(tokenizer, config, path, threads: int = 0, **kw) -> NLIEngine:
+    return NLIEngine(tokenizer, onnx_forward(path, threads), _entailment_id(config),
+                     max_length=_max_length(tokenizer, config), **kw)
+
+
+def resolve_model_path(onnx_dir, quantized: bool = True) -> Path:
+    onnx_dir = Path(onnx_dir)
+    path = onnx_dir / (INT8_NAME if quantized else FP32_NAME)
+    if not path.exists():
+        raise FileNotFoundError(f"ONNX model not found: {path} (`manage.py export_onnx` іске қосыңыз)")
+    return path
+
+
+def parity(reference: NLIEngine, engine: NLIEngine, tasks: Sequence[NLITask]) -> Dict[str, float]:
+    """Екі engine-нің zero-shot бағаларын салыстыру: label бойынша score айырмасы және top-1 сәйкестігі."""
+    ref, out = reference.classify(tasks), engine.classify(tasks)
+    diffs, agree = [], 0
+    for a, b in zip(ref, out):
+        sa = dict(zip(a["labels"], a["scores"]))
+        sb = dict(zip(b["labels"], b["scores"]))
+        diffs.extend(abs(sa[k] - sb[k]) for k in sa)
+        agree += a["labels"][0] == b["labels"][0]
+    return {
+        "tasks": len(tasks),
+        "max_abs_diff": float(max(diffs)) if diffs else 0.0,
+        "mean_abs_diff": float(np.mean(diffs)) if diffs else 0.0,
+        "top1_agreement": agree / len(tasks) if tasks else 1.0,
+    }
@@ -1,29 +1,22 @@
 # analyzer/discourse/onto_actor_topic.py
 from typing import List, Dict
-import re
-from .onto_runtime import load_graph, build_label_index, _labels
+from .onto_runtime import iter_label_hits, labels_for
 
-def find_mentions(text: str, max_ngram: int = 5) -> List[Dict]:
-    """Онтология label-деріне дәл келетін 1..5-сөздік терезелерді іздеу."""
-    g = load_graph()
-    idx = build_label_index()
-    tokens = re.findall(r"[^\s]+(?:\s+[^\s]+){0,%d}" % (max_ngram-1), text)
+def find_mentions(text: str, max_ngram: int = None, label_hits=None) -> List[Dict]:
+    """
+    Онтология label-деріне дәл келетін барлық тіркестер (max_ngram – label-дің ең көп сөз саны).
+    label_hits – DocContext-те бір рет есептелген iter_label_hits() нәтижесі.
+    """
+    if label_hits is None:
+        label_hits = iter_label_hits(text, max_ngram=max_ngram)
     hits = []
-    for chunk in tokens:
-        key = " ".join(chunk.split()).lower()
-        iris = idx.get(key)
-        if not iris:
-            continue
-        start = text.find(chunk)
-        if start < 0:
-            continue
-        for iri in iris:
-            hits.append({
-                "match": chunk,
-                "span": [start, start+len(chunk)],
-                "iri": str(iri),
-                "labels": _labels(g, iri),
-            })
+    for start, end, iri in label_hits:
+        hits.append({
+            "match": text[start:end],
+            "span": [start, end],
+            "iri": iri,
+            "labels": labels_for(iri),
+        })
     return hits
 
 def tag_actor_topic(hits: List[Dict]) -> List[Dict]:
@@ -0,0 +1,132 @@
+# analyzer/discourse/onto_props.py
+"""
+Онтология қасиеттерінің материалданған кестесі: IRI -> {devices, polarity, domain, patterns, kind}.
+
+ontology_config.PROPERTY_LABEL_CANDS / CLASS_LABEL_CANDS бойынша предикаттар мен класстар
+(local name немесе label арқылы) канондық атауларға бір рет сәйкестендіріледі, rdfs:subClassOf
+транзитивті тұйықталуы есептеледі. Даналардың өз мәні болмаса, мән типінен, одан кейін
+ата-класстарынан (жақыннан алысқа) мұраланады. Нәтиже compile_graph payload-ына ("facts")
+кіреді де snapshot-қа сақталады – runtime-та hit құру тек dict.get().
+
+Граф емес, compile_graph-тың жазық құрылымымен жұмыс істейді (rdflib керек емес).
+"""
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+from .ontology_config import CLASS_LABEL_CANDS, PROPERTY_LABEL_CANDS
+
+RDFS_SUBCLASS = "http://www.w3.org/2000/01/rdf-schema#subClassOf"
+# rdfs:domain, owl:* т.б. – сөздік предикаттары канондық қасиет бола алмайды ("domain" ≠ hasDomain)
+_VOCAB_NS = ("http://www.w3.org/1999/02/22-rdf-syntax-ns#", "http://www.w3.org/2000/01/rdf-schema#",
+             "http://www.w3.org/2002/07/owl#", "http://www.w3.org/2004/02/skos/core#")
+
+# полярлық мәндері polarity_prior_from_onto күтетін үштікке келтіріледі
+POLARITY_ALIASES = {
+    "оң": "оң", "positive": "оң", "pos": "оң", "позитив": "оң", "положительный": "оң", "жағымды": "оң",
+    "теріс": "теріс", "negative": "теріс", "neg": "теріс", "негатив": "теріс", "отрицательный": "теріс",
+    "жағымсыз": "теріс",
+    "бейтарап": "бейтарап", "neutral": "бейтарап", "нейтральный": "бейтарап",
+}
+
+FIELDS = ("devices", "polarity", "domain", "patterns", "kind")
+
+
+def _key(s: str) -> str:
+    return re.sub(r"[\s_]+", " ", str(s).lower()).strip()
+
+
+def _local(iri: str) -> str:
+    return iri.split("#")[-1].split("/")[-1] or iri
+
+
+def _resolver(cands: Dict[str, Iterable[str]]):
+    table = {_key(v): name for name, vals in cands.items() for v in (*vals, name)}
+
+    def resolve(iri: str, labels: List[str]) -> Optional[str]:
+        for v in (_local(iri), *labels):
+            name = table.get(_key(v))
+            if name:
+                return name
+        return None
+    return resolve
+
+
+def _closure(parents: Dict[str, List[str]], start: str) -> List[str]:
+    """start-тан бастап ата-класстар (BFS, жақыннан алысқа); циклдерге төзімді."""
+    seen, order, q = {start}, [], deque([start])
+    while q:
+        for p in parents.get(q.popleft(), ()):
+            if p not in seen:
+                seen.add(p)
+                order.append(p)
+                q.append(p)
+    return order
+
+
+def materialize(payload: dict) -> Dict[str, dict]:
+    """compile_graph payload-ы -> {IRI: {devices, polarity, domain, patterns, kind}} (бос жазбаларсыз)."""
+    labels: Dict[str, List[str]] = payload.get("labels", {})
+    types: Dict[str, List[str]] = payload.get("types", {})
+    props: Dict[str, Dict[str, List[list]]] = payload.get("props", {})
+
+    def names(iri):
+        return labels.get(iri) or [_local(iri)]
+
+    resolve_prop, resolve_cls = _resolver(PROPERTY_LABEL_CANDS), _resolver(CLASS_LABEL_CANDS)
+    preds = {p for po in props.values() for p in po}
+    canon_pred = {p: c for p in preds if not p.startswith(_VOCAB_NS)
+                  for c in [resolve_prop(p, labels.get(p, []))] if c}
+
+    parents = {s: [o for kind, o in po.get(RDFS_SUBCLASS, ()) if kind == "iri"] for s, po in props.items()}
+    classes = set(parents) | {o for ps in parents.values() for o in ps} | {t for ts in types.values() for t in ts}
+    canon_cls = {c: name for c in classes for name in [resolve_cls(c, labels.get(c, []))] if name}
+    ancestors = {c: _closure(parents, c) for c in classes}
+
+    def value(kind, o):
+        return names(o)[0] if kind == "iri" else o
+
+    # әр IRI-дің өз мәндері (мұрасыз)
+    own: Dict[str, Dict[str, List[str]]] = {}
+    for s, po in props.items():
+        for p, objs in po.items():
+            c = canon_pred.get(p)
+            if c:
+                vals = own.setdefault(s, {}).setdefault(c, [])
+                vals.extend(v for v in (value(k, o) for k, o in objs) if v not in vals)
+
+    def lineage(iri):
+        """IRI өзі, типтері, олардың ата-класстары – мұрагерлік реті."""
+        out, seen = [iri], {iri}
+        direct = types.get(iri, [])
+        for c in (*direct, *(a for t in direct for a in ancestors.get(t, ())), *ancestors.get(iri, ())):
+            if c not in seen:
+                seen.add(c)
+                out.append(c)
+        return out
+
+    def first(line, prop):
+        for n in line:
+            vals = own.get(n, {}).get(prop)
+            if vals:
+                return vals
+        return []
+
+    facts: Dict[str, dict] = {}
+    for iri in set(props) | set(types) | classes:
+        line = lineage(iri)
+        kind = next((canon_cls[c] for c in line if c in canon_cls), None)
+        devices = list(first(line, "hasDevice"))
+        # RhetoricDevice-тің ұрпақ класына жататын дана – сол класс атауы да device
+        for t in ([iri] if iri in classes else types.get(iri, [])):
+            if any(canon_cls.get(a) == "RhetoricDevice" for a in (t, *ancestors.get(t, ()))) \
+                    and canon_cls.get(t) != "RhetoricDevice":
+                d = names(t)[0]
+                if d not in devices:
+                    devices.append(d)
+        pol = next((POLARITY_ALIASES.get(_key(v), v) for v in first(line, "hasPolarity")), None)
+        row = {"devices": devices, "polarity": pol, "domain": list(first(line, "hasDomain")),
+               "patterns": list(first(line, "hasPattern")), "kind": kind}
+        if any(row[f] for f in FIELDS):
+            facts[iri] = row
+    return facts
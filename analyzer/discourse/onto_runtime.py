@@ -2,25 +2,36 @@
 import os, re
 from pathlib import Path
 from functools import lru_cache
-from typing import List, Dict
-from rdflib import Graph, URIRef, Literal, RDFS
-from rdflib.namespace import SKOS
+from typing import List, Dict, NamedTuple
+from .index_registry import registry
+from .kk_stem import MATCH_MODE, stem
+from .label_matcher import LabelMatcher
+from .onto_props import materialize
+from .onto_snapshot import read_snapshot
 
 ONTO_PATH = Path(os.getenv("POLISENT_ONTO_PATH", "data/political_discourse_ontology_final.owl"))
+# `manage.py build_onto_snapshot` шығарады; бар және жаңа болса rdflib қажет емес
+ONTO_SNAPSHOT_PATH = Path(os.getenv("POLISENT_ONTO_SNAPSHOT", str(ONTO_PATH) + ".snap"))
 LANGS = {"kk", "kaz", "ru", "en", None}
 
 def _norm(s: str) -> str:
     return re.sub(r"\s+", " ", s.lower()).strip()
 
+def _local_name(iri: str) -> str:
+    return iri.split("#")[-1].split("/")[-1] or iri
+
 @lru_cache(maxsize=1)
-def load_graph() -> Graph:
+def load_graph():
+    from rdflib import Graph
     if not ONTO_PATH.exists():
         raise FileNotFoundError(f"Ontology not found: {ONTO_PATH}")
     g = Graph()
     g.parse(str(ONTO_PATH))
     return g
 
-def _labels(g: Graph, node: URIRef) -> List[str]:
+def _labels(g, node) -> List[str]:
+    from rdflib import Literal, RDFS
+    from rdflib.namespace import SKOS
     out = []
     for p in (SKOS.prefLabel, RDFS.label, SKOS.altLabel):
         for o in g.objects(node, p):
@@ -38,35 +49,114 @@ def _labels(g: Graph, node: URIRef) -> List[str]:
             seen.add(v); res.append(v)
     return res
 
-@lru_cache(maxsize=1)
-def build_label_index() -> Dict[str, List[URIRef]]:
-    g = load_graph()
-    idx: Dict[str, List[URIRef]] = {}
+def compile_graph(g) -> dict:
+    """Графты жазық құрылымға айналдыру: label→IRI индексі, IRI label-дері, класстар, қасиеттер, facts."""
+    from rdflib import Literal, URIRef, RDF, RDFS
+    from rdflib.namespace import SKOS
+    label_preds = (RDFS.label, SKOS.prefLabel, SKOS.altLabel)
+    label_index: Dict[str, List[str]] = {}
+    labelled = set()
+    types: Dict[str, List[str]] = {}
+    props: Dict[str, Dict[str, List[list]]] = {}
     for s, p, o in g:
-        if p in (RDFS.label, SKOS.prefLabel, SKOS.altLabel) and isinstance(o, Literal) and (o.language in LANGS):
-            idx.setdefault(_norm(str(o)), []).append(s)
-    return idx
-
-def match_text_with_ontology(text: str) -> List[dict]:
-    """Label-ге дәл келетін 1–5 сөздік терезелерді іздеу (қысқа нұсқа)."""
-    g = load_graph()
-    hits = []
-    tokens = re.findall(r"[^\s]+(?:\s+[^\s]+){0,4}", text)  # 1..5 сөз
-    for chunk in tokens:
-        key = _norm(chunk)
-        iris = build_label_index().get(key, [])
-        if not iris:
+        if p in label_preds:
+            if isinstance(o, Literal) and (o.language in LANGS):
+                label_index.setdefault(_norm(str(o)), []).append(str(s))
+                labelled.add(s)
+            continue
+        if not isinstance(s, URIRef):
             continue
-        start = text.find(chunk)
-        if start < 0:
+        if p == RDF.type:
+            types.setdefault(str(s), []).append(str(o))
             continue
-        for iri in iris:
-            hits.append({
-                "match": chunk,
-                "span": [start, start+len(chunk)],
-                "inst": str(iri),
-                "labels": _labels(g, iri),
-                "onto_devices": [],
-                "onto_polarity": None,
-            })
-    return hits
\ No newline at end of file
+        kind = "iri" if isinstance(o, URIRef) else ("lit" if isinstance(o, Literal) else "bnode")
+        props.setdefault(str(s), {}).setdefault(str(p), []).append([kind, str(o)])
+    payload = {
+        "label_index": label_index,
+        "labels": {str(s): _labels(g, s) for s in labelled},
+        "types": types,
+        "props": props,
+    }
+    payload["facts"] = materialize(payload)
+    return payload
+
+_NO_FACTS = {"devices": [], "polarity": None, "domain": [], "patterns": [], "kind": None}
+
+class OntoIndex:
+    """Онтологияның runtime-қа керек бөлігі: графтан – dict-тер, snapshot-тан – mmap-тегі көшірмесіз Mapping-тер."""
+
+    def __init__(self, label_index, labels, types, props, facts):
+        self.label_index: Dict[str, List[str]] = label_index
+        self.labels: Dict[str, List[str]] = labels
+        self.types: Dict[str, List[str]] = types
+        self.props: Dict[str, Dict[str, List[list]]] = props
+        self.facts: Dict[str, dict] = facts   # onto_props.materialize: devices/polarity/domain/patterns/kind
+
+    def labels_for(self, iri: str) -> List[str]:
+        return list(self.labels.get(iri) or [_local_name(iri)])
+
+    def facts_for(self, iri: str) -> dict:
+        return self.facts.get(iri, _NO_FACTS)
+
+class OntoBundle(NamedTuple):
+    onto: OntoIndex
+    matcher: LabelMatcher
+
+def build_ontology() -> OntoBundle:
+    """Индекс реестрінің builder-і: snapshot (немесе OWL парсы) + Aho-Corasick автоматы бірге құрылады."""
+    payload = read_snapshot(ONTO_SNAPSHOT_PATH, ONTO_PATH)
+    if payload is None:
+        load_graph.cache_clear()   # OWL өзгерген болуы мүмкін – ескі графты қолданбаймыз
+        payload = compile_graph(load_graph())
+    onto = OntoIndex(**payload)
+    # stem режимінде автомат түбірлер бойынша
+    matcher = LabelMatcher(onto.label_index.keys(), key_fn=stem if MATCH_MODE == "stem" else None)
+    return OntoBundle(onto, matcher)
+
+registry.register("ontology", lambda: [ONTO_PATH], build_ontology, watch=lambda: [ONTO_SNAPSHOT_PATH])
+
+def get_onto() -> OntoIndex:
+    return registry.get("ontology").onto
+
+def labels_for(iri: str) -> List[str]:
+    return get_onto().labels_for(str(iri))
+
+def build_label_index() -> Dict[str, List[str]]:
+    return get_onto().label_index
+
+def build_label_matcher() -> LabelMatcher:
+    """Барлық қалыпты label үстінен бір рет құрылатын Aho-Corasick автоматы (индекс нұсқасымен бірге)."""
+    return registry.get("ontology").matcher
+
+def iter_label_hits(text: str, max_ngram: int = None):
+    """(start, end, iri) – әр label сәйкестігі, (start, end) ретімен, қайталанусыз."""
+    bundle = registry.get("ontology")   # индекс пен автомат бір нұсқадан
+    idx = bundle.onto.label_index
+    seen = set()
+    for start, end, keys in bundle.matcher.find(text, max_tokens=max_ngram):
+        for key in keys:
+            for iri in idx[key]:
+                if (start, end, iri) not in seen:
+                    seen.add((start, end, iri))
+                    yield start, end, iri
+
+def match_text_with_ontology(text: str, label_hits=None) -> List[dict]:
+    """
+    Мәтіндегі барлық онтология label-дерін бір өтуде табу (Aho-Corasick, нақты офсеттер).
+    label_hits – DocContext-те бір рет есептелген iter_label_hits() нәтижесі.
+    """
+    onto = get_onto()
+    hits = []
+    for start, end, iri in (iter_label_hits(text) if label_hits is None else label_hits):
+        facts = onto.facts_for(iri)   # алдын ала материалданған кесте – граф жүрілмейді
+        hits.append({
+            "match": text[start:end],
+            "span": [start, end],
+            "inst": iri,
+            "class": facts["kind"],
+            "labels": onto.labels_for(iri),
+            "onto_devices": list(facts["devices"]),
+            "onto_polarity": facts["polarity"],
+            "onto_domain": list(facts["domain"]),
+        })
+    return hits
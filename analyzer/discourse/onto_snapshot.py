@@ -0,0 +1,246 @@
+# analyzer/discourse/onto_snapshot.py
+"""
+Онтологияның алдын ала компиляцияланған бинарлық snapshot-ы (mmap, процестер арасында ортақ).
+
+Формат: MAGIC | u32 header ұзындығы | JSON header | 8 байтқа туралау | массивтер.
+Header-де формат нұсқасы, бастапқы OWL файлының өлшемі/mtime/sha256 және массивтер
+каталогы (атау -> dtype, офсет, ұзындық) сақталады. OWL өзгерсе snapshot ескірген деп
+есептеліп, елеусіз қалады.
+
+Барлық жолдар (IRI, label, литерал) бір UTF-8 blob-та, i-жол = blob[offs[i]:offs[i+1]].
+Әр кесте (label→IRI индексі, label-дер, типтер, қасиеттер, facts) – кілт бойынша
+сұрыпталған жол id-лері + CSR (ptr/мәндер) массивтері. Файл mmap арқылы ашылады да,
+массивтер np.frombuffer-мен көшірмесіз оқылады: pickle жоқ, worker-лердің жеке heap-іне
+бүкіл индекс көшірілмейді – беттер ОЖ page cache-інде ортақ. Жол сұралғанда ғана
+(bisect арқылы) декодталады. rdflib мүлде импортталмайды.
+Snapshot – `manage.py build_onto_snapshot` шығаратын жергілікті артефакт.
+"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"PDONTO"
+FORMAT = 3   # 3: pickle орнына mmap-тегі массивтер; 2: payload-қа "facts" (onto_props) қосылды
+_HDR = struct.Struct("<I")
+_ALIGN = 8
+PROP_KINDS = ("iri", "lit", "bnode")
+FACT_LISTS = ("devices", "domain", "patterns")
+FACT_SCALARS = ("polarity", "kind")
+
+
+def source_info(path) -> dict:
+    p = Path(path)
+    st = p.stat()
+    h = hashlib.sha256(p.read_bytes()).hexdigest()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": h}
+
+
+# --- жазу
+class _Builder:
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.strings: List[str] = []
+        self.arrays: Dict[str, np.ndarray] = {}
+
+    def sid(self, s) -> int:
+        s = str(s)
+        i = self.ids.get(s)
+        if i is None:
+            i = self.ids[s] = len(self.strings)
+            self.strings.append(s)
+        return i
+
+    def opt(self, s) -> int:
+        return -1 if s is None else self.sid(s)
+
+    def table(self, name: str, mapping: Dict, rows) -> None:
+        """rows(мән) -> [кортеж, ...]; әр кортеж бағанасы name.c0, name.c1, ... массиві."""
+        keys = sorted(mapping)
+        ptr, cols = [0], None
+        for k in keys:
+            rs = rows(mapping[k])
+            if cols is None and rs:
+                cols = [[] for _ in rs[0]]
+            for r in rs:
+                for c, v in zip(cols, r):
+                    c.append(v)
+            ptr.append(ptr[-1] + len(rs))
+        self.arrays[f"{name}.keys"] = np.array([self.sid(k) for k in keys], dtype=np.int32)
+        self.arrays[f"{name}.ptr"] = np.array(ptr, dtype=np.int64)
+        for i, c in enumerate(cols or []):
+            self.arrays[f"{name}.c{i}"] = np.array(c, dtype=np.int32)
+
+    def finish(self) -> None:
+        data = [s.encode("utf-8") for s in self.strings]
+        self.arrays["strings.blob"] = np.frombuffer(b"".join(data), dtype=np.uint8)
+        self.arrays["strings.offs"] = np.cumsum([0] + [len(b) for b in data], dtype=np.int64)
+
+
+def _encode(payload: dict) -> Dict[str, np.ndarray]:
+    b = _Builder()
+    b.table("label_index", payload["label_index"], lambda iris: [(b.sid(i),) for i in iris])
+    b.table("labels", payload["labels"], lambda vals: [(b.sid(v),) for v in vals])
+    b.table("types", payload["types"], lambda vals: [(b.sid(v),) for v in vals])
+    b.table("props", payload["props"], lambda po: [(b.sid(p), PROP_KINDS.index(k), b.sid(v))
+                                                   for p, objs in po.items() for k, v in objs])
+    facts = payload.get("facts", {})
+    b.table("facts", facts, lambda f: [tuple(b.opt(f.get(x)) for x in FACT_SCALARS)])
+    for field in FACT_LISTS:
+        b.table(f"facts.{field}", facts, lambda f: [(b.sid(v),) for v in f.get(field) or ()])
+    b.finish()
+    return b.arrays
+
+
+def write_snapshot(path, payload: dict, source_path) -> int:
+    """Атомарлы жазу (tmp + replace): жүгіріп тұрған worker-лер ескі файлдың mmap-ін ұстай береді."""
+    path = Path(path)
+    arrays = _encode(payload)
+    catalog, off = {}, 0
+    for name, a in arrays.items():
+        catalog[name] = [a.dtype.str, off, int(a.size)]
+        off += -(-a.nbytes // _ALIGN) * _ALIGN
+    header = json.dumps({"format": FORMAT, "source": source_info(source_path), "arrays": catalog}).encode("utf-8")
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(_HDR.pack(len(header)))
+        f.write(header)
+        f.write(b"\0" * (-f.tell() % _ALIGN))
+        base = f.tell()
+        for name, a in arrays.items():
+            f.seek(base + catalog[name][1])
+            f.write(a.tobytes())
+        f.write(b"\0" * (-f.tell() % _ALIGN))
+    os.replace(tmp, path)
+    return path.stat().st_size
+
+
+# --- оқу (көшірмесіз көріністер)
+class _Strings:
+    def __init__(self, blob: np.ndarray, offs: np.ndarray):
+        self.blob = memoryview(blob)
+        self.offs = offs
+
+    def __getitem__(self, i) -> Optional[str]:
+        if i < 0:
+            return None
+        return str(self.blob[self.offs[i]:self.offs[i + 1]], "utf-8")
+
+
+class _Table(Mapping):
+    """Сұрыпталған кілттер + CSR: кілт -> row(жолдар) (bisect, тек сұралған жол декодталады)."""
+
+    def __init__(self, strings: _Strings, arrays: dict, name: str, row):
+        self.s = strings
+        self.keys_ = arrays[f"{name}.keys"]
+        self.ptr = arrays[f"{name}.ptr"]
+        self.cols = [arrays[f"{name}.c{i}"] for i in range(8) if f"{name}.c{i}" in arrays]
+        self.row = row
+
+    def index(self, key: str) -> int:
+        lo, hi = 0, len(self.keys_)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.s[self.keys_[mid]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < len(self.keys_) and self.s[self.keys_[lo]] == key else -1
+
+    def rows(self, i: int):
+        a, b = self.ptr[i], self.ptr[i + 1]
+        return [c[a:b] for c in self.cols] or [np.empty(0, dtype=np.int32)]
+
+    def __getitem__(self, key):
+        i = self.index(key)
+        if i < 0:
+            raise KeyError(key)
+        return self.row(self, i)
+
+    def __iter__(self):
+        return (self.s[k] for k in self.keys_)
+
+    def __len__(self):
+        return len(self.keys_)
+
+
+def _strs(t: _Table, i: int) -> List[str]:
+    return [t.s[j] for j in t.rows(i)[0]]
+
+
+def _props(t: _Table, i: int) -> Dict[str, List[list]]:
+    out: Dict[str, List[list]] = {}
+    preds, kinds, vals = t.rows(i)
+    for p, k, v in zip(preds, kinds, vals):
+        out.setdefault(t.s[p], []).append([PROP_KINDS[k], t.s[v]])
+    return out
+
+
+class _Facts(_Table):
+    def __init__(self, strings, arrays):
+        super().__init__(strings, arrays, "facts", None)
+        self.lists = {f: _Table(strings, arrays, f"facts.{f}", _strs) for f in FACT_LISTS}
+
+    def __getitem__(self, key):
+        i = self.index(key)
+        if i < 0:
+            raise KeyError(key)
+        # кілттер реті барлық facts.* кестелерінде бірдей – бір индекс
+        a = self.ptr[i]
+        out = {f: self.s[int(self.cols[n][a])] for n, f in enumerate(FACT_SCALARS)}
+        out.update({f: _strs(t, i) for f, t in self.lists.items()})
+        return out
+
+
+def _is_fresh(source: dict, source_path) -> bool:
+    p = Path(source_path)
+    if not p.exists():
+        return True   # тек snapshot жеткізілген орта
+    st = p.stat()
+    if st.st_size == source.get("size") and st.st_mtime_ns == source.get("mtime_ns"):
+        return True
+    return hashlib.sha256(p.read_bytes()).hexdigest() == source.get("sha256")
+
+
+def read_snapshot(path, source_path=None) -> Optional[dict]:
+    """Payload (dict-тәрізді көшірмесіз көріністер) немесе None (файл жоқ, формат басқа, не OWL өзгерген)."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    with open(path, "rb") as f:
+        # mmap файл жабылғанда да жарамды; массивтер оның буферіне сілтеме ұстайды
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:len(MAGIC)] != MAGIC:
+        logger.warning("Onto snapshot: белгісіз формат (%s)", path)
+        return None
+    off = len(MAGIC)
+    (hlen,) = _HDR.unpack_from(mm, off)
+    off += _HDR.size
+    header = json.loads(mm[off:off + hlen].decode("utf-8"))
+    if header.get("format") != FORMAT:
+        logger.warning("Onto snapshot: формат нұсқасы %s, күтілгені %s", header.get("format"), FORMAT)
+        return None
+    if source_path is not None and not _is_fresh(header.get("source", {}), source_path):
+        logger.warning("Onto snapshot ескірген (%s өзгерген) – OWL қайта парс етіледі", source_path)
+        return None
+    base = off + hlen + (-(off + hlen) % _ALIGN)
+    arrays = {name: np.frombuffer(mm, dtype=np.dtype(dt), count=n, offset=base + o)
+              for name, (dt, o, n) in header["arrays"].items()}
+    strings = _Strings(arrays["strings.blob"], arrays["strings.offs"])
+    return {
+        "label_index": _Table(strings, arrays, "label_index", _strs),
+        "labels": _Table(strings, arrays, "labels", _strs),
+        "types": _Table(strings, arrays, "types", _strs),
+        "props": _Table(strings, arrays, "props", _props),
+        "facts": _Facts(strings, arrays),
+    }
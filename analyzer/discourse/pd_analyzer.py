@@ -1,4 +1,8 @@
 import json, re
+from collections import Counter
+from functools import lru_cache
+
+from .kk_stem import MATCH_MODE, stem
 
 KAZ_LETTERS = "А-Яа-яЁёІіҢңӘәҒғҚқӨөҰұҮүҺһ"
 TOKEN_RE = re.compile(f"[{KAZ_LETTERS}]+", re.UNICODE)
@@ -10,10 +14,122 @@ def norm(s: str) -> str:
 def is_phrase(term: str) -> bool:
     return " " in term.strip()
 
+class PrefixTrie:
+    """Таңбалық trie: walk(token) – токеннің префиксі болатын барлық кілттердің мәндері."""
+    __slots__ = ("root",)
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, key: str, value):
+        node = self.root
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node.setdefault("", []).append(value)   # "" – терминал (таңба бос болмайды)
+
+    def walk(self, token: str):
+        node = self.root
+        for ch in token:
+            node = node.get(ch)
+            if node is None:
+                return
+            vals = node.get("")
+            if vals:
+                yield from vals
+
+class PDIndex(dict):
+    """
+    build_index_from_json нәтижесі: {tactic: {"phrases", "tokens"}} (бұрынғы пішін)
+    + бір рет компиляцияланатын индекс (compiled()): барлық тактиканың түбірлері
+    бір PrefixTrie-де (tactic, term) постингтерімен, фразалар бірінші сөзі бойынша.
+    Компиляциядан кейін bags өзгертілмейді деп есептейміз.
+    """
+    _compiled = None
+
+    def compiled(self):
+        if self._compiled is None:
+            self._compiled = _compile_index(self)
+        return self._compiled
+
+def _compile_index(index: dict) -> dict:
+    # slot – (tactic, term) жұбы; rank – бастапқы итерация реті (phrases, сосын tokens):
+    # score_text бұрынғы қосу және тең ұпайлы hits реттерін дәл қайталайды
+    slots, trie, by_first, stems = [], PrefixTrie(), {}, {}
+    for ti, (tactic, bags) in enumerate(index.items()):
+        for ph in bags["phrases"]:
+            sid = len(slots)
+            slots.append((ti, ph, "phrase"))
+            words = ph.split(" ")
+            by_first.setdefault(words[0], []).append((words, sid))
+        for tk in bags["tokens"]:
+            sid = len(slots)
+            slots.append((ti, tk, "prefix"))
+            for r in _token_roots(tk):
+                trie.insert(r, sid)
+            stems.setdefault(stem(tk), []).append(sid)
+    return {
+        "tactics": list(index.keys()),
+        "slots": slots,
+        "trie": trie,
+        "stems": stems,
+        "by_first": by_first,
+        "first_lens": sorted({len(w) for w in by_first}),
+    }
+
+def _phrase_counts(toks, comp) -> dict:
+    """
+    joined.count(ph) мәнін токендер бойынша бір өтуде есептейді. ph = w1 … wn сәйкестігі:
+    t[i] w1-мен аяқталады, ортаңғы сөздер тең, t[i+n-1] wn-нен басталады.
+    str.count сияқты қабаттаспайтын (солдан ашкөз) кірулер ғана саналады.
+    """
+    by_first, first_lens = comp["by_first"], comp["first_lens"]
+    counts, last_end = {}, {}
+    if not by_first:
+        return counts
+    pos, p = [], 1          # joined = " " + " ".join(toks) + " " ішіндегі позициялар
+    for t in toks:
+        pos.append(p)
+        p += len(t) + 1
+    n_toks = len(toks)
+    for i, t in enumerate(toks):
+        for L in first_lens:
+            if L > len(t):
+                break
+            cands = by_first.get(t[-L:])
+            if not cands:
+                continue
+            for words, sid in cands:
+                n = len(words)
+                j = i + n - 1
+                if j >= n_toks or not toks[j].startswith(words[-1]):
+                    continue
+                if any(toks[i + k] != words[k] for k in range(1, n - 1)):
+                    continue
+                start, end = pos[i] + len(t) - L, pos[j] + len(words[-1])
+                if start >= last_end.get(sid, 0):
+                    counts[sid] = counts.get(sid, 0) + 1
+                    last_end[sid] = end
+    return counts
+
+def _prefix_counts(toks, trie: PrefixTrie) -> dict:
+    counts = {}
+    for t, m in Counter(toks).items():
+        for sid in trie.walk(t):
+            counts[sid] = counts.get(sid, 0) + m
+    return counts
+
+def _stem_counts(toks, stems: dict) -> dict:
+    """POLISENT_MATCH_MODE=stem: токен түбірі бойынша hash-іздеу (префикс сканерінің орнына)."""
+    counts = {}
+    for t, m in Counter(toks).items():
+        for sid in stems.get(stem(t), ()):
+            counts[sid] = counts.get(sid, 0) + m
+    return counts
+
 def build_index_from_json(path: str):
     with open(path, "r", encoding="utf-8") as f:
         data = json.load(f)
-    idx = {}
+    idx = PDIndex()
     for tactic, items in data.items():
         phrases, tokens = set(), set()
         for it in items:
@@ -30,6 +146,10 @@ def build_index_from_json(path: str):
 def tokenize(text: str):
     return TOKEN_RE.findall(norm(text))
 
+def tokenize_spans(text: str):
+    """(start, end, token) – tokenize() токендері, бастапқы мәтіндегі офсеттерімен."""
+    return [(m.start(), m.end(), m.group(0).lower()) for m in TOKEN_RE.finditer(text or "")]
+
 def _token_roots(token: str):
     """Very-light stemming: '...у' -> түбір ('қанау' -> 'қана')"""
     roots = {token}
@@ -43,46 +163,54 @@ CUE_POL = {
     "сайлау","үгіт","коалиц","жемқор","қана","оппозиц","халық","ел"
 }
 
+@lru_cache(maxsize=1)
+def _cue_trie():
+    trie = PrefixTrie()
+    for rank, root in enumerate(CUE_POL):
+        trie.insert(root, (rank, root))
+    return trie
+
 def _cue_fallback(toks):
     """JSON-нан ештеңе шықпаса, cue түбірлері бойынша ұпай есептейміз."""
-    hits = []
-    total = 0
-    for root in CUE_POL:
-        cnt = sum(1 for t in toks if t.startswith(root))
-        if cnt > 0:
-            hits.append((root, cnt, "cue"))
-            total += cnt
+    counts = _prefix_counts(toks, _cue_trie())
+    hits = [(root, cnt, "cue") for (_, root), cnt in sorted(counts.items())]
+    total = sum(cnt for _, cnt, _ in hits)
     hits.sort(key=lambda x: x[1], reverse=True)
     # тек алғашқы 10 дәлелді қалдырамыз
     return total, hits[:10]
 
-def score_text(text: str, index: dict, weight_phrase: float = 2.0, weight_token: float = 1.0):
-    toks = tokenize(text)
-    joined = " " + " ".join(toks) + " "
+def score_text(text: str, index: dict, weight_phrase: float = 2.0, weight_token: float = 1.0,
+               tokens=None):
+    """
+    Барлық тактиканы токендер бойынша бір өтуде бағалау (PDIndex.compiled()).
+    Қарапайым dict берілсе, индекс әр шақыруда компиляцияланады.
+    tokens – DocContext.pd_tokens (берілсе мәтін қайта токенизацияланбайды).
+    """
+    toks = tokenize(text) if tokens is None else tokens
+    comp = index.compiled() if isinstance(index, PDIndex) else _compile_index(index)
+    slots = comp["slots"]
+    if MATCH_MODE == "stem":
+        counts = _stem_counts(toks, comp["stems"])
+    else:
+        counts = _prefix_counts(toks, comp["trie"])
+    counts.update(_phrase_counts(toks, comp))
+
+    # 1) JSON-дағы тактикалар бойынша бағалау (slot реті = бастапқы итерация реті)
+    per_tactic = {}
+    for sid in sorted(counts):
+        per_tactic.setdefault(slots[sid][0], []).append(sid)
     results = []
-
-    # 1) JSON-дағы тактикалар бойынша бағалау
-    for tactic, bags in index.items():
+    for ti, tactic in enumerate(comp["tactics"]):
+        sids = per_tactic.get(ti)
+        if not sids:
+            continue
         score = 0.0
         hits = []
-
-        # Фразалар
-        for ph in bags["phrases"]:
-            if ph in joined:
-                c = joined.count(ph)
-                if c > 0:
-                    score += weight_phrase * c
-                    hits.append((ph, c, "phrase"))
-
-        # Жалқы сөздер (+ түбір)
-        for tk in bags["tokens"]:
-            cnt = 0
-            for r in _token_roots(tk):
-                cnt += sum(1 for t in toks if t.startswith(r))
-            if cnt > 0:
-                score += weight_token * cnt
-                hits.append((tk, cnt, "prefix"))
-
+        for sid in sids:
+            _, term, kind = slots[sid]
+            c = counts[sid]
+            score += (weight_phrase if kind == "phrase" else weight_token) * c
+            hits.append((term, c, kind))
         if score > 0:
             hits_sorted = sorted(hits, key=lambda x: x[1], reverse=True)[:10]
             results.append((tactic, score, hits_sorted))
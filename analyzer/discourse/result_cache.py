@@ -0,0 +1,147 @@
+# analyzer/discourse/result_cache.py
+"""
+Анализ нәтижелерінің мазмұнға негізделген кэші.
+
+Кілт = мәтін хэші + тапсырма + домен + дерек көзі + модель/онтология/лексикон нұсқалары.
+span-ы бар негізгі нәтиже бастапқы мәтін бойынша кілттеледі (офсеттер сол мәтінге сәйкес),
+офсетсіз тактика нәтижесі – normalize_text() бойынша. Екі деңгей:
+  * процесс ішіндегі LRU (JSON жол күйінде — шақырушы нәтижені өзгерте алмайды);
+  * дискідегі SQLite (барлық worker-лерге ортақ), көлемі бойынша ескі жазбалар өшіріледі.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+
+def normalize_text(text: str) -> str:
+    """NFC + жол соңдарын біріздендіру + шеткі бос орындар. Тек офсетсіз нәтижелерге (тактика) – span-дар өзгереді."""
+    t = unicodedata.normalize("NFC", text or "")
+    return t.replace("\r\n", "\n").replace("\r", "\n").strip()
+
+
+def source_digest(path) -> str:
+    """Файл болса – мазмұн хэші; каталог болса – файл аттары/өлшемдері/mtime (салмақтар GB болады)."""
+    p = Path(path)
+    h = hashlib.sha256()
+    if p.is_dir():
+        for f in sorted(p.rglob("*")):
+            if f.is_file():
+                st = f.stat()
+                h.update(f"{f.relative_to(p)}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+    elif p.is_file():
+        with open(p, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    else:
+        return "missing"
+    return h.hexdigest()[:16]
+
+
+class ResultCache:
+    def __init__(self, path: Optional[str] = None, mem_items: int = 2048,
+                 max_bytes: int = 256 * 1024 * 1024):
+        self.mem_items = mem_items
+        self.max_bytes = max_bytes
+        self._mem: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"mem_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0}
+        self._db = None
+        self._disk_bytes = 0
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), timeout=5.0, check_same_thread=False,
+                                       isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, atime REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_atime ON results(atime)")
+            self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    @staticmethod
+    def key(text: str, kind: str, domain: str, source: str, task: str, versions: Dict[str, str]) -> str:
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        parts = [text_hash, kind, domain or "", source or "", task or "", sorted(versions.items())]
+        return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            raw = self._mem.get(key)
+            if raw is not None:
+                self._mem.move_to_end(key)
+                self._counters["mem_hits"] += 1
+                return json.loads(raw)
+            if self._db is not None:
+                row = self._db.execute("SELECT value FROM results WHERE key=?", (key,)).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE results SET atime=? WHERE key=?", (time.time(), key))
+                    self._remember(key, row[0])
+                    self._counters["disk_hits"] += 1
+                    return json.loads(row[0])
+            self._counters["misses"] += 1
+            return None
+
+    def set(self, key: str, value: dict) -> None:
+        raw = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._remember(key, raw)
+            self._counters["sets"] += 1
+            if self._db is not None:
+                size = len(raw.encode("utf-8"))
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results(key, value, size, atime) VALUES (?,?,?,?)",
+                    (key, raw, size, time.time()),
+                )
+                self._disk_bytes += size
+                if self._disk_bytes > self.max_bytes:
+                    self._evict()
+
+    def _remember(self, key: str, raw: str) -> None:
+        if self.mem_items <= 0:
+            return
+        self._mem[key] = raw
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.mem_items:
+            self._mem.popitem(last=False)
+
+    def _evict(self) -> None:
+        # басқа процестер де жазады — нақты көлемді қайта есептеп, 90%-ға дейін ескілерін өшіреміз
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        if total > target:
+            cur = self._db.execute("SELECT key, size FROM results ORDER BY atime")
+            drop, freed = [], 0
+            for k, size in cur:
+                if total - freed <= target:
+                    break
+                drop.append((k,))
+                freed += size
+            self._db.executemany("DELETE FROM results WHERE key=?", drop)
+            self._counters["evictions"] += len(drop)
+            total -= freed
+        self._disk_bytes = total
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            out = dict(self._counters)
+            out["mem_items"] = len(self._mem)
+            out["disk_bytes"] = self._disk_bytes
+        hits = out["mem_hits"] + out["disk_hits"]
+        lookups = hits + out["misses"]
+        out["hit_rate"] = hits / lookups if lookups else 0.0
+        return out
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._disk_bytes = 0
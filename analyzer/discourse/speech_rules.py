@@ -1,9 +1,8 @@
 # analyzer/discourse/speech_rules.py
 import re
-from typing import List, Dict, Tuple
+from typing import List, Dict, Iterator, Tuple
 from functools import lru_cache
-from  .onto_actor_topic import find_mentions, tag_actor_topic
-from .campaign_onto_rules import detect_regex
+from .doc_context import DocContext, sent_tokenize as _sent_tokenize
 
 # Бағалау лексикасы (қысқа тізім; негізгі тізім JSON-нан жүктеледі)
 POS_VERBS = r"(қолдаймын|мақұлдаймын|құптаймын|мақтаймын|қажет деп санаймын|сенемін)"
@@ -26,32 +25,18 @@ def _compiled():
         "you_pron": re.compile(SECOND_PERSON, flags),
     }
 
-def _sent_tokenize(text: str) -> List[Tuple[int,int,str]]:
-    # Өте қарапайым бөлгіш: .!? бойынша, тырнақшаны елемей
-    import re
-    spans, start = [], 0
-    for m in re.finditer(r"[.!?]+", text):
-        end = m.end()
-        chunk = text[start:end].strip()
-        if chunk:
-            spans.append((start, end, chunk))
-        start = end
-    tail = text[start:].strip()
-    if tail:
-        spans.append((start, start+len(tail), tail))
-    return spans
-
-def analyze_speech(text: str) -> Dict:
+def iter_speech_items(text: str, ctx: DocContext = None) -> Iterator[Dict]:
+    """
+    analyze_speech-тің сөйлемдік бағалары, сөйлем ретімен. Ағындық емес: ctx бүкіл құжат
+    бойынша бір рет есептеледі, сөйлемге тиесілі онтология/regex сәйкестіктері одан
+    SpanIndex арқылы bisect-пен кесіледі.
+    """
+    ctx = ctx or DocContext(text)
     rx = _compiled()
-    # 1) Онтологиядан кандидат-нысана (actor/org/topic) іздейміз
-    onto_hits = tag_actor_topic(find_mentions(text))
-    # 2) Сөйлем бойынша жүріп, әр сөйлемге бағалау белгісін қоямыз
-    sent_spans = _sent_tokenize(text)
-    items = []
-    for (s,e,chunk) in sent_spans:
+    for (s,e,chunk) in ctx.sentences:
         
         lab = "бейтарап"; score = 0.5
-        rx_hits_sent = [h for h in detect_regex(chunk)]
+        rx_hits_sent = ctx.rx_hits_in(s, e)
         rx_devices = {h["device"] for h in rx_hits_sent}
 
         # Егер жарнамалық әдістер табылса, спикер сөзі үшін де оны оң белгі ретінде ескереміз
@@ -76,13 +61,22 @@ def analyze_speech(text: str) -> Dict:
         if rx["you_pron"].search(chunk):
             target = "opponent"
         # сөйлемнің ішіндегі онтология сәйкестіктерін байлап жібереміз
-        local_refs = [h for h in onto_hits if h["span"][0] >= s and h["span"][1] <= e]
-        items.append({
+        local_refs = ctx.mentions_in(s, e)
+        yield {
             "span": [s,e], "text": chunk,
             "sentiment": lab, "score": score,
             "targets": local_refs,    # actor/org/topic қатар
             "address": target,        # opponent/self/unspecified
-        })
+        }
+
+
+def analyze_speech(text: str, ctx: DocContext = None) -> Dict:
+    """ctx – analyze_text-тің ортақ DocContext-і (онтология/regex/сөйлемдер бір рет есептеледі)."""
+    ctx = ctx or DocContext(text)
+    # 1) Онтологиядан кандидат-нысана (actor/org/topic) іздейміз
+    onto_hits = ctx.mentions
+    # 2) Сөйлем бойынша жүріп, әр сөйлемге бағалау белгісін қоямыз
+    items = list(iter_speech_items(text, ctx))
     # 3) Нысанаға жинақтау: actor/org/topic бойынша басым баға
     stance = {}
     for it in items:
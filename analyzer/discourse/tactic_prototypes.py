@@ -0,0 +1,186 @@
+# analyzer/discourse/tactic_prototypes.py
+"""
+Тактика прототиптері: терминдер мен анықтамаларының эмбеддингтерінен тактика векторлары.
+
+`manage.py build_tactic_prototypes` political_discourse_terms.json-дағы әр терминді
+("атауы. анықтамасы") XNLI моделінің энкодерімен (mean pooling) кодтап, әр тактика үшін
+орташа вектор (прототип) жасайды да, матрицаны .npz-ке сақтайды. Runtime-та мәтін бір рет
+кодталады, барлық прототиптермен cosine ұқсастығы бір матрицалық көбейтумен есептеледі –
+тактика саны inference құнына әсер етпейді (NLI-де әр тактика = бөлек жұп).
+
+XLM-R эмбеддингтері бір бағытқа жиналып тұрады (cosine ~0.9+), сондықтан барлық термин
+векторларының ортасы (center) алынып тасталады; ұқсастықтар softmax(sim / temperature)
+арқылы zero-shot бағаларына ұқсас үлестірімге айналады.
+
+  POLISENT_TACTIC_MODE        nli (әдепкі) | prototype
+  POLISENT_PROTOTYPES_PATH    артефакт жолы (әдепкі data/tactic_prototypes.npz)
+"""
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+FORMAT = 1
+ENCODE_BATCH = 16
+
+
+def _l2(m: np.ndarray) -> np.ndarray:
+    n = np.linalg.norm(m, axis=-1, keepdims=True)
+    return m / np.maximum(n, 1e-12)
+
+
+class TextEncoder:
+    """Мәтін -> mean-pooled соңғы жасырын күй; модель шегінен ұзын мәтін токен бөліктерімен орташаланады."""
+
+    def __init__(self, tokenizer, model, max_length: int = 512, batch_size: int = ENCODE_BATCH):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.max_length = max_length
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_pipeline(cls, clf, **kw) -> "TextEncoder":
+        """zero-shot pipeline моделінің энкодері (классификатор басынсыз) – салмақтар ортақ, қайта жүктелмейді."""
+        from .nli_engine import _max_length
+        model = clf.model
+        return cls(clf.tokenizer, getattr(model, "base_model", model),
+                   max_length=_max_length(clf.tokenizer, model.config), **kw)
+
+    def _template(self) -> Tuple[List[int], List[int]]:
+        # build_inputs_with_special_tokens барлық нұсқада жоқ (nli_engine._pair_template сияқты)
+        if not hasattr(self, "_tpl"):
+            a = self.tokenizer("a", add_special_tokens=False)["input_ids"]
+            full = self.tokenizer("a")["input_ids"]
+            i = next((i for i in range(len(full)) if full[i:i + len(a)] == a), None)
+            if i is None:
+                raise ValueError("Токенайзердің үлгісін анықтау мүмкін болмады")
+            self._tpl = (full[:i], full[i + len(a):])
+        return self._tpl
+
+    def _chunks(self, text: str) -> List[List[int]]:
+        prefix, suffix = self._template()
+        ids = self.tokenizer(text, add_special_tokens=False)["input_ids"]
+        room = max(1, self.max_length - len(prefix) - len(suffix))
+        pieces = [ids[i:i + room] for i in range(0, len(ids), room)] or [[]]
+        return [prefix + p + suffix for p in pieces]
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        import torch
+        rows: List[Tuple[int, List[int]]] = []
+        for i, t in enumerate(texts):
+            rows.extend((i, c) for c in self._chunks(t))
+        order = sorted(range(len(rows)), key=lambda k: len(rows[k][1]))
+        sums: Optional[np.ndarray] = None
+        counts = np.zeros(len(texts), dtype=np.float64)
+        pad = self.tokenizer.pad_token_id or 0
+        for s in range(0, len(order), self.batch_size):
+            part = [rows[k] for k in order[s:s + self.batch_size]]
+            width = max(len(c) for _, c in part)
+            ids = np.full((len(part), width), pad, dtype=np.int64)
+            mask = np.zeros((len(part), width), dtype=np.int64)
+            for r, (_, c) in enumerate(part):
+                ids[r, :len(c)] = c
+                mask[r, :len(c)] = 1
+            with torch.inference_mode():
+                hidden = self.model(input_ids=torch.from_numpy(ids).to(self.model.device),
+                                    attention_mask=torch.from_numpy(mask).to(self.model.device))[0]
+            hidden = hidden.float().cpu().numpy()
+            tok_sum = (hidden * mask[..., None]).sum(axis=1)
+            if sums is None:
+                sums = np.zeros((len(texts), hidden.shape[-1]), dtype=np.float64)
+            for r, (i, _) in enumerate(part):
+                # бөліктер токен санымен салмақталады = бүкіл мәтін бойынша орта
+                sums[i] += tok_sum[r]
+                counts[i] += mask[r].sum()
+        if sums is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        return (sums / np.maximum(counts, 1)[:, None]).astype(np.float32)
+
+
+def lexicon_terms(path) -> Dict[str, List[str]]:
+    """political_discourse_terms.json -> {тактика: ["атауы. анықтамасы", ...]}."""
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    out: Dict[str, List[str]] = {}
+    for tactic, items in data.items():
+        if not tactic or not str(tactic).strip():
+            continue
+        texts = []
+        for it in items or []:
+            term = (it or {}).get("termin", {})
+            name = str(term.get("name") or "").strip()
+            mean = str(term.get("mean") or "").strip()
+            if name:
+                texts.append(f"{name}. {mean}" if mean else name)
+        out[str(tactic)] = texts
+    return out
+
+
+class TacticPrototypes:
+    def __init__(self, labels: Sequence[str], matrix: np.ndarray, center: np.ndarray,
+                 temperature: float = 0.05, meta: Optional[Dict] = None):
+        self.labels = list(labels)
+        self.matrix = matrix          # [тактика, H], L2-нормаланған
+        self.center = center          # [H]
+        self.temperature = temperature
+        self.meta = meta or {}
+
+    @property
+    def version(self) -> str:
+        return self.meta.get("version", "")
+
+    @classmethod
+    def build(cls, encoder: TextEncoder, terms: Dict[str, List[str]], temperature: float = 0.05) -> "TacticPrototypes":
+        labels = [t for t, texts in terms.items() if texts]
+        # бір термин бірнеше тактикада болуы мүмкін – әрқайсысы бір рет кодталады
+        unique = sorted({x for t in labels for x in terms[t]})
+        pos = {x: i for i, x in enumerate(unique)}
+        vecs = encoder.encode(unique)
+        center = vecs.mean(axis=0)
+        vecs = _l2(vecs - center)
+        matrix = _l2(np.stack([vecs[[pos[x] for x in terms[t]]].mean(axis=0) for t in labels]))
+        return cls(labels, matrix.astype(np.float32), center.astype(np.float32), temperature,
+                   {"terms": {t: len(terms[t]) for t in labels}, "unique_terms": len(unique)})
+
+    def similarities(self, vecs: np.ndarray) -> np.ndarray:
+        return _l2(vecs - self.center) @ self.matrix.T
+
+    def classify(self, vecs: np.ndarray, labels: Optional[Sequence[str]] = None) -> List[Dict]:
+        """vecs [N, H] -> zero-shot пішіні: [{"labels", "scores", "similarities"}] (labels берілсе – тек солар)."""
+        cols = list(range(len(self.labels))) if labels is None else [self.labels.index(l) for l in labels]
+        sims = self.similarities(vecs)[:, cols]
+        z = sims / max(self.temperature, 1e-6)
+        z = np.exp(z - z.max(axis=1, keepdims=True))
+        probs = z / z.sum(axis=1, keepdims=True)
+        out = []
+        for p, s in zip(probs, sims):
+            top = list(reversed(p.argsort(kind="stable")))
+            out.append({"labels": [self.labels[cols[i]] for i in top], "scores": [float(p[i]) for i in top],
+                        "similarities": [float(s[i]) for i in top]})
+        return out
+
+    def save(self, path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = dict(self.meta)
+        meta.update({"format": FORMAT, "labels": self.labels, "temperature": self.temperature})
+        meta.setdefault("created", time.strftime("%Y-%m-%dT%H:%M:%S"))
+        h = hashlib.sha256(self.matrix.tobytes())
+        h.update(self.center.tobytes())
+        meta["version"] = f"{meta['created'][:10]}-{h.hexdigest()[:12]}"
+        self.meta = meta
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(tmp, matrix=self.matrix, center=self.center,
+                 meta=np.frombuffer(json.dumps(meta, ensure_ascii=False).encode("utf-8"), dtype=np.uint8))
+        tmp.replace(path)
+        return path
+
+    @classmethod
+    def load(cls, path) -> "TacticPrototypes":
+        with np.load(str(path), allow_pickle=False) as z:
+            meta = json.loads(bytes(z["meta"]).decode("utf-8"))
+            if meta.get("format") != FORMAT:
+                raise ValueError(f"Прототип артефакт форматы {meta.get('format')}, күтілгені {FORMAT}")
+            return cls(meta["labels"], z["matrix"], z["center"], float(meta.get("temperature", 0.05)), meta)
@@ -0,0 +1,1739 @@
+# analyzer/discourse/tests.py
+"""
+`python manage.py test discourse` – модель салмақтарынсыз жүретін тесттер.
+
+Жылдам қозғалтқыштар бастапқы алгоритммен бума корпусында (discourse_data.json, лексикон)
+салыстырылады: нәтиже бастапқы нұсқамен дәл сәйкес келуі керек.
+"""
+import asyncio
+import io
+import itertools
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from unittest import mock, skipUnless
+
+import numpy as np
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+
+from . import debate_session, metrics, onto_props, onto_runtime, onto_snapshot, pd_analyzer
+from .campaign_onto_rules import REGEX_RULES, detect_regex
+from .cascade import CascadeModel, HashedFeaturizer, load_tactic_dataset, pick_threshold, threshold_table
+from .columnar import TABLES, ColumnarWriter, arrow_schema, flatten
+from .debate_rules import analyze_debate, segment_debate
+from .debate_session import DebateSession
+from .doc_context import DocContext, SpanIndex, sent_tokenize
+from .index_registry import IndexRegistry, content_digest
+from .inference_pool import InferencePool, Saturated
+from .kk_stem import stem
+from .label_matcher import LabelMatcher, label_tokens, text_tokens
+from .nli_engine import NLIEngine, NLITask, postprocess
+from .nli_scheduler import NLIScheduler
+from .nli_windows import WindowedClassifier, exceeds_budget, pool_scores, split_windows
+from .result_cache import ResultCache
+from .tactic_prototypes import TacticPrototypes, TextEncoder, lexicon_terms as prototype_terms
+
+try:
+    import rdflib
+except ImportError:
+    rdflib = None
+try:
+    import torch
+except ImportError:
+    torch = None
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+LEXICON_PATH = Path(settings.BASE_DIR) / "data" / "political_discourse_terms.json"
+CORPUS_PATH = Path(__file__).resolve().parent / "discourse_data.json"
+
+
+@lru_cache(maxsize=1)
+def corpus_texts():
+    """discourse_data.json анықтамалары (термин + мағынасы) – ~7 мың нақты қазақ мәтіні."""
+    with open(CORPUS_PATH, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return tuple(f"{row.get('Терминдер', '')}. {row['Мағынасы']}"
+                 for rows in data.values() for row in rows or []
+                 if isinstance(row, dict) and row.get("Мағынасы"))
+
+
+@lru_cache(maxsize=1)
+def lexicon_terms():
+    idx = pd_analyzer.build_index_from_json(str(LEXICON_PATH))
+    return sorted({t for bags in idx.values() for t in (*bags["phrases"], *bags["tokens"])})
+
+
+# --- бастапқы алгоритмдер (салыстыру эталоны)
+def _baseline_score_text(text, index, weight_phrase=2.0, weight_token=1.0):
+    """Бастапқы score_text: әр тактика, әр термин бойынша мәтінді қайта сканерлеу."""
+    toks = pd_analyzer.tokenize(text)
+    joined = " " + " ".join(toks) + " "
+    results = []
+    for tactic, bags in index.items():
+        score, hits = 0.0, []
+        for ph in bags["phrases"]:
+            if ph in joined:
+                c = joined.count(ph)
+                score += weight_phrase * c
+                hits.append((ph, c, "phrase"))
+        for tk in bags["tokens"]:
+            cnt = 0
+            for r in pd_analyzer._token_roots(tk):
+                cnt += sum(1 for t in toks if t.startswith(r))
+            if cnt > 0:
+                score += weight_token * cnt
+                hits.append((tk, cnt, "prefix"))
+        if score > 0:
+            results.append((tactic, score, sorted(hits, key=lambda x: x[1], reverse=True)[:10]))
+    if not results:
+        hits, total = [], 0
+        for root in pd_analyzer.CUE_POL:
+            cnt = sum(1 for t in toks if t.startswith(root))
+            if cnt > 0:
+                hits.append((root, cnt, "cue"))
+                total += cnt
+        hits.sort(key=lambda x: x[1], reverse=True)
+        if total > 0:
+            results.append(("CueWords", float(total), hits[:10]))
+    results.sort(key=lambda x: x[1], reverse=True)
+    return results
+
+
+def _naive_label_find(text, keys, key_fn=None):
+    """Әр токен позициясынан әр ұзындықтағы n-грамды label кілттерімен тікелей салыстыру."""
+    table, longest = {}, 0
+    for key in keys:
+        toks = label_tokens(key)
+        if key_fn is not None:
+            toks = tuple(key_fn(t) for t in toks)
+        if toks:
+            table.setdefault(toks, []).append(key)
+            longest = max(longest, len(toks))
+    toks = text_tokens(text)
+    hits = []
+    for i in range(len(toks)):
+        for n in range(1, longest + 1):
+            window = toks[i:i + n]
+            if len(window) < n or window[-1][2] is None:
+                break
+            gram = tuple(key_fn(k) if key_fn else k for _, _, k in window)
+            if gram in table:
+                hits.append((window[0][0], window[-1][1], table[gram]))
+    hits.sort(key=lambda h: (h[0], h[1]))
+    return hits
+
+
+def _baseline_detect_regex(text):
+    """Бастапқы detect_regex: әр ереже бөлек finditer."""
+    hits = []
+    for device, pats in REGEX_RULES.items():
+        for pat in pats:
+            for m in re.compile(pat, re.I | re.U).finditer(text):
+                hits.append({"device": device, "pattern": pat, "match": m.group(0),
+                             "span": [m.start(), m.end()]})
+    return hits
+
+
+def _baseline_segment_debate(text):
+    """Бастапқы segment_debate (офсетсіз)."""
+    turns = []
+    for ln in (ln.strip() for ln in text.splitlines() if ln.strip()):
+        m = re.match(r"^\s*([A-ZӘӨҰҮҚҒІА-Я][^\:]{0,60})\:\s*(.+)$", ln)
+        if m:
+            turns.append({"speaker": m.group(1).strip(), "text": m.group(2).strip()})
+            continue
+        m2 = re.match(r"^\s*[-—]\s*(.+)$", ln)
+        if m2:
+            turns.append({"speaker": "unknown", "text": m2.group(1).strip()})
+        elif turns and turns[-1]["speaker"] == "unknown":
+            turns[-1]["text"] += " " + ln
+        else:
+            turns.append({"speaker": "unknown", "text": ln})
+    return turns
+
+
+# str.splitlines бөлетін жол соңдары: "mixed" стенограммада әр жолда кездейсоқ біреуі
+LINE_BREAKS = ("\n", "\r\n", "\r", "\x0b", "\x0c", "\x1c", "\x85", "\u2028", "\u2029")
+
+
+def debate_transcript(seed, n_lines=40, sep=None):
+    """
+    Корпус сөйлемдерінен стенограмма: спикер жолдары, сызықша репликалар, жалғас жолдар.
+    sep – жол соңы ("mixed" – әр жолда LINE_BREAKS-тен біреуі); берілмесе LF не CRLF.
+    """
+    rnd = random.Random(seed)
+    texts = corpus_texts()
+    lines = []
+    for _ in range(n_lines):
+        body = rnd.choice(texts)[:rnd.randint(20, 160)].replace(":", ",")
+        form = rnd.random()
+        if form < 0.6:
+            lines.append(f"{rnd.choice(['Модератор', 'Үміткер А', 'Үміткер Б'])}: {body}")
+        elif form < 0.75:
+            lines.append(f"— {body}")
+        elif form < 0.9:
+            lines.append(f"  {body}")
+        else:
+            lines.append("")
+    if sep == "mixed":
+        return "".join(line + rnd.choice(LINE_BREAKS) for line in lines)
+    if sep is None:
+        sep = "\r\n" if seed % 2 else "\n"
+    return sep.join(lines)
+
+
+def _dump(turns):
+    return [json.dumps(t, ensure_ascii=False, sort_keys=True) for t in turns]
+
+
+class StemTableTests(SimpleTestCase):
+    # сөз -> күтілетін түбір: лексикон мен мәтін кілттері бір-біріне сәйкес келуі керек
+    CASES = {
+        "кітап": "кітап",            # атаулы түбір: -п көсемше емес
+        "кітабы": "кітап",           # б/п алмасуы
+        "мектептерде": "мектеп",
+        "сарай": "сарай",            # атаулы түбір: -й қиылмайды
+        "халық": "халық",
+        "халқымыз": "халық",         # түскен дауысты: ық/қ
+        "халықтың": "халық",
+        "ерікті": "ерік",
+        "жүрек": "жүрек",
+        "жүрегі": "жүрек",           # к/г алмасуы
+        "тарағы": "тарақ",           # қ/ғ алмасуы
+        "айтты": "айт",
+        "айтып": "айт",              # -ып көсемше
+        "айыптаған": "айыпта",
+        "сайлау": "сайла",
+        "сайлауда": "сайла",
+        "жемқорлық": "жемқор",
+        "саясатшылар": "саясат",
+        "партиясы": "партия",
+        "үкіметтің": "үкімет",
+    }
+
+    def test_table(self):
+        for word, expected in self.CASES.items():
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+    def test_inflected_forms_share_key(self):
+        for a, b in [("халық", "халқымыз"), ("кітап", "кітабы"), ("жүрек", "жүрегі")]:
+            self.assertEqual(stem(a), stem(b))
+
+
+class LexiconScoringTests(SimpleTestCase):
+    """Префикс-trie бойынша бір өтулі score_text == бастапқы тактика × термин сканері."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.index = pd_analyzer.build_index_from_json(str(LEXICON_PATH))
+
+    def test_corpus_matches_baseline(self):
+        plain = dict(self.index)   # сол set-тер – итерация реті бірдей
+        with mock.patch.object(pd_analyzer, "MATCH_MODE", "prefix"):
+            for i, text in enumerate(corpus_texts()[::3]):
+                with self.subTest(i=i):
+                    self.assertEqual(pd_analyzer.score_text(text, self.index), _baseline_score_text(text, plain))
+
+    def test_precomputed_tokens_and_repeated_phrases(self):
+        phrase = next(iter(next(b["phrases"] for b in self.index.values() if b["phrases"])))
+        text = f"{phrase} {phrase}, {phrase}! Сайлау, партия, халық."
+        with mock.patch.object(pd_analyzer, "MATCH_MODE", "prefix"):
+            expected = _baseline_score_text(text, dict(self.index))
+            self.assertEqual(pd_analyzer.score_text(text, self.index), expected)
+            self.assertEqual(pd_analyzer.score_text(text, self.index, tokens=pd_analyzer.tokenize(text)), expected)
+
+    def test_overlapping_phrases_count_like_str_count(self):
+        # joined.count(ph) қабаттаспайтын кірулерді санайды; бірінші сөз токеннің соңына сәйкес келеді
+        index = {"т1": {"phrases": {"ала ала", "ба ала"}, "tokens": {"ала"}},
+                 "т2": {"phrases": {"ала ала ала"}, "tokens": set()}}
+        for text in ("ала ала ала ала ала", "қала ала ала. Жаба ала", "ала", "алаала ала"):
+            with self.subTest(text=text), mock.patch.object(pd_analyzer, "MATCH_MODE", "prefix"):
+                self.assertEqual(pd_analyzer.score_text(text, index), _baseline_score_text(text, index))
+
+    def test_doc_context_tokens_reach_tactic_scoring(self):
+        from . import views
+        texts = [*corpus_texts()[::50], "ЖЕМҚОР\r\nбилік — ел!", "Қазақстан\u00a0халқы"]
+        expected = [views.lexicon_tactic(t) for t in texts]
+        ctxs = [DocContext(t) for t in texts]
+        self.assertEqual([c.pd_tokens for c in ctxs], [pd_analyzer.tokenize(t) for t in texts])
+        # ctx берілсе мәтін қайта токенизацияланбайды
+        with mock.patch.object(pd_analyzer, "tokenize", side_effect=AssertionError("қайта токенизация")):
+            self.assertEqual([views.lexicon_tactic(t, c) for t, c in zip(texts, ctxs)], expected)
+            with mock.patch.object(views, "TACTIC_TOPK", 2):
+                for t, c in zip(texts, ctxs):
+                    views.tactic_candidates(t, c)
+
+    def test_cue_fallback(self):
+        text = "Парламенттегі оппозиция мен коалиция"
+        with mock.patch.object(pd_analyzer, "MATCH_MODE", "prefix"):
+            self.assertEqual(pd_analyzer.score_text(text, {}), _baseline_score_text(text, {}))
+
+
+class LabelMatcherTests(SimpleTestCase):
+    """Aho-Corasick == әр позициядан барлық n-грамды тікелей тексеру (қабаттасқан, қайталанған)."""
+
+    def test_corpus_matches_naive_scan(self):
+        keys = lexicon_terms()
+        matcher = LabelMatcher(keys)
+        for i, text in enumerate(corpus_texts()[::3]):
+            with self.subTest(i=i):
+                self.assertEqual(matcher.find(text), _naive_label_find(text, keys))
+
+    def test_stem_keys_match_naive_scan(self):
+        keys = lexicon_terms()
+        matcher = LabelMatcher(keys, key_fn=stem)
+        for i, text in enumerate(corpus_texts()[1::7]):
+            with self.subTest(i=i):
+                self.assertEqual(matcher.find(text), _naive_label_find(text, keys, key_fn=stem))
+
+    def test_overlaps_offsets_and_breaks(self):
+        keys = ["сайлау", "сайлау комиссиясы", "орталық сайлау комиссиясы", "комиссиясы"]
+        text = "«Орталық сайлау комиссиясы» – сайлау. Сайлау — комиссиясы"
+        hits = LabelMatcher(keys).find(text)
+        self.assertEqual(hits, _naive_label_find(text, keys))
+        self.assertEqual([text[s:e] for s, e, _ in hits],
+                         ["Орталық сайлау комиссиясы", "сайлау", "сайлау комиссиясы", "комиссиясы",
+                          "сайлау", "Сайлау", "комиссиясы"])
+        # тек тыныс белгісінен тұратын токен (—) тіркесті үзеді
+        self.assertNotIn("сайлау комиссиясы", [k for s, _, ks in hits if s > 40 for k in ks])
+        self.assertEqual(LabelMatcher(keys).find(text, max_tokens=1),
+                         [h for h in hits if len(label_tokens(h[2][0])) == 1])
+
+
+class RegexScanTests(SimpleTestCase):
+    """Біріктірілген сканер == әр ереженің жеке finditer-і (құрылғы, өрнек, span, реті)."""
+
+    SAMPLES = [
+        "Біз депутат болсақ, салықты қайта қараймын және жалақыны көтереміз. Дауыс беріңіз!",
+        "Мен депутат болсам, бәрін өзгертемін. Болсам болсам жасаймын етемін.",
+        "Ол өтірік айтты, уәдесін орындамады – масқара, жемқорлық! ОСК үгіт-насихат кезеңі.",
+        "Орталық сайлау комиссиясы дауыс беру нәтижесі туралы. Қосылыңыздар, қолдаңыз.",
+        "Уәде береміз: жүзеге асырамыз, орындаймыз.\nБолсақ\nжасаймыз.",
+    ]
+
+    def test_corpus_matches_per_rule_scan(self):
+        for i, text in enumerate((*self.SAMPLES, *corpus_texts())):
+            with self.subTest(i=i):
+                self.assertEqual(detect_regex(text), _baseline_detect_regex(text))
+
+    def test_long_transcript_matches_per_rule_scan(self):
+        text = "\n".join(self.SAMPLES * 20 + list(corpus_texts()[:300]))
+        self.assertEqual(detect_regex(text), _baseline_detect_regex(text))
+
+
+class LabelledOntologyMixin:
+    """Бума онтологияда label жоқ – лексикон терминдері (фразалар да) дана label-і болатын уақытша OWL."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._onto_tmp = tempfile.TemporaryDirectory()
+        path = Path(cls._onto_tmp.name) / "onto.owl"
+        g = rdflib.Graph()
+        for i, term in enumerate(lexicon_terms()):
+            node = rdflib.URIRef(f"http://example.org/test#t{i}")
+            g.add((node, rdflib.RDF.type, rdflib.URIRef("http://example.org/test#Party")))
+            g.add((node, rdflib.RDFS.label, rdflib.Literal(term, lang="kk")))
+        g.serialize(str(path), format="xml")
+        cls._onto_paths = (onto_runtime.ONTO_PATH, onto_runtime.ONTO_SNAPSHOT_PATH)
+        onto_runtime.ONTO_PATH, onto_runtime.ONTO_SNAPSHOT_PATH = path, path.with_suffix(".snap")
+        onto_runtime.registry.reload("ontology", force=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        onto_runtime.ONTO_PATH, onto_runtime.ONTO_SNAPSHOT_PATH = cls._onto_paths
+        onto_runtime.registry.reload("ontology", force=True)
+        cls._onto_tmp.cleanup()
+        super().tearDownClass()
+
+
+@skipUnless(rdflib, "rdflib орнатылмаған")
+class DebateSessionTests(LabelledOntologyMixin, SimpleTestCase):
+    """Инкременттік сессия кез келген қадамда analyze_debate(бүкіл мәтін)-мен бірдей."""
+
+    def test_mentions_map_to_transcript(self):
+        text = debate_transcript(5)
+        found = 0
+        for t in analyze_debate(text)["turns"]:
+            for h in t["mentions"]:
+                s, e = h["span"]
+                self.assertEqual(" ".join(text[s:e].split()), " ".join(h["match"].split()))
+                found += 1
+        self.assertGreater(found, 10)
+
+    def assertSameAsFull(self, s):
+        ref = analyze_debate(s.text)
+        self.assertEqual(_dump(s.results), _dump(ref["turns"]))
+        self.assertEqual(s.by_speaker, ref["by_speaker"])
+
+    def check_appends(self, seed, text):
+        """text кездейсоқ бөліктермен өседі; әр қадамда толық талдаумен салыстырылады."""
+        rnd = random.Random(seed)
+        cuts = sorted(rnd.sample(range(1, len(text)), 12)) + [len(text)]
+        s, prev = DebateSession(f"t{seed}"), 0
+        for cut in cuts:
+            with self.subTest(seed=seed, cut=cut):
+                s.append(text[prev:cut])
+                prev = cut
+                self.assertSameAsFull(s)
+
+    def test_segmentation_matches_baseline(self):
+        for seed, sep in enumerate((None, None, None, None, "\r", "mixed", "mixed")):
+            text = debate_transcript(seed, sep=sep)
+            turns = segment_debate(text)
+            self.assertEqual([{"speaker": t["speaker"], "text": t["text"]} for t in turns],
+                             _baseline_segment_debate(text))
+            for t in turns:
+                self.assertEqual(" ".join(text[s:e] for s, e in t["segments"]), t["text"])
+
+    def test_appends_match_full_analysis(self):
+        for seed in range(4):
+            self.check_appends(seed, debate_transcript(seed))
+
+    def test_appends_with_other_line_breaks(self):
+        # segment_debate str.splitlines бойынша бөледі: жалғыз \r, \x0b, \u2028 т.б. те жол соңы
+        for seed, sep in enumerate(("\r", "\u2028", "mixed", "mixed", "mixed")):
+            self.check_appends(seed, debate_transcript(seed, sep=sep))
+
+    def test_edits_match_full_analysis(self):
+        text = debate_transcript(7)
+        s = DebateSession("edit")
+        s.update(text)
+        lines = text.split("\n")
+        for i in (len(lines) - 1, len(lines) // 2, 0):
+            lines[i] = "Үміткер Б: Бұл өтірік, дұрыс емес!"
+            with self.subTest(line=i):
+                s.update("\n".join(lines))
+                self.assertSameAsFull(s)
+        s.update("\n".join(lines[:5]))   # қысқарту
+        self.assertSameAsFull(s)
+
+    def test_unchanged_turns_are_reused(self):
+        text = debate_transcript(3)
+        s = DebateSession("reuse")
+        s.update(text)
+        before = list(s.results)
+        delta = s.append("\nМодератор: Келесі сұрақ?")
+        self.assertEqual(s.results[:len(before) - 1], before[:-1])
+        self.assertTrue(all(a is b for a, b in zip(s.results[:delta["from"]], before)))
+        self.assertSameAsFull(s)
+
+
+class ResultCacheTests(SimpleTestCase):
+    def test_memory_lru_eviction(self):
+        c = ResultCache(mem_items=2)
+        c.set("a", {"v": 1})
+        c.set("b", {"v": 2})
+        self.assertEqual(c.get("a"), {"v": 1})   # a – жақында қолданылған
+        c.set("c", {"v": 3})
+        self.assertIsNone(c.get("b"))
+        self.assertEqual(c.get("a"), {"v": 1})
+        self.assertEqual(c.get("c"), {"v": 3})
+        self.assertEqual(c.stats()["mem_items"], 2)
+
+    def test_returns_copies(self):
+        c = ResultCache(mem_items=4)
+        c.set("k", {"xs": [1]})
+        c.get("k")["xs"].append(2)
+        self.assertEqual(c.get("k"), {"xs": [1]})
+
+    def test_disk_eviction_drops_oldest(self):
+        clock = itertools.count(1000)
+        with tempfile.TemporaryDirectory() as d, \
+                mock.patch("discourse.result_cache.time.time", side_effect=lambda: next(clock)):
+            value = {"text": "x" * 100}
+            size = len(json.dumps(value))
+            c = ResultCache(str(Path(d) / "c.sqlite3"), mem_items=0, max_bytes=size * 5)
+            for i in range(5):
+                c.set(f"k{i}", value)
+            self.assertEqual(c.stats()["evictions"], 0)
+            self.assertEqual(c.get("k0"), value)          # k0 atime жаңарды – k1 ең ескі
+            c.set("k5", value)
+            stats = c.stats()
+            self.assertEqual(stats["evictions"], 2)       # 90%-ға дейін: 6 -> 4
+            self.assertLessEqual(stats["disk_bytes"], size * 5 * 0.9)
+            self.assertIsNone(c.get("k1"))
+            self.assertIsNone(c.get("k2"))
+            for k in ("k0", "k3", "k4", "k5"):
+                self.assertEqual(c.get(k), value)
+            # басқа процесс ашқан кэш те сол жазбаларды көреді
+            self.assertEqual(ResultCache(str(Path(d) / "c.sqlite3")).get("k5"), value)
+
+
+class IndexRegistryTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "lexicon.json"
+        self.path.write_text('{"a": 1}', encoding="utf-8")
+        self.builds = 0
+        self.reg = IndexRegistry(interval=0)
+        self.reg.register("lex", lambda: [self.path], self._build)
+
+    def _build(self):
+        self.builds += 1
+        return json.loads(self.path.read_text(encoding="utf-8"))
+
+    def _rewrite(self, content):
+        self.path.write_text(content, encoding="utf-8")
+        st = self.path.stat()
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))   # mtime анық өзгереді
+
+    def test_version_before_and_after_build(self):
+        self.assertEqual(self.reg.version("lex"), content_digest([self.path]))
+        self.assertEqual(self.builds, 0)              # version() индексті құрмайды
+        self.assertEqual(self.reg.get("lex"), {"a": 1})
+        self.assertEqual(self.reg.version("lex"), content_digest([self.path]))
+
+    def test_reload_on_change_only(self):
+        first = self.reg.get("lex")
+        self.assertFalse(self.reg.reload("lex"))      # өзгеріс жоқ
+        self._rewrite('{"a": 1}')                       # тек touch – қайта құрылмайды
+        self.assertFalse(self.reg.reload("lex"))
+        self.assertIs(self.reg.get("lex"), first)
+        self.assertEqual(self.builds, 1)
+        self._rewrite('{"a": 2}')
+        self.assertTrue(self.reg.reload("lex"))
+        self.assertEqual(self.reg.get("lex"), {"a": 2})
+        self.assertEqual(self.reg.version("lex"), content_digest([self.path]))
+
+    def test_pinned_keeps_version_during_swap(self):
+        self.reg.get("lex")
+        with self.reg.pinned():
+            v = self.reg.version("lex")
+            self._rewrite('{"a": 3}')
+            self.assertTrue(self.reg.reload("lex"))
+            self.assertEqual(self.reg.get("lex"), {"a": 1})
+            self.assertEqual(self.reg.version("lex"), v)
+        self.assertEqual(self.reg.get("lex"), {"a": 3})
+
+    def test_failed_build_keeps_old_version(self):
+        self.reg.get("lex")
+        v = self.reg.version("lex")
+        self._rewrite("{ бұзылған")
+        with self.assertLogs("discourse.index_registry", "WARNING"):
+            self.assertFalse(self.reg.reload("lex"))
+        self.assertEqual(self.reg.get("lex"), {"a": 1})
+        self.assertEqual(self.reg.version("lex"), v)
+        self.assertFalse(self.reg.reload("lex"))      # сол бұзылған файл қайта құрылмайды
+        self.assertEqual(self.builds, 2)
+
+
+class SSEDeltaTests(SimpleTestCase):
+    """seq нөмірлері, delta "from", Last-Event-ID жалғасы және журналдан шыққанда snapshot."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from .views import _sse_frames
+        cls.frames = staticmethod(_sse_frames)
+
+    @staticmethod
+    def parse(frame):
+        fields = dict(line.split(": ", 1) for line in frame.strip().split("\n"))
+        return int(fields["id"]), fields["event"], json.loads(fields["data"])
+
+    def test_delta_sequence(self):
+        s = DebateSession("sse")
+        d1 = s.update("Модератор: Бастаймыз.\n")
+        d2 = s.append("Үміткер А: Бұл өтірік!\n")
+        d3 = s.append("Үміткер Б: Иә, бірақ дәлел бар ма?\n")
+        self.assertEqual([d["seq"] for d in (d1, d2, d3)], [1, 2, 3])
+        # ашық соңғы реплика қайта жіберіледі; жабылғандары жоқ
+        self.assertEqual([(d["from"], d["count"]) for d in (d1, d2, d3)], [(0, 1), (1, 2), (2, 3)])
+        self.assertEqual(d2["by_speaker"], {"Үміткер А": {"оң": 0, "теріс": 1, "бейтарап": 0}})
+        unchanged = s.update(s.text)
+        self.assertEqual((unchanged["seq"], unchanged["turns"]), (3, []))
+
+        events, reset = s.events_since(1)
+        self.assertFalse(reset)
+        frames, seq, done = self.frames(s, 1, events, reset)
+        self.assertEqual([self.parse(f)[:2] for f in frames], [(2, "delta"), (3, "delta")])
+        self.assertEqual((seq, done), (3, False))
+        # клиент delta-ларды қолданып толық күйді қалпына келтіреді
+        turns = []
+        for _, _, d in map(self.parse, self.frames(s, 0, *s.events_since(0))[0]):
+            turns = turns[:d["from"]] + d["turns"]
+        self.assertEqual(_dump(turns), _dump(s.snapshot()["turns"]))
+
+        self.assertEqual(self.frames(s, 3, *s.events_since(3)), ([": ping\n\n"], 3, False))
+        s.close()
+        frames, seq, done = self.frames(s, 3, *s.events_since(3))
+        self.assertEqual(self.parse(frames[0])[:2], (4, "closed"))
+        self.assertEqual((seq, done), (4, True))
+        with self.assertRaises(ValueError):
+            s.append("Модератор: тағы")
+
+    def test_backlog_overflow_sends_snapshot(self):
+        with mock.patch.object(debate_session, "BACKLOG", 2):
+            s = DebateSession("small")
+        for i in range(4):
+            s.append(f"Үміткер А: {i}-сөз\n")
+        self.assertEqual(s.events_since(0), ([], True))
+        self.assertEqual([d["seq"] for d in s.events_since(2)[0]], [3, 4])
+        frames, seq, done = self.frames(s, 0, [], True)
+        event_id, event, data = self.parse(frames[0])
+        self.assertEqual((event_id, event, seq, done), (4, "snapshot", 4, False))
+        self.assertEqual(len(data["turns"]), 4)
+
+    def test_wait_wakes_on_update(self):
+        s = DebateSession("wait")
+        t0 = time.monotonic()
+        self.assertEqual(s.wait(0, timeout=0.05), ([], False))
+        self.assertGreaterEqual(time.monotonic() - t0, 0.04)
+        threading.Timer(0.05, s.append, args=("Модератор: сәлем\n",)).start()
+        events, reset = s.wait(0, timeout=5)
+        self.assertEqual(([d["seq"] for d in events], reset), ([1], False))
+
+
+class AnalyzeCorpusTests(SimpleTestCase):
+    """analyze_corpus: жол жалаулары (tactic/use_model) және checkpoint-тен жалғасу."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from .management.commands import analyze_corpus
+        cls.cmd = analyze_corpus
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        root = Path(self.tmp.name)
+        self.src, self.out = root / "corpus.jsonl", root / "out.jsonl"
+        items = [{"id": f"d{i}", "text": t} for i, t in enumerate(corpus_texts()[:9])]
+        items[3]["tactic"] = "false"
+        items[5]["use_model"] = False
+        items.insert(7, ["объект емес"])
+        self.src.write_text("".join(json.dumps(it, ensure_ascii=False) + "\n" for it in items), encoding="utf-8")
+        self.n_items = len(items)
+
+    def run_cmd(self, out=None, **patches):
+        # worker инициализациясы модельді жүктейді – тесттерде қажет емес
+        with mock.patch.multiple(self.cmd, _init_worker=mock.DEFAULT, **patches):
+            call_command("analyze_corpus", str(self.src), "--output", str(out or self.out), "--workers", "1",
+                         "--batch-size", "2", "--checkpoint-every", "1", "--no-model", "--no-tactic",
+                         stdout=io.StringIO(), stderr=io.StringIO())
+
+    def rows(self, path=None):
+        with open(path or self.out, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_prepare_flags_are_json_booleans(self):
+        prepare, defaults = self.cmd._prepare, self.cmd.FORM_DEFAULTS
+        _, _, doc, err = prepare(0, {"text": "сәлем", "tactic": "false"}, defaults, True)
+        self.assertIsNone(doc)
+        self.assertEqual(list(err), ["tactic"])
+        self.assertEqual(err["tactic"][0]["code"], "invalid")
+        _, _, doc, err = prepare(1, {"text": "сәлем", "use_model": 0}, defaults, True)
+        self.assertEqual((doc, list(err)), (None, ["use_model"]))
+        _, _, doc, err = prepare(2, {"text": "сәлем", "tactic": False, "use_model": True}, defaults, True, False)
+        self.assertIsNone(err)
+        self.assertEqual((doc["tactic"], doc["use_model"]), (False, True))
+        _, _, doc, _ = prepare(3, {"text": "сәлем"}, defaults, True, False)
+        self.assertEqual((doc["tactic"], doc["use_model"]), (True, False))
+
+    def test_invalid_rows_are_reported_in_order(self):
+        self.run_cmd()
+        rows = self.rows()
+        self.assertEqual([r["index"] for r in rows], list(range(self.n_items)))
+        self.assertEqual(list(rows[3]["errors"]), ["tactic"])
+        self.assertIn("__all__", rows[7]["errors"])
+        self.assertEqual(sum("result" in r for r in rows), self.n_items - 2)
+
+    def interrupted_run(self, after_batches):
+        calls = []
+
+        def flaky(batch):
+            if len(calls) == after_batches:
+                raise KeyboardInterrupt
+            calls.append(batch)
+            return analyze_batch(batch)
+
+        analyze_batch = self.cmd.analyze_batch
+        with self.assertRaises(KeyboardInterrupt):
+            self.run_cmd(analyze_batch=flaky)
+
+    def test_resume_matches_uninterrupted_run(self):
+        ref = Path(self.tmp.name) / "ref.jsonl"
+        self.run_cmd(out=ref)
+        self.interrupted_run(after_batches=2)
+        ckpt = json.loads(Path(str(self.out) + self.cmd.CKPT_SUFFIX).read_text(encoding="utf-8"))
+        self.assertEqual((ckpt["done"], ckpt["complete"]), (4, False))
+        self.assertEqual(ckpt["bytes"], self.out.stat().st_size)
+        # checkpoint-тен кейін жартылай жазылған жол – жалғасқанда кесіліп, қайта есептеледі
+        with open(self.out, "ab") as f:
+            f.write(b'{"index": 4, "id": "d4", "res')
+        seen = []
+        analyze_batch = self.cmd.analyze_batch
+        self.run_cmd(analyze_batch=lambda b: seen.extend(i for i, *_ in b) or analyze_batch(b))
+        self.assertEqual(seen, list(range(4, self.n_items)))
+        self.assertEqual(self.rows(), self.rows(ref))
+
+    def test_complete_run_is_not_repeated(self):
+        self.run_cmd()
+        size = self.out.stat().st_size
+        with mock.patch.object(self.cmd, "analyze_batch") as batch:
+            self.run_cmd()
+        batch.assert_not_called()
+        self.assertEqual(self.out.stat().st_size, size)
+
+    def test_checkpoint_guards(self):
+        self.out.write_text("", encoding="utf-8")
+        with self.assertRaises(CommandError):
+            self.run_cmd()
+        self.out.unlink()
+        self.interrupted_run(after_batches=1)
+        other = Path(self.tmp.name) / "other.jsonl"
+        other.write_bytes(self.src.read_bytes())
+        self.src, src = other, self.src
+        with self.assertRaises(CommandError):
+            self.run_cmd()
+        self.src = src
+        self.run_cmd()
+        self.assertEqual(len(self.rows()), self.n_items)
+
+    @skipUnless(pyarrow, "pyarrow орнатылмаған")
+    def test_columnar_truncate_drops_parts_after_checkpoint(self):
+        from .columnar import ColumnarWriter
+        w = ColumnarWriter(Path(self.tmp.name) / "cols", "arrow")
+        for i in range(3):
+            w.write({"index": i, "id": f"d{i}", "result": {"label": "оң", "score": 0.5}})
+            w.flush()
+        parts = sorted(p.name for p in (w.root / "documents").iterdir())
+        self.assertEqual(len(parts), 3)
+        w.truncate(1)
+        self.assertEqual(sorted(p.name for p in (w.root / "documents").iterdir()), parts[:1])
+        self.assertEqual(w.parts, 1)
+
+
+class BackendVersionTests(SimpleTestCase):
+    """Кэш кілтіндегі backend – сұралғаны емес, нақты жүктелгені (ONNX құласа torch)."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from . import views
+        cls.views = views
+
+    def setUp(self):
+        self.views.get_nli_engine.cache_clear()
+        self.addCleanup(self.views.get_nli_engine.cache_clear)
+
+    def backend(self, requested, onnx):
+        v = self.views
+        torch_engine = mock.Mock(backend="torch")
+        with mock.patch.object(v, "NLI_BACKEND", requested), mock.patch.object(v, "_onnx_engine", onnx), \
+                mock.patch.object(v, "get_clf"), \
+                mock.patch.object(v.NLIEngine, "from_pipeline", return_value=torch_engine):
+            return v.cache_versions()["backend"]
+
+    def test_onnx_failure_is_recorded_as_torch(self):
+        self.assertEqual(self.backend("onnx", mock.Mock(side_effect=FileNotFoundError("жоқ"))), "torch")
+
+    def test_loaded_onnx_engine(self):
+        self.assertEqual(self.backend("onnx-fp32", mock.Mock(return_value=mock.Mock(backend="onnx-fp32"))),
+                         "onnx-fp32")
+
+    def test_torch_does_not_load_model(self):
+        onnx = mock.Mock()
+        self.assertEqual(self.backend("torch", onnx), "torch")
+        onnx.assert_not_called()
+        self.assertEqual(self.views.get_nli_engine.cache_info().currsize, 0)
+
+    def test_prototype_version_names_encoder_backend(self):
+        protos = mock.Mock(version="abc")
+        with mock.patch.object(self.views, "active_prototypes", return_value=protos):
+            self.assertEqual(self.views.cache_versions()["tactic"], "prototype:abc@torch")
+
+
+def tiny_tokenizer(max_length=64):
+    """Корпус сөздерінен WordLevel fast токенайзер (XLM-R жұп үлгісі: <s> A </s></s> B </s>)."""
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors
+    from transformers import PreTrainedTokenizerFast
+    vocab = {"<s>": 0, "<pad>": 1, "</s>": 2, "<unk>": 3}
+    for w in sorted({w for t in corpus_texts()[:300] for w in t.split()}):
+        vocab.setdefault(w, len(vocab))
+    tk = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    tk.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    tk.post_processor = processors.TemplateProcessing(
+        single="<s> $A </s>", pair="<s> $A </s> </s> $B </s>", special_tokens=[("<s>", 0), ("</s>", 2)])
+    return PreTrainedTokenizerFast(tokenizer_object=tk, bos_token="<s>", eos_token="</s>", pad_token="<pad>",
+                                   unk_token="<unk>", model_max_length=max_length)
+
+
+def tiny_nli_pipeline(max_length=64):
+    """Кездейсоқ салмақты кіші XLM-R + tiny_tokenizer – салмақ файлдарынсыз pipeline."""
+    from transformers import XLMRobertaConfig, XLMRobertaForSequenceClassification, pipeline
+    tok = tiny_tokenizer(max_length)
+    torch.manual_seed(0)
+    labels = ["contradiction", "neutral", "entailment"]
+    config = XLMRobertaConfig(vocab_size=len(tok), hidden_size=16, num_hidden_layers=1, num_attention_heads=2,
+                              intermediate_size=32, max_position_embeddings=max_length + 2, pad_token_id=1,
+                              num_labels=3, label2id={l: i for i, l in enumerate(labels)},
+                              id2label=dict(enumerate(labels)))
+    model = XLMRobertaForSequenceClassification(config).eval()
+    return pipeline("zero-shot-classification", model=model, tokenizer=tok, device=-1)
+
+
+@skipUnless(torch, "torch орнатылмаған")
+class NLIEngineTests(SimpleTestCase):
+    """Batched NLIEngine == HF zero-shot pipeline (only_first truncation, postprocess, тапсырма реті)."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.clf = tiny_nli_pipeline()
+        cls.engine = NLIEngine.from_pipeline(cls.clf, batch_size=3)
+        texts = corpus_texts()
+        # қысқа мәтіндер + модель шегінен ұзындары (кесілуі керек)
+        cls.texts = [*texts[:4], " ".join(texts[:40]), " ".join(texts[100:112])]
+
+    def test_encode_pairs_truncate_only_premise(self):
+        hyps = ["Бұл оң екенін көрсетеді.", " ".join(corpus_texts()[200:203])]
+        pairs = [(t, h) for t in self.texts for h in hyps]
+        expected = [self.clf.tokenizer(p, h, truncation="only_first", max_length=self.engine.max_length)["input_ids"]
+                    for p, h in pairs]
+        self.assertEqual(self.engine.encode_pairs(pairs), expected)
+        self.assertTrue(any(len(ids) == self.engine.max_length for ids in expected))
+
+    def test_classify_matches_pipeline(self):
+        label_sets = [["оң", "бейтарап", "теріс"], ["қуаныш", "ашу", "қорқыныш", "сенім"], ["популизм"]]
+        hyp = "Бұл {} екенін көрсетеді."
+        tasks = [NLITask(t, labels, hyp) for t in self.texts for labels in label_sets]
+        for multi_label in (False, True):
+            results = self.engine.classify(tasks, multi_label=multi_label)
+            for task, res in zip(tasks, results):
+                with self.subTest(text=task.premise[:30], labels=task.labels, multi_label=multi_label):
+                    ref = self.clf(task.premise, candidate_labels=list(task.labels), hypothesis_template=hyp,
+                                   multi_label=multi_label)
+                    self.assertEqual(res["labels"], ref["labels"])
+                    np.testing.assert_allclose(res["scores"], ref["scores"], rtol=1e-5, atol=1e-6)
+
+    def test_postprocess_matches_pipeline(self):
+        rng = np.random.default_rng(0)
+        for n_labels, multi_label, entailment_id in itertools.product((1, 2, 5), (False, True), (0, 2)):
+            labels = [f"l{i}" for i in range(n_labels)]
+            logits = rng.normal(size=(n_labels, 3)).astype(np.float32)
+            outputs = [{"candidate_label": l, "sequence": "s", "logits": torch.from_numpy(logits[i:i + 1])}
+                       for i, l in enumerate(labels)]
+            with self.subTest(n_labels=n_labels, multi_label=multi_label, entailment_id=entailment_id), \
+                    mock.patch.object(type(self.clf), "entailment_id", new_callable=mock.PropertyMock,
+                                      return_value=entailment_id):
+                ref = self.clf.postprocess(outputs, multi_label=multi_label)
+                res = postprocess(labels, logits, entailment_id, multi_label)
+                self.assertEqual(res["labels"], ref["labels"])
+                np.testing.assert_allclose(res["scores"], ref["scores"], rtol=1e-6)
+
+    def test_empty_tasks(self):
+        res = self.engine.classify([NLITask("мәтін", [], "{}"), NLITask("мәтін", ["оң"], "{}")])
+        self.assertEqual((res[0]["labels"], res[0]["scores"]), ([], []))
+        self.assertEqual(res[1]["labels"], ["оң"])
+
+
+class AnalyzeApiTests(SimpleTestCase):
+    """/api/analyze: сұрау деңгейіндегі 400/413, құжат деңгейіндегі қателер жолдарда, реті сақталады."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from . import views
+        cls.views = views
+
+    def post(self, payload, raw=None):
+        body = raw if raw is not None else json.dumps(payload, ensure_ascii=False)
+        return self.client.post("/api/analyze", data=body, content_type="application/json")
+
+    def test_request_errors(self):
+        self.assertEqual(self.post(None, raw="{").status_code, 400)
+        self.assertEqual(self.post({"documents": []}).status_code, 400)
+        self.assertEqual(self.post({"documents": "мәтін"}).status_code, 400)
+        self.assertEqual(self.post({"documents": ["а"], "tactic": "false"}).status_code, 400)
+        resp = self.post({"documents": ["а", {"text": "б", "use_model": "false"}]})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("documents[1]", resp.json()["error"])
+        with mock.patch.object(self.views, "API_MAX_DOCS", 2):
+            self.assertEqual(self.post(["а", "б", "в"]).status_code, 413)
+        self.assertEqual(self.client.get("/api/analyze").status_code, 405)
+
+    def test_rows_keep_order_ids_and_errors(self):
+        texts = corpus_texts()[:2]
+        payload = {
+            "use_model": False, "task": "sentiment",
+            "documents": [texts[0], {"text": ""}, 42,
+                          {"id": "d", "text": texts[1], "domain": "сайлауалды пікірсайыс", "tactic": False}],
+        }
+        resp = self.post(payload)
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(data["count"], 4)
+        rows = data["results"]
+        self.assertEqual([r["id"] for r in rows], [0, 1, 2, "d"])
+        self.assertIn("text", rows[1]["errors"])
+        self.assertIn("__all__", rows[2]["errors"])
+        base = dict(self.views.FORM_DEFAULTS, task="sentiment", use_model=False)
+        expected = self.views.analyze_documents([
+            {**base, "text": texts[0], "tactic": True},
+            {**base, "text": texts[1], "domain": "сайлауалды пікірсайыс", "tactic": False},
+        ])
+        self.assertEqual([rows[0]["result"], rows[3]["result"]], json.loads(json.dumps(expected)))
+        self.assertIn("debate", rows[3]["result"])
+        self.assertNotIn("tactic_zero_shot", rows[3]["result"])
+        self.assertEqual(rows[0]["result"]["tactic_zero_shot"]["source"], "lexicon")
+
+
+class InferencePoolTests(SimpleTestCase):
+    """Шектеулі пул: кезек толы – 429, кезекте уақыт бітсе – 503; орын жұмыс аяқталғанда босайды."""
+
+    @staticmethod
+    async def until(cond):
+        for _ in range(500):
+            if cond():
+                return
+            await asyncio.sleep(0.01)
+        raise AssertionError("шарт орындалмады")
+
+    def test_queue_full_then_timeout(self):
+        pool = InferencePool(concurrency=1, max_queue=1, queue_timeout=0.2)
+        gate = threading.Event()
+
+        async def scenario():
+            first = asyncio.ensure_future(pool.run(gate.wait, 5))
+            await self.until(lambda: pool.stats()["inflight"] == 1)
+            queued = asyncio.ensure_future(pool.run(lambda: "кезекте"))
+            await self.until(lambda: pool.stats()["waiting"] == 1)
+            with self.assertRaises(Saturated) as full:
+                await pool.run(lambda: "артық")
+            with self.assertRaises(Saturated) as timeout:
+                await queued
+            gate.set()
+            self.assertTrue(await first)
+            return full.exception, timeout.exception
+
+        full, timeout = asyncio.run(scenario())
+        self.assertEqual((full.status, full.retry_after), (429, 1))
+        self.assertEqual(timeout.status, 503)
+        self.assertEqual(asyncio.run(pool.run(lambda: 7)), 7)
+        self.assertEqual(pool.stats(), {"inflight": 0, "waiting": 0, "concurrency": 1, "max_queue": 1})
+
+    def test_queued_request_gets_freed_slot(self):
+        pool = InferencePool(concurrency=1, max_queue=1, queue_timeout=5)
+        gate = threading.Event()
+
+        async def scenario():
+            first = asyncio.ensure_future(pool.run(gate.wait, 5))
+            await self.until(lambda: pool.stats()["inflight"] == 1)
+            queued = asyncio.ensure_future(pool.run(lambda: "кезекте"))
+            await self.until(lambda: pool.stats()["waiting"] == 1)
+            gate.set()
+            return await first, await queued
+
+        self.assertEqual(asyncio.run(scenario()), (True, "кезекте"))
+
+    def test_cancelled_request_releases_slot_when_work_ends(self):
+        pool = InferencePool(concurrency=1, max_queue=0, queue_timeout=0)
+        gate = threading.Event()
+
+        async def scenario():
+            first = asyncio.ensure_future(pool.run(gate.wait, 5))
+            await self.until(lambda: pool.stats()["inflight"] == 1)
+            first.cancel()
+            with self.assertRaises(Saturated):
+                await pool.run(lambda: None)
+            gate.set()
+            await self.until(lambda: pool.stats()["inflight"] == 0)
+            return await pool.run(lambda: "бос")
+
+        self.assertEqual(asyncio.run(scenario()), "бос")
+
+    def test_async_api_backpressure_and_rules_only_bypass(self):
+        from django.test import RequestFactory
+        from . import views
+        rf = RequestFactory()
+
+        def call(payload):
+            req = rf.post("/api/analyze", data=json.dumps(payload), content_type="application/json")
+            return asyncio.run(views.analyze_api_async(req))
+
+        busy = mock.Mock()
+        busy.run = mock.AsyncMock(side_effect=Saturated(429, "кезек толы", retry_after=3))
+        with mock.patch.object(views, "get_pool", return_value=busy):
+            resp = call({"documents": ["сәлем"]})
+            self.assertEqual((resp.status_code, resp["Retry-After"]), (429, "3"))
+            # модельсіз құжаттар пулды күтпейді
+            resp = call({"documents": ["сәлем"], "use_model": False})
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(json.loads(resp.content)["results"][0]["result"]["warning"], views.RULES_ONLY_WARNING)
+        busy.run.assert_awaited_once()
+
+
+@skipUnless(rdflib, "rdflib орнатылмаған")
+class OntoSnapshotTests(SimpleTestCase):
+    """mmap snapshot == compile_graph(OWL) payload; OWL өзгерсе snapshot елеусіз қалады."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        # бума онтология + әр тілдегі/предикаттағы label-дер, bnode және литерал қасиеттері
+        g = rdflib.Graph()
+        g.parse(str(onto_runtime.ONTO_PATH))
+        ex = rdflib.Namespace("http://example.org/test#")
+        skos = rdflib.namespace.SKOS
+        for i, term in enumerate(lexicon_terms()[:200]):
+            node = ex[f"t{i}"]
+            g.add((node, rdflib.RDF.type, ex.Party))
+            g.add((node, skos.prefLabel if i % 3 else rdflib.RDFS.label, rdflib.Literal(term, lang="kk")))
+            g.add((node, skos.altLabel, rdflib.Literal(f"{term.upper()} {i}", lang=("ru", "en", None, "de")[i % 4])))
+            g.add((node, ex.hasNote, rdflib.Literal(f"ескерту {i}")))
+            g.add((node, ex.hasPart, rdflib.BNode()))
+        self.owl = Path(tmp.name) / "onto.owl"
+        g.serialize(str(self.owl), format="xml")
+        self.snap = self.owl.with_name("onto.owl.snap")
+        parsed = rdflib.Graph()
+        parsed.parse(str(self.owl))
+        self.payload = onto_runtime.compile_graph(parsed)
+        onto_snapshot.write_snapshot(self.snap, self.payload, self.owl)
+
+    def assertRoundTrip(self, snap):
+        self.assertIsNotNone(snap)
+        for name, table in self.payload.items():
+            with self.subTest(table=name):
+                self.assertEqual(len(snap[name]), len(table))
+                self.assertEqual({k: snap[name][k] for k in snap[name]}, table)
+                self.assertIsNone(snap[name].get("http://example.org/жоқ"))
+                self.assertNotIn("http://example.org/жоқ", snap[name])
+
+    def test_round_trip(self):
+        self.assertGreater(len(self.payload["label_index"]), 200)
+        self.assertTrue(any(k.startswith("http://example.org/test#") for k in self.payload["props"]))
+        self.assertRoundTrip(onto_snapshot.read_snapshot(self.snap, self.owl))
+
+    def test_touched_but_unchanged_owl_is_fresh(self):
+        st = self.owl.stat()
+        os.utime(self.owl, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertRoundTrip(onto_snapshot.read_snapshot(self.snap, self.owl))
+        self.owl.unlink()   # тек snapshot жеткізілген орта
+        self.assertRoundTrip(onto_snapshot.read_snapshot(self.snap, self.owl))
+
+    def test_stale_or_foreign_snapshot_is_ignored(self):
+        with self.assertLogs("discourse.onto_snapshot", "WARNING"):
+            with mock.patch.object(onto_snapshot, "FORMAT", onto_snapshot.FORMAT + 1):
+                self.assertIsNone(onto_snapshot.read_snapshot(self.snap, self.owl))
+        with open(self.owl, "a", encoding="utf-8") as f:
+            f.write("<!-- өзгерді -->\n")
+        with self.assertLogs("discourse.onto_snapshot", "WARNING"):
+            self.assertIsNone(onto_snapshot.read_snapshot(self.snap, self.owl))
+        self.snap.write_bytes(b"not a snapshot")
+        with self.assertLogs("discourse.onto_snapshot", "WARNING"):
+            self.assertIsNone(onto_snapshot.read_snapshot(self.snap))
+        self.assertIsNone(onto_snapshot.read_snapshot(self.owl.with_name("жоқ.snap")))
+
+    def test_build_ontology_uses_fresh_snapshot_and_reparses_stale(self):
+        with mock.patch.multiple(onto_runtime, ONTO_PATH=self.owl, ONTO_SNAPSHOT_PATH=self.snap):
+            with mock.patch.object(onto_runtime, "load_graph", side_effect=AssertionError("OWL парс етілмеуі керек")):
+                from_snap = onto_runtime.build_ontology()
+            self.assertEqual(set(from_snap.onto.label_index), set(self.payload["label_index"]))
+            with open(self.owl, "a", encoding="utf-8") as f:
+                f.write("\n")
+            onto_runtime.load_graph.cache_clear()
+            self.addCleanup(onto_runtime.load_graph.cache_clear)
+            with self.assertLogs("discourse.onto_snapshot", "WARNING"):
+                reparsed = onto_runtime.build_ontology()
+            self.assertIsInstance(reparsed.onto.label_index, dict)
+            self.assertEqual(reparsed.onto.label_index, self.payload["label_index"])
+
+
+class _FakeEngine(NLIEngine):
+    """Жұп хэшінен детерминді logits; score_pairs шақырулары жазылады, gate – batch-ті ұстап тұру үшін."""
+
+    def __init__(self, gate=None, fail=None):
+        self.entailment_id = 2
+        self.calls = []
+        self.gate = gate
+        self.fail = fail
+
+    def score_pairs(self, pairs):
+        self.calls.append(list(pairs))
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.fail is not None:
+            raise self.fail
+        return np.array([[zlib.crc32(f"{p}|{h}|{k}".encode()) % 1000 / 100 for k in range(3)] for p, h in pairs],
+                        dtype=np.float32)
+
+
+class NLISchedulerTests(SimpleTestCase):
+    """Қатар сұраулар бір batch-ке жиналады, бірдей жұптар бір рет, нәтиже әр иесіне тікелей classify-дай."""
+
+    HYP = "Бұл {} екенін көрсетеді."
+
+    def tasks(self, i):
+        texts = corpus_texts()
+        return [NLITask(texts[i], ["оң", "бейтарап", "теріс"], self.HYP),
+                NLITask(texts[i + 1], ["ашу", "сенім"], self.HYP)]
+
+    def run_concurrently(self, scheduler, requests):
+        results, threads = [None] * len(requests), []
+        for n, tasks in enumerate(requests):
+            t = threading.Thread(target=lambda n=n, tasks=tasks: results.__setitem__(n, scheduler.classify(tasks)))
+            t.start()
+            threads.append(t)
+        return results, threads
+
+    def wait_for(self, cond):
+        deadline = time.monotonic() + 5
+        while not cond():
+            self.assertLess(time.monotonic(), deadline, "шарт орындалмады")
+            time.sleep(0.005)
+
+    def test_concurrent_requests_share_one_deduplicated_batch(self):
+        gate = threading.Event()
+        engine = _FakeEngine(gate)
+        scheduler = NLIScheduler(engine, window_ms=50, max_batch=64)
+        requests = [self.tasks(0), self.tasks(1), self.tasks(2), self.tasks(1)]
+        first, t0 = self.run_concurrently(scheduler, requests[:1])
+        self.wait_for(lambda: len(engine.calls) == 1)   # бірінші batch модельде тұр
+        rest, threads = self.run_concurrently(scheduler, requests[1:])
+        self.wait_for(lambda: len(scheduler._queue) == 3)
+        gate.set()
+        for t in t0 + threads:
+            t.join(5)
+        self.assertEqual(len(engine.calls), 2)
+        pairs = [p for tasks in requests[1:] for p in NLIEngine.task_pairs(tasks)[0]]
+        self.assertEqual(len(engine.calls[1]), len(set(engine.calls[1])))
+        self.assertEqual(set(engine.calls[1]), set(pairs))
+        self.assertLess(len(engine.calls[1]), len(pairs))
+        direct = _FakeEngine()
+        for tasks, res in zip(requests, first + rest):
+            self.assertEqual(res, direct.classify(tasks))
+
+    def test_batches_respect_max_batch(self):
+        gate = threading.Event()
+        engine = _FakeEngine(gate)
+        scheduler = NLIScheduler(engine, window_ms=20, max_batch=6)
+        requests = [self.tasks(i) for i in range(0, 10, 2)]   # әрқайсысы 5 жұп
+        results, threads = self.run_concurrently(scheduler, requests[:1])
+        self.wait_for(lambda: len(engine.calls) == 1)
+        more, others = self.run_concurrently(scheduler, requests[1:])
+        self.wait_for(lambda: len(scheduler._queue) == 4)
+        gate.set()
+        for t in threads + others:
+            t.join(5)
+        self.assertEqual([len(c) for c in engine.calls], [5] * 5)
+        direct = _FakeEngine()
+        self.assertEqual(results + more, [direct.classify(tasks) for tasks in requests])
+
+    def test_errors_reach_every_waiter_and_scheduler_recovers(self):
+        engine = _FakeEngine(fail=RuntimeError("модель құлады"))
+        scheduler = NLIScheduler(engine, window_ms=1)
+        with self.assertRaisesRegex(RuntimeError, "модель құлады"):
+            scheduler.classify(self.tasks(0))
+        engine.fail = None
+        self.assertEqual(scheduler.classify(self.tasks(0)), _FakeEngine().classify(self.tasks(0)))
+        calls = len(engine.calls)
+        self.assertEqual(scheduler.classify([NLITask("мәтін", [], self.HYP)])[0]["labels"], [])
+        self.assertEqual(len(engine.calls), calls)
+
+
+class NLIWindowsTests(SimpleTestCase):
+    """Сөйлем шекарасымен терезелер бюджетке сыяды, мәтінді ретімен қамтиды; pooling – қолмен есептелгендей."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tok = tiny_tokenizer()
+        texts = corpus_texts()
+        cls.long_texts = [" ".join(texts[i:i + 25]) for i in range(0, 200, 25)]
+
+    def n_tokens(self, text):
+        return len(self.tok(text, add_special_tokens=False)["input_ids"])
+
+    def test_windows_fit_budget_and_cover_sentences_in_order(self):
+        for budget, overlap in itertools.product((16, 40, 120), (0, 1, 2)):
+            for text in self.long_texts:
+                with self.subTest(budget=budget, overlap=overlap):
+                    windows = split_windows(self.tok, text, budget, overlap)
+                    for s, e, n in windows:
+                        # n – сөйлем токендерінің қосындысы: бірге токенизацияланған терезеден кем емес
+                        self.assertLessEqual(self.n_tokens(text[s:e]), n)
+                        self.assertLessEqual(n, budget)
+                    for (s1, e1, _), (s2, e2, _) in zip(windows, windows[1:]):
+                        self.assertLess(s1, s2)
+                        self.assertLessEqual(e1, e2)
+                        if overlap == 0:
+                            self.assertLessEqual(e1, s2)
+                    for s, e, chunk in sent_tokenize(text):
+                        self.assertTrue(any(ws <= text.find(chunk, s) and text.find(chunk, s) + len(chunk) <= we
+                                            for ws, we, _ in windows) or self.n_tokens(chunk) > budget)
+
+    def test_long_sentence_is_split_on_token_offsets(self):
+        text = "  " + " ".join(" ".join(corpus_texts()[:30]).replace(".", " ").replace("!", " ")
+                               .replace("?", " ").split())
+        budget = 20
+        windows = split_windows(self.tok, text, budget)
+        self.assertGreater(len(windows), 3)
+        self.assertEqual(windows[0][0], 2)
+        self.assertEqual(windows[-1][1], len(text))
+        self.assertEqual(sum(n for _, _, n in windows), self.n_tokens(text))
+        for s, e, n in windows:
+            self.assertLessEqual(n, budget)
+            self.assertEqual(n, self.n_tokens(text[s:e]))
+
+    def test_exceeds_budget_matches_token_count(self):
+        texts = [*corpus_texts()[:50], *self.long_texts, "", "сөз"]
+        for text, budget in itertools.product(texts, (1, 8, 32, 200)):
+            self.assertEqual(exceeds_budget(self.tok, text, budget), self.n_tokens(text) > budget)
+
+    def test_pool_scores(self):
+        labels = ["а", "б", "в"]
+        per = [{"а": 0.6, "б": 0.3, "в": 0.1}, {"а": 0.1, "б": 0.2, "в": 0.7}]
+        weights = [3, 1]
+        mean = pool_scores(labels, per, weights, "mean")
+        self.assertEqual(mean["labels"], ["в", "а", "б"])
+        np.testing.assert_allclose(mean["scores"], [0.4, 0.35, 0.25])
+        weighted = pool_scores(labels, per, weights, "weighted")
+        np.testing.assert_allclose(weighted["scores"], [(1.8 + 0.1) / 4, (0.9 + 0.2) / 4, (0.3 + 0.7) / 4])
+        self.assertEqual(weighted["labels"], ["а", "б", "в"])
+        top = pool_scores(labels, per, weights, "max")
+        self.assertEqual(top["labels"], ["в", "а", "б"])
+        np.testing.assert_allclose(top["scores"], [0.7 / 1.6, 0.6 / 1.6, 0.3 / 1.6])
+        multi = pool_scores(labels, per, weights, "max", multi_label=True)
+        np.testing.assert_allclose(multi["scores"], [0.7, 0.6, 0.3])
+        tie = pool_scores(labels, [{"а": 0.5, "б": 0.5, "в": 0.0}], [1], "mean")
+        self.assertEqual(tie["labels"], ["б", "а", "в"])
+
+    def test_classifier_pools_windows_and_passes_short_texts_through(self):
+        engine = _FakeEngine()
+        engine.tokenizer, engine.max_length, engine._n_special = self.tok, 64, 4
+        hyp = "Бұл {} екенін көрсетеді."
+        short = NLITask(corpus_texts()[0], ["оң", "теріс"], hyp)
+        long = NLITask(self.long_texts[0], ["оң", "бейтарап", "теріс"], hyp)
+        clf = WindowedClassifier(engine, engine, mode="auto", pooling="weighted")
+        res_short, res_long = clf.classify([short, long])
+        self.assertEqual(res_short, _FakeEngine().classify([short])[0])
+        windows = split_windows(self.tok, long.premise, clf.budget(long))
+        self.assertGreater(len(windows), 1)
+        self.assertEqual([w["span"] for w in res_long["windows"]], [[s, e] for s, e, _ in windows])
+        per = _FakeEngine().classify([NLITask(long.premise[s:e], long.labels, hyp) for s, e, _ in windows])
+        expected = pool_scores(list(long.labels), [dict(zip(o["labels"], o["scores"])) for o in per],
+                               [n for _, _, n in windows], "weighted")
+        self.assertEqual((res_long["labels"], res_long["scores"]), (expected["labels"], expected["scores"]))
+        off = WindowedClassifier(engine, engine, mode="off").classify([long])[0]
+        self.assertNotIn("windows", off)
+
+
+class CascadeTests(SimpleTestCase):
+    """Hashed n-gram каскады: үйрету/артефакт, шек кестесі, сенімді жауап NLI-ге жіберілмейді."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from . import views
+        cls.views = views
+        cls.tactics, rows = load_tactic_dataset(CORPUS_PATH)
+        cls.train_rows, cls.test_rows = rows[::10], rows[1::10]
+        cls.model = CascadeModel.train([t for t, _ in cls.train_rows], [y for _, y in cls.train_rows],
+                                       cls.tactics, HashedFeaturizer(1 << 12), epochs=5)
+
+    def test_dataset_and_featurizer(self):
+        self.assertEqual(set(self.tactics), set(self.views.get_tactic_labels()))
+        self.assertGreater(len(self.train_rows), 20)
+        feat = HashedFeaturizer(1 << 12)
+        idx, val = feat.transform("Сайлау науқаны, сайлау!")
+        self.assertTrue(((idx >= 0) & (idx < 1 << 12)).all())
+        self.assertAlmostEqual(float(np.linalg.norm(val)), 1.0, places=5)
+        np.testing.assert_array_equal(idx, feat.transform("сайлау науқаны сайлау")[0])
+        self.assertEqual(len(feat.transform("...")[0]), 0)
+
+    def test_fits_training_data_and_round_trips(self):
+        acc = np.mean([self.model.classify(t)["labels"][0] in y for t, y in self.train_rows])
+        self.assertGreater(acc, 0.8)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = self.model.save(Path(tmp) / "cascade.npz")
+            loaded = CascadeModel.load(path)
+            self.assertEqual((loaded.labels, loaded.version), (self.model.labels, self.model.version))
+            self.assertRegex(loaded.version, r"^\d{4}-\d\d-\d\d-[0-9a-f]{12}$")
+            for text, _ in self.test_rows[:20]:
+                a, b = self.model.classify(text), loaded.classify(text)
+                self.assertEqual(a["labels"][0], b["labels"][0])
+                np.testing.assert_allclose(a["scores"][0], b["scores"][0], atol=1e-2)
+            with mock.patch("discourse.cascade.FORMAT", 99), self.assertRaises(ValueError):
+                CascadeModel.load(path)
+
+    def test_threshold_table_and_pick(self):
+        texts, targets = [t for t, _ in self.test_rows], [y for _, y in self.test_rows]
+        table = threshold_table(self.model, texts, targets)
+        coverage = [row["coverage"] for row in table]
+        self.assertEqual(coverage, sorted(coverage, reverse=True))
+        table = [{"threshold": 0.3, "coverage": 0.9, "precision": 0.5},
+                 {"threshold": 0.4, "coverage": 0.05, "precision": 1.0},
+                 {"threshold": 0.5, "coverage": 0.5, "precision": 0.9},
+                 {"threshold": 0.6, "coverage": 0.0, "precision": None}]
+        self.assertEqual(pick_threshold(table, 0.85, min_answered=5, n=40), 0.5)
+        self.assertEqual(pick_threshold(table, 0.95, min_answered=5, n=40, default=0.7), 0.7)
+
+    def nli_pairs(self, threshold):
+        v = self.views
+        engine = _FakeEngine()
+        docs = [{"text": t, **v.FORM_DEFAULTS, "tactic": True} for t, _ in self.test_rows[:6]]
+        with mock.patch.object(v, "active_cascade", return_value=self.model), \
+                mock.patch.object(v, "CASCADE_THRESHOLD", str(threshold)), \
+                mock.patch.object(v, "active_prototypes", return_value=None), \
+                mock.patch.object(v, "get_nli_runner", return_value=engine), \
+                mock.patch.object(v, "get_result_cache", return_value=None):
+            results = v.analyze_documents(docs)
+        return [h for c in engine.calls for _, h in c], [r["tactic_zero_shot"] for r in results]
+
+    def test_confident_answers_skip_nli(self):
+        tactic_hyp = self.views.TACTIC_HYPOTHESIS.format(self.tactics[0])
+        pairs, tactics = self.nli_pairs(0.0)
+        self.assertNotIn(tactic_hyp, pairs)
+        self.assertTrue(pairs)   # sentiment/emotion жұптары NLI-де қалады
+        self.assertEqual({t["source"] for t in tactics}, {"cascade"})
+        self.assertEqual(tactics[0]["label"], self.model.classify(self.test_rows[0][0])["labels"][0])
+        pairs, tactics = self.nli_pairs(1.01)
+        self.assertIn(tactic_hyp, pairs)
+        self.assertNotIn("cascade", {t.get("source") for t in tactics})
+
+    def test_cascade_with_other_tactics_is_inactive(self):
+        other = CascadeModel(["а", "б"], np.zeros((4, 2), np.float32), np.zeros(2, np.float32), HashedFeaturizer(4))
+        with mock.patch.object(self.views, "get_cascade", return_value=other):
+            self.assertIsNone(self.views.active_cascade())
+            self.assertIsNone(self.views.cascade_tactic("сайлау"))
+
+
+class _HashEncoder:
+    """Модельсіз энкодер: сөз hash-тарының сирек векторы (TextEncoder.encode интерфейсі)."""
+
+    def __init__(self, dim=256):
+        self.featurizer = HashedFeaturizer(dim, word_n=1)
+        self.batch_size = 16
+
+    def encode(self, texts):
+        out = np.zeros((len(texts), self.featurizer.n_features), dtype=np.float32)
+        for i, t in enumerate(texts):
+            idx, val = self.featurizer.transform(t)
+            np.add.at(out[i], idx, val)
+        return out
+
+
+class TacticPrototypeTests(SimpleTestCase):
+    """Прототиптер: құру/артефакт, temperature, жүктеу шарттары (модель, лексикон нұсқасы) және NLI-сіз жол."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from . import views
+        cls.views = views
+        cls.terms = prototype_terms(LEXICON_PATH)
+        cls.encoder = _HashEncoder()
+        cls.protos = TacticPrototypes.build(cls.encoder, cls.terms)
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "protos.npz"
+        self.views.get_tactic_prototypes.cache_clear()
+        self.addCleanup(self.views.get_tactic_prototypes.cache_clear)
+
+    def test_build_and_classify(self):
+        self.assertEqual(self.protos.labels, [t for t, texts in self.terms.items() if texts])
+        np.testing.assert_allclose(np.linalg.norm(self.protos.matrix, axis=1), 1.0, rtol=1e-5)
+        vecs = self.encoder.encode([texts[0] for texts in self.terms.values() if texts])
+        subset = self.protos.labels[2:5]
+        for out in self.protos.classify(vecs, subset):
+            self.assertEqual(sorted(out["labels"]), sorted(subset))
+            self.assertAlmostEqual(sum(out["scores"]), 1.0, places=5)
+            self.assertEqual(out["similarities"], sorted(out["similarities"], reverse=True))
+        soft = TacticPrototypes(self.protos.labels, self.protos.matrix, self.protos.center, temperature=1.0)
+        for sharp, flat in zip(self.protos.classify(vecs), soft.classify(vecs)):
+            self.assertEqual(sharp["labels"][0], flat["labels"][0])
+            self.assertGreater(sharp["scores"][0], flat["scores"][0])
+
+    def test_artifact_round_trip(self):
+        self.protos.save(self.path)
+        loaded = TacticPrototypes.load(self.path)
+        self.assertEqual((loaded.labels, loaded.version, loaded.temperature),
+                         (self.protos.labels, self.protos.version, self.protos.temperature))
+        vecs = self.encoder.encode(corpus_texts()[:10])
+        self.assertEqual(loaded.classify(vecs), self.protos.classify(vecs))
+        with mock.patch("discourse.tactic_prototypes.FORMAT", 99), self.assertRaises(ValueError):
+            TacticPrototypes.load(self.path)
+
+    def load(self, **meta):
+        v = self.views
+        protos = TacticPrototypes(self.protos.labels, self.protos.matrix, self.protos.center,
+                                  meta={"lexicon": v.registry.version("lexicon"), **meta})
+        protos.save(self.path)
+        v.get_tactic_prototypes.cache_clear()
+        with mock.patch.multiple(v, TACTIC_MODE="prototype", PROTOTYPES_PATH=str(self.path)):
+            return v.get_tactic_prototypes(), v.active_prototypes()
+
+    def test_loading_conditions(self):
+        v = self.views
+        loaded, active = self.load()
+        self.assertEqual(active.version, loaded.version)
+        with self.assertLogs("discourse.views", "WARNING"):
+            self.assertEqual(self.load(model="басқа модель"), (None, None))
+        with mock.patch.object(v, "_STALE_PROTOS", set()), self.assertLogs("discourse.views", "WARNING") as logs:
+            loaded, active = self.load(lexicon="ескі")
+            self.assertIsNotNone(loaded)
+            self.assertIsNone(active)
+            with mock.patch.multiple(v, TACTIC_MODE="prototype", PROTOTYPES_PATH=str(self.path)):
+                self.assertIsNone(v.active_prototypes())
+        self.assertEqual(len(logs.records), 1)   # ескерту лексикон нұсқасына бір рет
+        with mock.patch.object(v, "get_tactic_labels", return_value=[*self.protos.labels, "жаңа тактика"]), \
+                self.assertLogs("discourse.views", "WARNING"):
+            self.assertIsNone(self.load()[1])
+        self.path.unlink()
+        v.get_tactic_prototypes.cache_clear()
+        with mock.patch.multiple(v, TACTIC_MODE="prototype", PROTOTYPES_PATH=str(self.path)), \
+                self.assertLogs("discourse.views", "WARNING"):
+            self.assertIsNone(v.get_tactic_prototypes())
+
+    def test_documents_use_prototypes_instead_of_nli(self):
+        v = self.views
+        loaded, _ = self.load()
+        engine = _FakeEngine()
+        texts = corpus_texts()[:4]
+        docs = [{"text": t, **v.FORM_DEFAULTS, "tactic": True} for t in texts]
+        with mock.patch.multiple(v, TACTIC_MODE="prototype", PROTOTYPES_PATH=str(self.path),
+                                 active_cascade=mock.Mock(return_value=None),
+                                 get_text_encoder=mock.Mock(return_value=self.encoder),
+                                 get_nli_runner=mock.Mock(return_value=engine),
+                                 get_result_cache=mock.Mock(return_value=None)):
+            results = v.analyze_documents(docs)
+        hyps = {h for c in engine.calls for _, h in c}
+        self.assertFalse(any(v.TACTIC_HYPOTHESIS.format(t) in hyps for t in self.protos.labels))
+        expected = loaded.classify(self.encoder.encode(texts), v.get_tactic_labels())
+        for res, exp in zip(results, expected):
+            tac = res["tactic_zero_shot"]
+            self.assertEqual((tac["source"], tac["label"], tac["similarity"]),
+                             ("prototype", exp["labels"][0], exp["similarities"][0]))
+
+
+@skipUnless(torch, "torch орнатылмаған")
+class TextEncoderTests(SimpleTestCase):
+    """Mean pooling тікелей модель шақыруымен бірдей; batch/padding нәтижеге әсер етпейді; ұзын мәтін бөлінеді."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.clf = tiny_nli_pipeline()
+        cls.encoder = TextEncoder.from_pipeline(cls.clf, batch_size=3)
+
+    def test_short_texts_match_model_mean_pooling(self):
+        texts = corpus_texts()[:7]
+        batched = self.encoder.encode(texts)
+        for text, vec in zip(texts, batched):
+            ids = torch.tensor([self.clf.tokenizer(text)["input_ids"]])
+            with torch.inference_mode():
+                ref = self.clf.model.base_model(input_ids=ids)[0][0].mean(axis=0).numpy()
+            np.testing.assert_allclose(vec, ref, rtol=1e-4, atol=1e-5)
+            np.testing.assert_allclose(self.encoder.encode([text])[0], vec, rtol=1e-4, atol=1e-5)
+
+    def test_long_text_is_chunked_within_model_limit(self):
+        text = " ".join(corpus_texts()[:40])
+        chunks = self.encoder._chunks(text)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(c) <= self.encoder.max_length for c in chunks))
+        self.assertEqual(self.encoder.encode([text]).shape, (1, self.clf.model.config.hidden_size))
+
+
+class TacticPruningTests(SimpleTestCase):
+    """Лексикон сүзгісі: top-k + TACTIC_ALWAYS лексикон ретімен; дәлел әлсіз болса – толық тізім."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from . import views
+        cls.views = views
+        cls.labels = views.get_tactic_labels()
+        scored = [(views._lexicon_scores(t), t) for t in corpus_texts()[:400]]
+        cls.strong = next(t for sc, t in scored if len(sc) >= 3 and sc[0][1] >= 4)
+        cls.weak = next(t for sc, t in scored if not sc)
+
+    def candidates(self, text, topk=2, always=(), min_evidence=2.0):
+        v = self.views
+        with mock.patch.multiple(v, TACTIC_TOPK=topk, TACTIC_ALWAYS=list(always),
+                                 TACTIC_MIN_EVIDENCE=min_evidence), mock.patch.object(v, "inc") as inc:
+            return v.tactic_candidates(text), [c.kwargs.get("outcome") for c in inc.call_args_list]
+
+    def test_strong_evidence_is_pruned_in_lexicon_order(self):
+        scored = self.views._lexicon_scores(self.strong)
+        always = [l for l in self.labels if l not in {t for t, _ in scored[:2]}][-1:]
+        got, outcomes = self.candidates(self.strong, always=always)
+        keep = {t for t, _ in scored[:2]} | set(always)
+        self.assertEqual(got, [l for l in self.labels if l in keep])
+        self.assertEqual(len(got), 3)
+        self.assertEqual(outcomes, ["pruned"])
+
+    def test_weak_or_missing_evidence_keeps_full_list(self):
+        self.assertEqual(self.candidates(self.weak), (self.labels, ["full"]))
+        top = self.views._lexicon_scores(self.strong)[0][1]
+        self.assertEqual(self.candidates(self.strong, min_evidence=top + 0.5), (self.labels, ["full"]))
+
+    def test_disabled_or_too_wide_filter_skips_scoring(self):
+        with mock.patch.object(self.views, "_lexicon_scores") as scores:
+            self.assertEqual(self.candidates(self.strong, topk=0), (self.labels, []))
+            self.assertEqual(self.candidates(self.strong, topk=len(self.labels) - 1, always=self.labels[:1]),
+                             (self.labels, []))
+        scores.assert_not_called()
+
+    def test_pruned_tactic_result_lists_candidates(self):
+        v = self.views
+        with mock.patch.multiple(v, TACTIC_TOPK=2, TACTIC_ALWAYS=[], TACTIC_MIN_EVIDENCE=2.0):
+            task = v.tactic_task(self.strong)
+            self.assertEqual(len(task.labels), 2)
+            res = v.classify_tactic_zero_shot(self.strong, zs_out=_FakeEngine().classify([task])[0])
+        self.assertEqual(res["candidates"], list(task.labels))
+        self.assertIn(res["label"], task.labels)
+
+
+@skipUnless(rdflib, "rdflib орнатылмаған")
+class ColumnarTests(LabelledOntologyMixin, SimpleTestCase):
+    """flatten(): әр кестенің жолдары нәтиже құрылымымен сәйкес және тек схемадағы бағаналар (pyarrow-сыз)."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from . import views
+        texts = corpus_texts()
+        speech = " ".join(texts[:12])
+        cls.docs = [
+            {"text": speech, "domain": "үміткер сөзі"},
+            {"text": debate_transcript(3), "domain": "сайлауалды пікірсайыс"},
+            {"text": "Бізге дауыс беріңіз! Біз жемқорлықты жоямыз. " + speech, "domain": "сайлауалды жарнама"},
+        ]
+        docs = [{**views.FORM_DEFAULTS, **d, "use_model": False, "task": "sentiment"} for d in cls.docs]
+        with mock.patch.object(views, "get_result_cache", return_value=None):
+            results = views.analyze_documents(docs)
+        cls.rows = [{"index": i, "id": f"d{i}", "domain": d["domain"], "source": d["source"], "task": d["task"],
+                     "result": r} for i, (d, r) in enumerate(zip(docs, results))]
+
+    def test_rows_use_schema_columns(self):
+        for row in self.rows:
+            for table, rows in flatten(row).items():
+                cols = {name for name, _ in TABLES[table]}
+                for r in rows:
+                    self.assertLessEqual(set(r), cols, table)
+
+    def test_speech_rows(self):
+        out, sp = flatten(self.rows[0]), self.rows[0]["result"]["speech"]
+        self.assertEqual(out["documents"][0]["kind"], "speech")
+        self.assertEqual([(r["seg"], [r["start"], r["end"]], r["text"]) for r in out["segments"]],
+                         [(i, it["span"], it["text"]) for i, it in enumerate(sp["items"])])
+        targets = [(i, h["iri"], h["span"]) for i, it in enumerate(sp["items"]) for h in it["targets"]]
+        self.assertTrue(targets)
+        self.assertEqual([(m["seg"], m["iri"], [m["start"], m["end"]]) for m in out["mentions"]], targets)
+        self.assertEqual(len(out["stance"]), len(sp["stance"]))
+
+    def test_debate_rows(self):
+        out, db = flatten(self.rows[1]), self.rows[1]["result"]["debate"]
+        text = self.docs[1]["text"]
+        self.assertEqual(len(out["segments"]), len(db["turns"]))
+        for seg, turn in zip(out["segments"], db["turns"]):
+            self.assertEqual((seg["speaker"], [seg["start"], seg["end"]]), (turn["speaker"], turn["span"]))
+        for m in out["mentions"]:
+            self.assertEqual(" ".join(text[m["start"]:m["end"]].split()), " ".join(m["match"].split()))
+        self.assertEqual(sum(len(t["mentions"]) for t in db["turns"]), len(out["mentions"]))
+        self.assertEqual({r["key"] for r in out["stance"]}, set(db["by_speaker"]))
+
+    def test_campaign_rows(self):
+        out, camp = flatten(self.rows[2]), self.rows[2]["result"]["campaign"]
+        doc = out["documents"][0]
+        self.assertEqual((doc["kind"], doc["fused_label"], doc["domain"]),
+                         ("campaign", camp["fused"]["label"], "сайлауалды жарнама"))
+        self.assertEqual(len(out["regex_hits"]), len(camp["hits"]["regex"]))
+        self.assertTrue(out["regex_hits"])
+        self.assertEqual({m["seg"] for m in out["mentions"]}, {None})
+        self.assertEqual(len(out["mentions"]), len(camp["hits"]["ontology"]))
+
+    def test_error_rows(self):
+        out = flatten({"index": 4, "id": "x", "errors": {"text": ["бос"]}})
+        self.assertEqual((out["documents"][0]["doc_id"], out["documents"][0]["kind"]), ("x", None))
+        self.assertIn("бос", out["documents"][0]["error"])
+        self.assertFalse(any(out[t] for t in TABLES if t != "documents"))
+        self.assertEqual(flatten({"index": 5, "error": "RuntimeError: x"})["documents"][0]["doc_id"], "5")
+
+    @skipUnless(pyarrow, "pyarrow орнатылмаған")
+    def test_writer_round_trip(self):
+        import pyarrow.dataset as ds
+        with tempfile.TemporaryDirectory() as tmp:
+            for fmt in ("parquet", "arrow"):
+                w = ColumnarWriter(Path(tmp) / fmt, fmt)
+                for row in self.rows:
+                    w.write(row)
+                    w.flush()
+                for table in TABLES:
+                    expected = sum(len(flatten(r)[table]) for r in self.rows)
+                    if not expected:
+                        continue
+                    read = ds.dataset(str(Path(tmp) / fmt / table), format="ipc" if fmt == "arrow" else fmt)
+                    self.assertEqual(read.count_rows(), expected, (fmt, table))
+                    self.assertEqual(read.schema, arrow_schema(table))
+
+
+def _naive_within(hits, s, e):
+    return [h for h in hits if s <= h["span"][0] and h["span"][1] <= e]
+
+
+class SpanIndexTests(SimpleTestCase):
+    """SpanIndex.within – толық тізімді сүзумен бірдей (рет те)."""
+
+    def test_random_spans_match_naive_filter(self):
+        rnd = random.Random(9)
+        hits = []
+        for i in range(400):
+            s = rnd.randrange(1000)
+            hits.append({"id": i, "span": [s, s + rnd.randrange(0, 30)]})
+        index = SpanIndex(hits)
+        for _ in range(300):
+            s = rnd.randrange(1000)
+            e = s + rnd.randrange(0, 120)
+            self.assertEqual(index.within(s, e), _naive_within(hits, s, e), (s, e))
+        self.assertEqual(index.within(0, 2000), hits)
+        self.assertEqual(SpanIndex([]).within(0, 10), [])
+
+    def test_boundaries_are_inclusive(self):
+        hits = [{"span": [5, 10]}, {"span": [10, 10]}, {"span": [10, 12]}, {"span": [4, 6]}]
+        self.assertEqual(SpanIndex(hits).within(5, 10), hits[:2])
+
+
+@skipUnless(rdflib, "rdflib орнатылмаған")
+class SpeechItemsTests(LabelledOntologyMixin, SimpleTestCase):
+    """analyze_speech: сөйлемге тиесілі нысаналар мен regex сәйкестіктері – бүкіл құжат тізімінен кесінді."""
+
+    def test_items_follow_sentences_and_span_filters(self):
+        from .speech_rules import analyze_speech
+        text = " ".join(corpus_texts()[:40])
+        ctx = DocContext(text)
+        items = analyze_speech(text, ctx)["items"]
+        self.assertEqual([(it["span"], it["text"]) for it in items],
+                         [([s, e], chunk) for s, e, chunk in ctx.sentences])
+        self.assertTrue(any(it["targets"] for it in items))
+        for s, e, _ in ctx.sentences:
+            self.assertEqual(ctx.mentions_in(s, e), _naive_within(ctx.mentions, s, e))
+            self.assertEqual(ctx.rx_hits_in(s, e), _naive_within(ctx.rx_hits, s, e))
+        self.assertEqual(analyze_speech(text), analyze_speech(text, ctx))
+
+
+class MetricsTests(SimpleTestCase):
+    """Процесс ішіндегі метрикалар және /metrics мәтін форматы."""
+
+    def setUp(self):
+        patcher = mock.patch.multiple(metrics, _counters={}, _histograms={}, _buckets={}, _collectors=[])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_counters_and_label_escaping(self):
+        metrics.inc("polisent_fallback_total", reason="nli")
+        metrics.inc("polisent_fallback_total", 2, reason="nli")
+        metrics.inc("polisent_fallback_total", reason='a"b\nc')
+        self.assertEqual(metrics.snapshot()["polisent_fallback_total"][(("reason", "nli"),)], 3.0)
+        lines = metrics.render().splitlines()
+        self.assertIn("# TYPE polisent_fallback_total counter", lines)
+        self.assertIn('polisent_fallback_total{reason="nli"} 3', lines)
+        self.assertIn('polisent_fallback_total{reason="a\\"b\\nc"} 1', lines)
+
+    def test_histogram_buckets_are_cumulative(self):
+        for v in (0.5, 1.0, 3.0, 10.0):
+            metrics.observe("h_seconds", v, buckets=(1.0, 2.0, 5.0), stage="x")
+        lines = metrics.render().splitlines()
+        for le, n in (("1", 2), ("2", 2), ("5", 3), ("+Inf", 4)):
+            self.assertIn(f'h_seconds_bucket{{stage="x",le="{le}"}} {n}', lines)
+        self.assertIn('h_seconds_sum{stage="x"} 14.5', lines)
+        self.assertIn('h_seconds_count{stage="x"} 4', lines)
+
+    def test_timed_counts_errors(self):
+        with self.assertRaises(ValueError):
+            with metrics.timed("regex"):
+                raise ValueError
+        with metrics.timed("regex"):
+            pass
+        snap = metrics.snapshot()
+        self.assertEqual(snap["polisent_errors_total"], {(("stage", "regex"),): 1.0})
+        self.assertEqual(snap[metrics.STAGE_METRIC][(("stage", "regex"),)][-1], 2)
+
+    def test_collectors_survive_failures(self):
+        def broken():
+            raise RuntimeError
+
+        metrics.register_collector(broken)
+        metrics.register_collector(lambda: [("polisent_debate_sessions", "gauge", {}, 3)])
+        lines = metrics.render().splitlines()
+        self.assertIn("# TYPE polisent_debate_sessions gauge", lines)
+        self.assertIn("polisent_debate_sessions 3", lines)
+
+    def test_endpoint(self):
+        metrics.inc("polisent_documents_total")
+        resp = self.client.get("/metrics")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp["Content-Type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn("polisent_documents_total 1", resp.content.decode("utf-8").splitlines())
+        with mock.patch.dict(os.environ, {"POLISENT_METRICS": "0"}):
+            self.assertEqual(self.client.get("/metrics").status_code, 404)
+
+
+class OntoPropsTests(SimpleTestCase):
+    """materialize: канондық қасиеттер, жақыннан алысқа мұра, полярлық синонимдері."""
+
+    NS = "http://example.org/props#"
+
+    def payload(self):
+        ns, sub, rdfs_domain = self.NS, onto_props.RDFS_SUBCLASS, "http://www.w3.org/2000/01/rdf-schema#domain"
+        return {
+            "labels": {ns + "p1": ["пәндік сала"], ns + "Promise": ["уәде"]},
+            "types": {ns + "tax": [ns + "SubTopic"], ns + "promise1": [ns + "Promise"], ns + "own": [ns + "SubTopic"],
+                      ns + "loop1": [ns + "A"]},
+            "props": {
+                ns + "Promise": {sub: [["iri", ns + "RhetoricDevice"]]},
+                ns + "Topic": {ns + "polarity": [["lit", "Negative"]], ns + "p1": [["lit", "экономика"]]},
+                ns + "SubTopic": {sub: [["iri", ns + "Topic"]], ns + "p1": [["lit", "салық"]]},
+                ns + "own": {ns + "hasPolarity": [["lit", "pos"]], rdfs_domain: [["iri", ns + "Topic"]]},
+                ns + "A": {sub: [["iri", ns + "B"]]},
+                ns + "B": {sub: [["iri", ns + "A"]], ns + "sentiment": [["lit", "бейтарап"]]},
+                ns + "plain": {ns + "unrelated": [["lit", "x"]]},
+            },
+        }
+
+    def test_inheritance_is_nearest_first(self):
+        facts = onto_props.materialize(self.payload())
+        tax = facts[self.NS + "tax"]
+        self.assertEqual((tax["polarity"], tax["domain"]), ("теріс", ["салық"]))
+        self.assertEqual(facts[self.NS + "Topic"]["domain"], ["экономика"])
+
+    def test_own_values_win_and_vocab_predicates_are_ignored(self):
+        own = onto_props.materialize(self.payload())[self.NS + "own"]
+        self.assertEqual((own["polarity"], own["domain"]), ("оң", ["салық"]))
+
+    def test_device_subclasses_name_the_device(self):
+        facts = onto_props.materialize(self.payload())
+        promise = facts[self.NS + "promise1"]
+        self.assertEqual((promise["devices"], promise["kind"]), (["уәде"], "RhetoricDevice"))
+        self.assertEqual(facts[self.NS + "RhetoricDevice"]["kind"], "RhetoricDevice")
+        self.assertEqual(facts[self.NS + "RhetoricDevice"]["devices"], [])
+
+    def test_cycles_and_empty_rows(self):
+        facts = onto_props.materialize(self.payload())
+        self.assertEqual(facts[self.NS + "loop1"]["polarity"], "бейтарап")
+        self.assertNotIn(self.NS + "plain", facts)
+        self.assertEqual(onto_props.materialize({}), {})
+
+    def test_polarity_aliases_cover_the_triple(self):
+        self.assertEqual(set(onto_props.POLARITY_ALIASES.values()), {"оң", "теріс", "бейтарап"})
+        for k in onto_props.POLARITY_ALIASES:
+            self.assertEqual(onto_props._key(k), k)
@@ -14,12 +14,28 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import os
+
 from django.contrib import admin
 from django.urls import path
 
-from .views import analyzer_view
+from .views import (analyzer_view, analyzer_view_async, analyze_api, analyze_api_async,
+                    debate_events, debate_events_async, debate_session_api, debate_sessions_api,
+                    metrics_view, ready_view)
+
+# ASGI астында (asgi.py әдепкі 1 қояды) талдау endpoint-тері async нұсқаға ауысады:
+# модель шектеулі пулда, толы болса 429/503
+ASYNC_VIEWS = os.getenv("POLISENT_ASYNC_VIEWS", "0") == "1"
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path("", analyzer_view, name="analyzer"),
+    path("", analyzer_view_async if ASYNC_VIEWS else analyzer_view, name="analyzer"),
+    path("api/analyze", analyze_api_async if ASYNC_VIEWS else analyze_api, name="analyze_api"),
+    path("api/debate/sessions", debate_sessions_api, name="debate_sessions"),
+    path("api/debate/sessions/<str:session_id>", debate_session_api, name="debate_session"),
+    # SSE: ASGI-де ағын ұсталмайды (async күту), WSGI-де әр клиент бір ағын
+    path("api/debate/sessions/<str:session_id>/events",
+         debate_events_async if ASYNC_VIEWS else debate_events, name="debate_events"),
+    path("metrics", metrics_view, name="metrics"),
+    path("ready", ready_view, name="ready"),
 ]
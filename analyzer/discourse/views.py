@@ -1,10 +1,29 @@
 from django.shortcuts import render
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from .forms import AnalyzerForm
 from functools import lru_cache
+import asyncio
 import re
 
 from .speech_rules import analyze_speech
 from .debate_rules import analyze_debate
+from .debate_session import sessions as debate_sessions
+from .nli_engine import NLIEngine, NLITask
+from .nli_scheduler import NLIScheduler
+from . import nli_windows
+from .nli_windows import WindowedClassifier
+from .cascade import CascadeModel
+from .tactic_prototypes import TacticPrototypes, TextEncoder
+from .doc_context import DocContext
+from .result_cache import ResultCache, normalize_text, source_digest
+from .onto_runtime import ONTO_PATH
+from .kk_stem import MATCH_MODE, STEM_VERSION
+from .inference_pool import Saturated, get_pool
+from .index_registry import registry
+from typing import NamedTuple
+from .metrics import inc, register_collector, render as render_metrics, timed
 
 from transformers import pipeline, AutoTokenizer
 import os
@@ -26,10 +45,6 @@ PD_JSON_PATH = os.getenv(         # ADDED: JSON жолы (қалауыңызша
     "PD_JSON_PATH",
     str(Path(getattr(settings, "BASE_DIR", ".")) / "data" / "political_discourse_terms.json")
 )
-@lru_cache(maxsize=1)             # ADDED: индекс бір рет жүктелсін
-def get_pd_index():
-    return build_index_from_json(PD_JSON_PATH)
-
 EMOTIONS = ["қуаныш","ашу","қорқыныш","жеккөрушілік","таңдану","қайғы","сенім","бейтарап"]
 SENTIMENT = ["оң","бейтарап","теріс"]
 MODEL = "joeddav/xlm-roberta-large-xnli"
@@ -59,38 +74,246 @@ PD_JSON_PATH = os.getenv(
 
 from functools import lru_cache
 
-@lru_cache(maxsize=1)
-def get_tactic_labels():
-    """JSON кілттері – тактика атаулары"""
+class LexiconBundle(NamedTuple):
+    pd_index: object        # PDIndex (компиляцияланған)
+    tactics: list
+
+def build_lexicon() -> LexiconBundle:
+    """Индекс реестрінің builder-і: лексикон индексі мен тактика тізімі бір JSON нұсқасынан."""
     with open(PD_JSON_PATH, "r", encoding="utf-8") as f:
         data = json.load(f)
+    idx = build_index_from_json(PD_JSON_PATH)
+    idx.compiled()   # ауыстырудан бұрын фондық ағында компиляцияланады
     # Тактика атаулары (sheet аттары)
-    return [str(k) for k in data.keys() if k and str(k).strip()]
+    return LexiconBundle(idx, [str(k) for k in data.keys() if k and str(k).strip()])
+
+registry.register("lexicon", lambda: [PD_JSON_PATH], build_lexicon)
+
+def get_pd_index():
+    return registry.get("lexicon").pd_index
+
+def get_tactic_labels():
+    """JSON кілттері – тактика атаулары (ағымдағы/сұрауға бекітілген лексикон нұсқасы)"""
+    return registry.get("lexicon").tactics
+
+# НАЗАР: zero-shot үшін гипотезада {label} плейсхолдері болуы керек
+TACTIC_HYPOTHESIS = "Бұл мәтінде {} тактикасы қолданылған."
+
+def _format_zs(out, n_alt):
+    """pipeline/NLIEngine шығысын UI күтетін dict-ке айналдыру."""
+    res = {
+        "label": out["labels"][0],
+        "score": float(out["scores"][0]),
+        "alternatives": [
+            {"label": l, "score": float(s)}
+            for l, s in zip(out["labels"][1:n_alt + 1], out["scores"][1:n_alt + 1])
+        ],
+        "warning": None,
+    }
+    if out.get("windows"):
+        # ұзын мәтін терезелермен бағаланды: әр терезенің өз бағасы + біріктіру тәсілі
+        res["pooling"] = out.get("pooling")
+        res["windows"] = [
+            {"span": w["span"], "tokens": w["tokens"], "label": w["labels"][0], "score": float(w["scores"][0]),
+             "scores": {l: float(s) for l, s in zip(w["labels"], w["scores"])}}
+            for w in out["windows"]
+        ]
+    return res
+
+# --- Лексикон бойынша кандидаттарды алдын ала таңдау: zero-shot-қа тек top-k тактика + әрдайым қосылатындар
+TACTIC_TOPK = int(os.getenv("POLISENT_TACTIC_TOPK", "0"))          # 0 – сүзгі сөндірулі
+TACTIC_ALWAYS = [t.strip() for t in os.getenv("POLISENT_TACTIC_ALWAYS", "").split(",") if t.strip()]
+TACTIC_MIN_EVIDENCE = float(os.getenv("POLISENT_TACTIC_MIN_EVIDENCE", "2.0"))
+
+def _lexicon_scores(text: str, ctx: DocContext = None):
+    """score_text() (тактика, баға) жұптары; ctx берілсе – оның бір рет есептелген pd_tokens-і."""
+    labels = get_tactic_labels()
+    tokens = ctx.pd_tokens if ctx is not None else None
+    return [(t, sc) for t, sc, _ in score_pd_text(text, get_pd_index(), tokens=tokens) if t in labels]
+
+def tactic_candidates(text: str, ctx: DocContext = None):
+    """
+    score_text() бағасы бойынша top-k тактика + TACTIC_ALWAYS (лексикондағы ретімен).
+    Recall қорғанысы: ең күшті тактиканың бағасы TACTIC_MIN_EVIDENCE-тен төмен болса
+    (дәлел әлсіз/жоқ) – толық тізім қайтарылады.
+    """
+    labels = get_tactic_labels()
+    if TACTIC_TOPK <= 0 or TACTIC_TOPK + len(TACTIC_ALWAYS) >= len(labels):
+        return labels
+    scored = _lexicon_scores(text, ctx)
+    if not scored or scored[0][1] < TACTIC_MIN_EVIDENCE:
+        inc("polisent_tactic_prune_total", outcome="full")
+        return labels
+    keep = {t for t, _ in scored[:TACTIC_TOPK]} | set(TACTIC_ALWAYS)
+    inc("polisent_tactic_prune_total", outcome="pruned")
+    return [l for l in labels if l in keep]
+
+def tactic_task(text: str, ctx: DocContext = None):
+    labels = tactic_candidates(text, ctx)
+    return NLITask(text, labels, TACTIC_HYPOTHESIS) if labels else None
+
+def lexicon_tactic(text: str, ctx: DocContext = None):
+    """Модельсіз тактика: score_text() үлестері (ереже режимі, use_model=false)."""
+    scored = _lexicon_scores(text, ctx)
+    if not scored:
+        return {"label": "", "score": 0.0, "alternatives": [], "warning": "Лексиконнан тактика табылмады",
+                "source": "lexicon"}
+    total = sum(sc for _, sc in scored)
+    return {
+        "label": scored[0][0],
+        "score": scored[0][1] / total,
+        "alternatives": [{"label": t, "score": sc / total} for t, sc in scored[1:5]],
+        "warning": None,
+        "source": "lexicon",
+    }
+
+# --- Арзан-алдымен каскад: сенімді мәтіндерге тактиканы hashed n-gram моделі береді
+CASCADE_MODE = os.getenv("POLISENT_CASCADE", "auto").lower()
+CASCADE_PATH = os.getenv(
+    "POLISENT_CASCADE_PATH",
+    str(Path(getattr(settings, "BASE_DIR", ".")) / "data" / "tactic_cascade.npz")
+)
+CASCADE_THRESHOLD = os.getenv("POLISENT_CASCADE_THRESHOLD", "")
+
+@lru_cache(maxsize=1)
+def get_cascade():
+    """`manage.py train_cascade` артефакты; сөндірулі/жоқ/сәйкес емес болса None (тек zero-shot)."""
+    if CASCADE_MODE == "off":
+        return None
+    if not Path(CASCADE_PATH).exists():
+        if CASCADE_MODE == "on":
+            logger.warning("Каскад артефакты жоқ: %s (manage.py train_cascade)", CASCADE_PATH)
+        return None
+    try:
+        model = CascadeModel.load(CASCADE_PATH)
+    except Exception as e:
+        logger.warning("Каскад жүктелмеді (%s) – тек zero-shot", e)
+        return None
+    if set(model.labels) != set(get_tactic_labels()):
+        logger.warning("Каскад тактикалары лексиконмен сәйкес емес – қайта үйретіңіз (manage.py train_cascade)")
+    return model
+
+def active_cascade():
+    """get_cascade(), тек тактикалары ағымдағы лексиконмен сәйкес болса (лексикон қайта жүктелуі мүмкін)."""
+    model = get_cascade()
+    return model if model is not None and set(model.labels) == set(get_tactic_labels()) else None
+
+def cascade_threshold(model) -> float:
+    return float(CASCADE_THRESHOLD) if CASCADE_THRESHOLD else float(model.meta.get("threshold", 0.8))
+
+def cascade_tactic(text: str):
+    """Каскад сенімді болса – дайын тактика нәтижесі, әйтпесе None (мәтін zero-shot-қа кетеді)."""
+    model = active_cascade()
+    if model is None:
+        return None
+    with timed("cascade"):
+        out = model.classify(text)
+    if out["scores"][0] < cascade_threshold(model):
+        inc("polisent_cascade_total", outcome="escalated")
+        return None
+    inc("polisent_cascade_total", outcome="answered")
+    res = _format_zs(out, 4)
+    res["source"] = "cascade"
+    return res
+
+# --- Прототиптік тактика: бір мәтін эмбеддингі × барлық тактика векторлары (NLI-сіз)
+TACTIC_MODE = os.getenv("POLISENT_TACTIC_MODE", "nli").lower()
+PROTOTYPES_PATH = os.getenv(
+    "POLISENT_PROTOTYPES_PATH",
+    str(Path(getattr(settings, "BASE_DIR", ".")) / "data" / "tactic_prototypes.npz")
+)
+
+# get_text_encoder() NLI_BACKEND-ке қарамай torch моделін жүктейді – прототип нұсқасына жазылады
+TEXT_ENCODER_BACKEND = "torch"
 
-def classify_tactic_zero_shot(text: str):
+@lru_cache(maxsize=1)
+def get_text_encoder():
+    """get_clf() моделінің энкодері (ONNX backend болса да torch моделі жүктеледі)."""
+    return TextEncoder.from_pipeline(get_clf())
+
+@lru_cache(maxsize=1)
+def get_tactic_prototypes():
+    """POLISENT_TACTIC_MODE=prototype болса – `manage.py build_tactic_prototypes` артефакты, әйтпесе None."""
+    if TACTIC_MODE != "prototype":
+        return None
+    if not Path(PROTOTYPES_PATH).exists():
+        logger.warning("Прототип артефакты жоқ: %s (manage.py build_tactic_prototypes) – NLI қолданылады",
+                       PROTOTYPES_PATH)
+        return None
+    try:
+        protos = TacticPrototypes.load(PROTOTYPES_PATH)
+    except Exception as e:
+        logger.warning("Прототиптер жүктелмеді (%s) – NLI қолданылады", e)
+        return None
+    if protos.meta.get("model") not in (None, source_digest(MODEL_DIR)):
+        logger.warning("Прототиптер басқа модельмен кодталған – build_tactic_prototypes қайта іске қосыңыз")
+        return None
+    missing = [l for l in get_tactic_labels() if l not in protos.labels]
+    if missing:
+        logger.warning("Прототипі жоқ тактикалар: %s – build_tactic_prototypes қайта іске қосыңыз", missing)
+    return protos
+
+_STALE_PROTOS = set()
+
+def active_prototypes():
+    """get_tactic_prototypes(), тек ағымдағы лексикон нұсқасынан құрылып, оның барлық тактикасын қамтыса."""
+    protos = get_tactic_prototypes()
+    if protos is None:
+        return None
+    built, current = protos.meta.get("lexicon"), registry.version("lexicon")
+    if built is not None and built != current:
+        # лексикон қайта жүктелді – тактика атаулары өзгермесе де терминдері басқа
+        if current not in _STALE_PROTOS:
+            _STALE_PROTOS.add(current)
+            logger.warning("Прототиптер лексиконның басқа нұсқасынан (%s, ағымдағы %s) – NLI қолданылады; "
+                           "build_tactic_prototypes қайта іске қосыңыз", built, current)
+        return None
+    if any(l not in protos.labels for l in get_tactic_labels()):
+        return None
+    return protos
+
+def prototype_tactics(texts):
+    """Мәтіндер тізімі -> тактика нәтижелері (бір batch кодтау); прототиптер сөндірулі болса None."""
+    protos = active_prototypes()
+    if protos is None:
+        return None
+    with timed("tactic_prototype"):
+        outs = protos.classify(get_text_encoder().encode(texts), get_tactic_labels())
+    results = []
+    for o in outs:
+        res = _format_zs(o, 4)
+        res["source"] = "prototype"
+        res["similarity"] = o["similarities"][0]
+        results.append(res)
+    return results
+
+def classify_tactic_zero_shot(text: str, zs_out=None):
     """
     Zero-shot арқылы тактиканы анықтау.
-    MODEL/PIPELINE сіздегі get_clf() арқылы жүктеледі (негізгі кодқа тимейміз).
+    zs_out – analyze_document() бір batch-те алдын ала есептеген шығыс (немесе қате);
+    берілмесе, алдымен каскад қаралады.
     """
     labels = get_tactic_labels()
     if not labels:
         return {"label": "", "score": 0.0, "alternatives": [], "warning": "Тактика тізімі бос"}
 
-    # НАЗАР: zero-shot үшін гипотезада {label} плейсхолдері болуы керек
-    hypothesis = "Бұл мәтінде {} тактикасы қолданылған."
-
     try:
-        clf = get_clf()  # сіздің бар pipeline
-        out = clf(text, labels, hypothesis_template=hypothesis, multi_label=False)
-        return {
-            "label": out["labels"][0],
-            "score": float(out["scores"][0]),
-            "alternatives": [
-                {"label": l, "score": float(s)} for l, s in zip(out["labels"][1:5], out["scores"][1:5])
-            ],
-            "warning": None,
-        }
+        if isinstance(zs_out, Exception):
+            raise zs_out
+        if zs_out is None:
+            res = cascade_tactic(text)
+            if res is not None:
+                return res
+            if active_prototypes() is not None:
+                return prototype_tactics([text])[0]
+            with timed("tactic_zero_shot"):
+                zs_out = get_nli_runner().classify([tactic_task(text)])[0]
+        res = _format_zs(zs_out, 4)
+        if len(zs_out["labels"]) < len(labels):
+            res["candidates"] = [l for l in labels if l in zs_out["labels"]]   # лексикон сүзгісінен өткендер
+        return res
     except Exception as e:
+        inc("polisent_fallback_total", reason="tactic")
         return {"label": "", "score": 0.0, "alternatives": [], "warning": f"ZS қате: {e}"}
 
 def _fallback(text, task):
@@ -137,6 +360,10 @@ from pathlib import Path
 
 MODEL_DIR = Path(__file__).resolve().parent.parent / "hf" / "xnli_mdl"
 TOKENIZER_DIR = Path(__file__).resolve().parent.parent / "hf" / "xnli_tok"
+# torch | onnx (int8) | onnx-fp32; ONNX файлдарын `manage.py export_onnx` шығарады
+NLI_BACKEND = os.getenv("POLISENT_NLI_BACKEND", "torch").lower()
+ONNX_DIR = Path(os.getenv("POLISENT_ONNX_DIR", str(MODEL_DIR.parent / "xnli_onnx")))
+ONNX_THREADS = int(os.getenv("POLISENT_ONNX_THREADS", "0"))
 
 @lru_cache(maxsize=1)
 def get_clf():
@@ -144,6 +371,51 @@ def get_clf():
     # CPU-ға мәжбүрлейміз — Mac MPS кейде оп-ларды қолдамай, құлатады
     device = -1   # CPU
     return pipeline("zero-shot-classification", model=str(MODEL_DIR), tokenizer=tok, device=device)
+
+def _onnx_engine():
+    from transformers import AutoConfig
+    from .onnx_backend import build_onnx_engine, read_meta, resolve_model_path
+    path = resolve_model_path(ONNX_DIR, quantized=NLI_BACKEND != "onnx-fp32")
+    meta = read_meta(ONNX_DIR)
+    if meta.get("source_digest") not in (None, source_digest(MODEL_DIR)):
+        logger.warning("ONNX моделі %s-тен ескі нұсқадан экспортталған; export_onnx қайта іске қосыңыз", MODEL_DIR)
+    tok = AutoTokenizer.from_pretrained(str(TOKENIZER_DIR))
+    return build_onnx_engine(tok, AutoConfig.from_pretrained(str(MODEL_DIR)), path, threads=ONNX_THREADS,
+                             backend=NLI_BACKEND)
+
+@lru_cache(maxsize=1)
+def get_nli_engine():
+    """get_clf() моделін batched NLI қозғалтқышына орау (бір модель, бір жүктеу)."""
+    with timed("model_load"):
+        if NLI_BACKEND.startswith("onnx"):
+            try:
+                return _onnx_engine()
+            except Exception as e:
+                logger.warning("ONNX backend қолжетімсіз (%s) – torch pipeline қолданылады", e)
+        return NLIEngine.from_pipeline(get_clf())
+
+def nli_backend():
+    """Кэш кілтіне: нақты жүктелген backend (ONNX жүктелмесе get_nli_engine() torch-қа түседі)."""
+    if not NLI_BACKEND.startswith("onnx"):
+        return "torch"
+    try:
+        return get_nli_engine().backend
+    except Exception:
+        # модель мүлде жүктелмеді – нәтижелер фолбэк ескертуімен, кэшке жазылмайды
+        return NLI_BACKEND
+
+NLI_SCHEDULER = os.getenv("POLISENT_NLI_SCHEDULER", "1") == "1"
+
+@lru_cache(maxsize=1)
+def get_nli_runner():
+    """
+    Ұзын мәтінді терезелерге бөлу (POLISENT_NLI_WINDOWS) + қатар сұраулардың жұптарын
+    бір batch-ке жинайтын жоспарлаушы (POLISENT_NLI_SCHEDULER=0 – тікелей engine).
+    """
+    engine = get_nli_engine()
+    runner = NLIScheduler(engine) if NLI_SCHEDULER else engine
+    return WindowedClassifier(runner, engine)
+
 def _is_candidate_speech(d: str) -> bool:
     d = (d or "").lower()
     return d in {"candidate_speech", "speech", "саяси қайраткер сөзі", "үміткер сөзі"} or "speech" in d
@@ -151,38 +423,49 @@ def _is_candidate_speech(d: str) -> bool:
 def _is_debate(d: str) -> bool:
     d = (d or "").lower()
     return d in {"debate", "сайлауалды пікірсайыс"} or "debate" in d
-def analyze_text(text, domain, source, task):
+def base_task(text, domain, source, task):
+    labels = EMOTIONS if task == "emotion" else SENTIMENT
+    hyp = f"Бұл {{}} екенін көрсетеді. Мәтін {source} дерек көзінен және '{domain}' доменінен."
+    return NLITask(text, labels, hyp)
+
+RULES_ONLY_WARNING = "Ереже режимі: ML модель шақырылмады (use_model=false) – лексикон/ереже бағасы."
+
+def analyze_text(text, domain, source, task, zs_out=None, use_model=True, ctx=None):
     """
     Негізгі анализ:
     - Zero-shot (немесе фолбэк) => label/score
+      (zs_out берілсе – analyze_document() есептеген batch шығысы қолданылады)
     - Егер domain == campaign_ad болса:
         * regex + OWL (classes & facts) арқылы матчтар
         * онтология приоры (hasPolarity) және device санағы
         * fusion -> финалдық label/score (sentiment task-та)
     Қайтарым құрылымы алдыңғыдай, тек result["campaign"] қосылады.
+    ctx – осы мәтіннің DocContext-і (analyze_documents тактикамен ортақ қолданады).
     """
-    # 1) Базалық жіктеу (zero-shot немесе фолбэк)
-    labels = EMOTIONS if task == "emotion" else SENTIMENT
-    hyp = f"Бұл {{}} екенін көрсетеді. Мәтін {source} дерек көзінен және '{domain}' доменінен."
-    print(domain)
-    try:
-        clf = get_clf()  # кэштелген pipeline
-        out = clf(text, labels, hypothesis_template=hyp, multi_label=False)
-        base = {
-            "label": out["labels"][0],
-            "score": float(out["scores"][0]),
-            "alternatives": [
-                {"label": l, "score": float(s)}
-                for l, s in zip(out["labels"][1:4], out["scores"][1:4])
-            ],
-            "warning": None,
-        }
-    except Exception as e:
-        print("ML load/infer error:", repr(e))
-        base = _fallback(text, task)  # {"label","score","alternatives","warning"}
+    # Бір құжатқа ортақ контекст: онтология/regex/сөйлемдер бір рет есептеледі
+    ctx = ctx if ctx is not None else DocContext(text)
+    # 1) Базалық жіктеу (zero-shot немесе фолбэк; use_model=False – тек фолбэк, модель пулы бос емес кезде)
+    if not use_model:
+        with timed("fallback"):
+            base = _fallback(text, task)
+        base["warning"] = RULES_ONLY_WARNING
+    else:
+        try:
+            if isinstance(zs_out, Exception):
+                raise zs_out
+            if zs_out is None:
+                with timed("nli"):
+                    zs_out = get_nli_runner().classify([base_task(text, domain, source, task)])[0]
+            base = _format_zs(zs_out, 3)
+        except Exception as e:
+            logger.warning("ML load/infer error: %s", str(e).splitlines()[0] if str(e) else repr(e))
+            inc("polisent_fallback_total", reason="nli")
+            with timed("fallback"):
+                base = _fallback(text, task)  # {"label","score","alternatives","warning"}
 
     if _is_candidate_speech(domain):
-        sp = analyze_speech(text)
+        with timed("speech"):
+            sp = analyze_speech(text, ctx)
         base["speech"] = sp
         # Fusion/қорытынды: егер нысана бойынша жиынтық теріс/оң басым болса, жалпы реңкке әсер етеміз
         pos_votes = sum(1 for s in sp["stance"] if s["label"]=="оң")
@@ -194,8 +477,8 @@ def analyze_text(text, domain, source, task):
                 base["label"], base["score"] = "теріс", max(base["score"], 0.70)
 
     if _is_debate(domain):
-        print(domain)
-        db = analyze_debate(text)
+        with timed("debate"):
+            db = analyze_debate(text, ctx)
         base["debate"] = db
         # Fusion/қорытынды: спикерлер бойынша теріс реплика саны көп болса — теріске тартады
         neg = sum(t["sentiment"]=="теріс" for t in db["turns"])
@@ -217,8 +500,9 @@ def analyze_text(text, domain, source, task):
                 post_fusion,                    # fusion: rules + ontology prior
             )
 
-            pack = detect_campaign_with_ontology(text)  # {'rx_hits','onto_hits','devices','rule_pred','onto_prior'}
-            fused_label, fused_score = post_fusion(base["label"], base["score"], pack)
+            with timed("campaign"):
+                pack = detect_campaign_with_ontology(text, ctx)  # {'rx_hits','onto_hits','devices','rule_pred','onto_prior'}
+                fused_label, fused_score = post_fusion(base["label"], base["score"], pack)
             # UI үшін дәлелдер мен есеп
             base["campaign"] = {
                 "devices": pack.get("devices", {}),
@@ -236,29 +520,445 @@ def analyze_text(text, domain, source, task):
                 base["label"], base["score"] = fused_label, fused_score
 
         except ImportError as ie:
-            print(ie)
+            logger.warning("Онтология интеграциясы сөнді: %s", ie)
+            inc("polisent_fallback_total", reason="ontology_import")
             # rdflib немесе модульдер орнатылмаған
             w = "Онтология интеграциясы сөнді: тәуелділік жоқ (rdflib/модуль)."
             base["warning"] = f"{base.get('warning') + '; ' if base.get('warning') else ''}{w}"
         except Exception as e:
             # Онтологияны оқу/парс қателері
+            logger.warning("Онтология интеграция қателігі: %s", e)
+            inc("polisent_fallback_total", reason="ontology_error")
             w = f"Онтология интеграция қателігі: {e}"
             base["warning"] = f"{base.get('warning') + '; ' if base.get('warning') else ''}{w}"
 
     return base
 
+# --- Нәтиже кэші: мәтін хэші + тапсырма + домен + дерек көзі + ресурс нұсқалары
+RESULT_SCHEMA = "6"   # нәтиже құрылымы өзгерсе – көтеріңіз
+RESULT_CACHE_PATH = os.getenv(
+    "POLISENT_CACHE_PATH",
+    str(Path(getattr(settings, "BASE_DIR", ".")) / "cache" / "results.sqlite3")
+)
+
+@lru_cache(maxsize=1)
+def get_result_cache():
+    """POLISENT_CACHE=0 болса кэш сөнеді; POLISENT_CACHE_PATH="" – тек жад деңгейі."""
+    if os.getenv("POLISENT_CACHE", "1") == "0":
+        return None
+    cache = ResultCache(
+        RESULT_CACHE_PATH or None,
+        mem_items=int(os.getenv("POLISENT_CACHE_MEM_ITEMS", "2048")),
+        max_bytes=int(os.getenv("POLISENT_CACHE_MAX_MB", "256")) * 1024 * 1024,
+    )
+    register_collector(_cache_metrics)
+    return cache
+
+def _cache_metrics():
+    st = get_result_cache().stats()
+    yield "polisent_cache_lookups_total", "counter", {"result": "mem_hit"}, st["mem_hits"]
+    yield "polisent_cache_lookups_total", "counter", {"result": "disk_hit"}, st["disk_hits"]
+    yield "polisent_cache_lookups_total", "counter", {"result": "miss"}, st["misses"]
+    yield "polisent_cache_evictions_total", "counter", {}, st["evictions"]
+    yield "polisent_cache_hit_ratio", "gauge", {}, st["hit_rate"]
+    yield "polisent_cache_disk_bytes", "gauge", {}, st["disk_bytes"]
+
+def _cascade_version():
+    model = active_cascade()
+    return f"{model.version}@{cascade_threshold(model)}" if model is not None else "off"
+
+@lru_cache(maxsize=1)
+def _static_versions():
+    return {
+        "model": source_digest(MODEL_DIR),
+        "windows": f"{nli_windows.WINDOW_MODE}:{nli_windows.WINDOW_POOLING}:"
+                   f"{nli_windows.WINDOW_TOKENS}:{nli_windows.WINDOW_OVERLAP}",
+        "match": f"stem:{STEM_VERSION}" if MATCH_MODE == "stem" else MATCH_MODE,
+        "prune": f"{TACTIC_TOPK}:{','.join(TACTIC_ALWAYS)}:{TACTIC_MIN_EVIDENCE}",
+        "schema": RESULT_SCHEMA,
+    }
+
+def cache_versions():
+    """Кэш кілтіндегі ресурс нұсқалары; ontology/lexicon – индекс реестрінің (сұрауға бекітілген) нұсқалары."""
+    protos = active_prototypes()
+    return {
+        **_static_versions(),
+        **registry.versions(),
+        "backend": nli_backend(),
+        "cascade": _cascade_version(),
+        "tactic": f"prototype:{protos.version}@{TEXT_ENCODER_BACKEND}" if protos is not None else "nli",
+    }
+
+@registry.pinned()   # бір сұрау бойы лексикон/онтология нұсқасы өзгермейді
+def analyze_documents(docs):
+    """
+    Құжаттар тізіміне толық анализ. docs: [{"text","domain","source","task","tactic"?,"use_model"?}].
+    use_model=False құжаттар модельге жіберілмейді: кэште жоқ болса – фолбэк + лексикон тактикасы.
+    Алдымен кэш қаралады, қалған құжаттардың sentiment/emotion және тактика жұптары
+    NLIEngine-ге бір шақыруда беріледі (бірдей тапсырмалар бір рет есептеледі),
+    содан кейін ережелік бөліктер жүреді. Ескертуі бар (фолбэк/қате) нәтижелер кэшке жазылмайды.
+    """
+    cache = get_result_cache()
+    vers = cache_versions() if cache is not None else None
+    index_versions = registry.versions()
+    protos = active_prototypes() if any(d.get("tactic", True) for d in docs) else None
+    tasks, task_pos, plans = [], {}, []
+
+    def _schedule(t):
+        k = (t.premise, tuple(t.labels), t.hypothesis_template)
+        if k not in task_pos:
+            task_pos[k] = len(tasks)
+            tasks.append(t)
+        return task_pos[k]
+
+    for d in docs:
+        # span-дар клиент жіберген мәтін бойынша болуы үшін анализ бастапқы мәтінмен жүреді;
+        # қалыпқа келтірілген мәтін тек офсетсіз тактика нәтижесіне (кілт + жіктеу) қолданылады
+        raw, text = d["text"], normalize_text(d["text"])
+        # лексикон токендері бір рет; мәтін қалыпқа келтіруден өзгермесе – ережелік бөліктермен ортақ
+        p = {"raw": raw, "text": text, "ctx": DocContext(text), "domain": d["domain"], "source": d["source"], "task": d["task"],
+             "tactic": d.get("tactic", True), "model": d.get("use_model", True),
+             "base": None, "tac": None, "bi": None, "ti": None}
+        if cache is not None:
+            p["bkey"] = cache.key(raw, "analyze", p["domain"], p["source"], p["task"], vers)
+            p["tkey"] = cache.key(text, "tactic", "", "", "", vers)
+            p["base"] = cache.get(p["bkey"])
+            p["tac"] = cache.get(p["tkey"]) if p["tactic"] else None
+        if p["base"] is None and p["model"]:
+            p["bi"] = _schedule(base_task(raw, p["domain"], p["source"], p["task"]))
+        if p["tactic"] and p["tac"] is None:
+            p["tac"] = cascade_tactic(text)
+            if p["tac"] is not None and cache is not None:
+                cache.set(p["tkey"], p["tac"])
+            if p["tac"] is None and not p["model"]:
+                p["tac"] = lexicon_tactic(text, p["ctx"])   # кэшке жазылмайды
+            if p["tac"] is None and protos is not None:
+                p["proto"] = True
+            t_task = tactic_task(text, p["ctx"]) if p["tac"] is None and not p.get("proto") else None
+            if t_task is not None:
+                p["ti"] = _schedule(t_task)
+        plans.append(p)
+
+    outs = []
+    inc("polisent_documents_total", len(docs))
+    if tasks:
+        try:
+            engine = get_nli_runner()
+            with timed("nli_batch"):
+                outs = engine.classify(tasks)
+        except Exception as e:
+            outs = [e] * len(tasks)
+
+    proto_plans = [p for p in plans if p.get("proto")]
+    if proto_plans:
+        try:
+            for p, tac in zip(proto_plans, prototype_tactics([p["text"] for p in proto_plans])):
+                p["tac"] = tac
+                if cache is not None:
+                    cache.set(p["tkey"], tac)
+        except Exception as e:
+            for p in proto_plans:
+                p["tac"] = classify_tactic_zero_shot(p["text"], zs_out=e)
+
+    results = []
+    for p in plans:
+        base = p["base"]
+        if base is None:
+            with timed("analyze_text"):
+                base = analyze_text(p["raw"], p["domain"], p["source"], p["task"],
+                                    zs_out=outs[p["bi"]] if p["bi"] is not None else None, use_model=p["model"],
+                                    ctx=p["ctx"] if p["raw"] == p["text"] else None)
+            if cache is not None and not base.get("warning"):
+                cache.set(p["bkey"], base)
+        if p["tactic"]:
+            tac = p["tac"]
+            if tac is None:
+                tac = classify_tactic_zero_shot(p["text"], zs_out=outs[p["ti"]] if p["ti"] is not None else None)
+                if cache is not None and not tac.get("warning"):
+                    cache.set(p["tkey"], tac)
+            base["tactic_zero_shot"] = tac
+        base["index_versions"] = index_versions
+        results.append(base)
+    return results
+
+def analyze_document(text, domain, source, task, tactic=True):
+    return analyze_documents([{"text": text, "domain": domain, "source": source,
+                               "task": task, "tactic": tactic}])[0]
+
 def analyzer_view(request):
     ctx = {"result": None, "error": None, "form": AnalyzerForm()}
     if request.method == "POST":
+        inc("polisent_requests_total", endpoint="form")
         form = AnalyzerForm(request.POST)
         ctx["form"] = form
         if form.is_valid():
             cd = form.cleaned_data
-            base = analyze_text(cd["text"], cd["domain"], cd["source"], cd["task"])
+            # sentiment/emotion + zero-shot тактика бір batch-те
+            ctx["result"] = analyze_document(cd["text"], cd["domain"], cd["source"], cd["task"])
+    return render(request, "form.html", ctx)
+
+
+# --- JSON batch API: бір сұраумен көп құжат
+API_MAX_DOCS = int(os.getenv("POLISENT_API_MAX_DOCS", "256"))
+FORM_DEFAULTS = {k: f.initial for k, f in AnalyzerForm.base_fields.items() if f.initial is not None}
 
-            # --- ADD: Zero-shot арқылы тактика классификациясы
-            base["tactic_zero_shot"] = classify_tactic_zero_shot(cd["text"])
+def _json(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={"ensure_ascii": False})
 
-            ctx["result"] = base
+def _json_flag(container, name, default):
+    """JSON boolean ғана (true/false); "false"/"0" сияқты жолдар ValueError – үнсіз true болып кетпеуі үшін."""
+    value = container.get(name, default)
+    if not isinstance(value, bool):
+        raise ValueError(f"{name} – JSON boolean (true/false) болуы керек, берілгені: {value!r}")
+    return value
+
+def parse_api_documents(request):
+    """
+    Денесі: {"documents": [{"id"?, "text", "domain"?, "source"?, "task"?, "tactic"?, "use_model"?}, ...],
+             "domain"?, "source"?, "task"?, "tactic"?, "use_model"?}  (немесе жай тізім).
+    Қайтарым: (docs, results, error_response) – docs: [(index, id, doc)], results: қате жолдары толтырылған тізім.
+    """
+    try:
+        payload = json.loads(request.body.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError) as e:
+        return None, None, _json({"error": f"JSON оқылмады: {e}"}, status=400)
+    items = payload.get("documents") if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not items:
+        return None, None, _json({"error": "documents – бос емес тізім болуы керек"}, status=400)
+    if len(items) > API_MAX_DOCS:
+        return None, None, _json({"error": f"Бір сұраудағы құжат саны {API_MAX_DOCS}-тен аспауы керек"}, status=413)
+
+    defaults = dict(FORM_DEFAULTS)
+    default_tactic = default_model = True
+    if isinstance(payload, dict):
+        defaults.update({k: payload[k] for k in ("domain", "source", "task") if k in payload})
+        try:
+            default_tactic = _json_flag(payload, "tactic", True)
+            default_model = _json_flag(payload, "use_model", True)
+        except ValueError as e:
+            return None, None, _json({"error": str(e)}, status=400)
+
+    docs, results = [], [None] * len(items)
+    for i, item in enumerate(items):
+        if isinstance(item, str):
+            item = {"text": item}
+        if not isinstance(item, dict):
+            results[i] = {"id": i, "errors": {"__all__": ["Құжат объект немесе мәтін болуы керек"]}}
+            continue
+        doc_id = item.get("id", i)
+        form = AnalyzerForm({**defaults, **{k: item[k] for k in ("text", "domain", "source", "task") if k in item}})
+        if not form.is_valid():
+            results[i] = {"id": doc_id, "errors": form.errors.get_json_data()}
+            continue
+        doc = dict(form.cleaned_data)
+        try:
+            doc["tactic"] = _json_flag(item, "tactic", default_tactic)
+            # use_model=false – backpressure кезіндегі модельсіз жол; "false" жолы оны үнсіз айналып өтпесін
+            doc["use_model"] = _json_flag(item, "use_model", default_model)
+        except ValueError as e:
+            return None, None, _json({"error": f"documents[{i}]: {e}"}, status=400)
+        docs.append((i, doc_id, doc))
+    return docs, results, None
+
+@csrf_exempt
+@require_POST
+def analyze_api(request):
+    inc("polisent_requests_total", endpoint="api")
+    docs, results, error = parse_api_documents(request)
+    if error is not None:
+        return error
+    outs = analyze_documents([d for _, _, d in docs]) if docs else []
+    for (i, doc_id, _), res in zip(docs, outs):
+        results[i] = {"id": doc_id, "result": res}
+    return _json({"count": len(results), "results": results})
+
+# --- Async нұсқалар (ASGI): модель жұмысы шектеулі пулда, толы болса 429/503 бірден
+def _saturated(e, html_request=None):
+    if html_request is not None:
+        ctx = {"result": None, "error": str(e), "form": AnalyzerForm(html_request.POST)}
+        resp = render(html_request, "form.html", ctx, status=e.status)
+    else:
+        resp = _json({"error": str(e)}, status=e.status)
+    resp["Retry-After"] = str(e.retry_after)
+    return resp
+
+async def _run_analysis(docs):
+    """Модель керек құжаттар – inference пулында; тек ереже режиміндегілер – әдепкі executor-да (пулды күтпейді)."""
+    if any(d.get("use_model", True) for d in docs):
+        return await get_pool().run(analyze_documents, docs)
+    return await asyncio.get_running_loop().run_in_executor(None, analyze_documents, docs)
+
+async def analyzer_view_async(request):
+    ctx = {"result": None, "error": None, "form": AnalyzerForm()}
+    if request.method == "POST":
+        inc("polisent_requests_total", endpoint="form_async")
+        form = AnalyzerForm(request.POST)
+        ctx["form"] = form
+        if form.is_valid():
+            cd = form.cleaned_data
+            try:
+                ctx["result"] = (await _run_analysis([{**cd, "tactic": True}]))[0]
+            except Saturated as e:
+                return _saturated(e, html_request=request)
     return render(request, "form.html", ctx)
 
+@csrf_exempt
+@require_POST
+async def analyze_api_async(request):
+    inc("polisent_requests_total", endpoint="api_async")
+    docs, results, error = parse_api_documents(request)
+    if error is not None:
+        return error
+    try:
+        outs = await _run_analysis([d for _, _, d in docs]) if docs else []
+    except Saturated as e:
+        return _saturated(e)
+    for (i, doc_id, _), res in zip(docs, outs):
+        results[i] = {"id": doc_id, "result": res}
+    return _json({"count": len(results), "results": results})
+
+# --- Тікелей пікірсайыс сессиялары: өскен стенограммада тек жаңа/өзгерген репликалар талданады,
+# өзгерістер (delta) SSE арқылы таратылады. Модель шақырылмайды (debate_rules – ережелер).
+DEBATE_HEARTBEAT = float(os.getenv("POLISENT_DEBATE_HEARTBEAT", "15"))
+
+def _debate_body(request):
+    """Денесі: {"text": толық стенограмма} немесе {"append": жаңа жолдар}; бос дене – {}."""
+    if not request.body:
+        return {}, None
+    try:
+        payload = json.loads(request.body.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError) as e:
+        return None, _json({"error": f"JSON оқылмады: {e}"}, status=400)
+    if not isinstance(payload, dict) or any(not isinstance(payload.get(k, ""), str) for k in ("text", "append")):
+        return None, _json({"error": "text/append – жол болуы керек"}, status=400)
+    return payload, None
+
+def _debate_apply(session, payload):
+    try:
+        if "text" in payload:
+            return session.update(payload["text"]), None
+        if "append" in payload:
+            return session.append(payload["append"]), None
+    except ValueError as e:
+        return None, _json({"error": str(e)}, status=409 if session.closed else 413)
+    return None, None
+
+@csrf_exempt
+@require_POST
+def debate_sessions_api(request):
+    """Жаңа сессия; денеде text болса – бірден талданады. Қайтарым: snapshot (+ delta)."""
+    inc("polisent_requests_total", endpoint="debate_session")
+    payload, error = _debate_body(request)
+    if error is not None:
+        return error
+    session = debate_sessions.create()
+    _, error = _debate_apply(session, payload)
+    if error is not None:
+        debate_sessions.close(session.id)
+        return error
+    return _json(session.snapshot(), status=201)
+
+@csrf_exempt
+def debate_session_api(request, session_id):
+    """GET – snapshot, POST – жаңарту (delta қайтарылады), DELETE – жабу."""
+    inc("polisent_requests_total", endpoint="debate_session")
+    session = debate_sessions.get(session_id)
+    if session is None:
+        return _json({"error": "Сессия табылмады"}, status=404)
+    if request.method == "GET":
+        return _json(session.snapshot())
+    if request.method == "DELETE":
+        debate_sessions.close(session_id)
+        return HttpResponse(status=204)
+    if request.method != "POST":
+        return HttpResponse(status=405, headers={"Allow": "GET, POST, DELETE"})
+    payload, error = _debate_body(request)
+    if error is not None:
+        return error
+    delta, error = _debate_apply(session, payload)
+    if error is not None:
+        return error
+    if delta is None:
+        return _json({"error": "text немесе append керек"}, status=400)
+    return _json(delta)
+
+def _sse(event, data, event_id=None):
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _sse_frames(session, seq, events, reset):
+    """(кадрлар, жаңа seq, ағын бітті ме)."""
+    if reset:
+        snap = session.snapshot()
+        return [_sse("snapshot", snap, snap["seq"])], snap["seq"], snap["closed"]
+    if not events:
+        return [": ping\n\n"], seq, False
+    frames = []
+    for d in events:
+        frames.append(_sse("closed" if d.get("closed") else "delta", d, d["seq"]))
+        seq = d["seq"]
+        if d.get("closed"):
+            return frames, seq, True
+    return frames, seq, False
+
+def _sse_start(request, session):
+    """Last-Event-ID (немесе ?since=) болса – содан кейінгі delta-лар, болмаса алдымен snapshot."""
+    since = request.headers.get("Last-Event-ID") or request.GET.get("since")
+    try:
+        return int(since), False
+    except (TypeError, ValueError):
+        return session.seq, True
+
+def _sse_response(stream):
+    resp = StreamingHttpResponse(stream, content_type="text/event-stream; charset=utf-8")
+    resp["Cache-Control"] = "no-cache"
+    resp["X-Accel-Buffering"] = "no"   # nginx буферлемесін
+    return resp
+
+def debate_events(request, session_id):
+    """SSE: WSGI астында әр клиент бір worker ағынын ұстайды (ASGI-де – debate_events_async)."""
+    session = debate_sessions.get(session_id)
+    if session is None:
+        return _json({"error": "Сессия табылмады"}, status=404)
+    seq, reset = _sse_start(request, session)
+
+    def stream():
+        nonlocal seq, reset
+        while True:
+            events, need_reset = ([], True) if reset else session.wait(seq, DEBATE_HEARTBEAT)
+            frames, seq, done = _sse_frames(session, seq, events, need_reset)
+            reset = False
+            yield from frames
+            if done:
+                return
+    return _sse_response(stream())
+
+async def debate_events_async(request, session_id):
+    session = debate_sessions.get(session_id)
+    if session is None:
+        return _json({"error": "Сессия табылмады"}, status=404)
+    seq, reset = _sse_start(request, session)
+
+    async def stream():
+        nonlocal seq, reset
+        while True:
+            events, need_reset = ([], True) if reset else await session.wait_async(seq, DEBATE_HEARTBEAT)
+            frames, seq, done = _sse_frames(session, seq, events, need_reset)
+            reset = False
+            for f in frames:
+                yield f
+            if done:
+                return
+    return _sse_response(stream())
+
+# --- Prometheus метрикалары (процесс ішіндегі; POLISENT_METRICS=0 болса сөнеді)
+def metrics_view(request):
+    if os.getenv("POLISENT_METRICS", "1") == "0":
+        return HttpResponse(status=404)
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+# --- Дайындық: warm-up аяқталғанша 503 (load balancer суық worker-ге жібермейді)
+def ready_view(request):
+    from .warmup import readiness
+    ok, state = readiness()
+    return _json(state, status=200 if ok else 503)
@@ -0,0 +1,178 @@
+# analyzer/discourse/warmup.py
+"""
+Ресурстарды алдын ала жүктеу (warm-up) және дайындық күйі (/ready).
+
+DiscourseConfig.ready() start_warmup()-ты шақырады: лексикон, тактика тізімі, онтология,
+regex сканері, NLI моделі бір рет жүктеліп, қалауыңызша сынақ inference жасалады
+(буферлер мен ядролар алдын ала бөлінеді). Осы аяқталғанша /ready 503 қайтарады.
+
+  POLISENT_WARMUP            background (әдепкі) | sync | off
+  POLISENT_WARMUP_INFERENCE  сынақ inference саны (әдепкі 1; 0 – өткізіп жіберу)
+  POLISENT_READY_ALLOW_DEGRADED  1 болса, қадам құласа да (мыс. модель жоқ – фолбэк нәтижелер)
+                             /ready 200; әдепкі – барлық ресурс жүктелгенше және қате болса 503
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from .metrics import register_collector, timed
+
+logger = logging.getLogger(__name__)
+
+WARMUP_MODE = os.getenv("POLISENT_WARMUP", "background").lower()
+WARMUP_INFERENCE = int(os.getenv("POLISENT_WARMUP_INFERENCE", "1"))
+READY_ALLOW_DEGRADED = os.getenv("POLISENT_READY_ALLOW_DEGRADED", "0") == "1"
+
+# сервер емес manage.py командаларында (migrate, analyze_corpus т.б.) warm-up жүрмейді
+SERVER_COMMANDS = {"runserver", "runserver_plus"}
+
+_lock = threading.Lock()
+_state: Dict = {"status": "cold", "pid": None, "steps": {}, "started": None, "finished": None}
+
+
+def _step_lexicon():
+    from . import views
+    from .pd_analyzer import _cue_trie
+    views.get_pd_index().compiled()
+    _cue_trie()
+
+
+def _step_tactics():
+    from . import views
+    views.get_tactic_labels()
+    views.get_cascade()
+    views.get_tactic_prototypes()
+
+
+def _step_ontology():
+    from .onto_runtime import build_label_matcher, get_onto
+    get_onto()
+    build_label_matcher()
+
+
+def _step_rules():
+    from .campaign_onto_rules import detect_regex
+    from .speech_rules import analyze_speech
+    detect_regex("Біз жалақыны көтереміз!")
+    analyze_speech("Біз жалақыны көтереміз. Сіз өтірік айтасыз?")
+
+
+def _step_cache():
+    from . import views
+    views.get_result_cache()
+    views.cache_versions()
+
+
+def _step_model():
+    from . import views
+    views.get_nli_engine()
+
+
+def _step_inference():
+    from . import views
+    engine = views.get_nli_runner()
+    d = views.FORM_DEFAULTS
+    short = "Біз салықты азайтып, жалақыны көтереміз."
+    # ең ұзын пішінді де бір рет өткіземіз – padding буферлері алдын ала бөлінеді
+    long = " ".join([short] * 200)
+    tasks = [views.base_task(t, d["domain"], d["source"], d["task"]) for t in (short, long)]
+    t_task = views.tactic_task(short)
+    if t_task is not None:
+        tasks.append(t_task)
+    for _ in range(WARMUP_INFERENCE):
+        engine.classify(tasks)
+
+
+def steps() -> List[Tuple[str, Callable[[], None]]]:
+    out = [("lexicon", _step_lexicon), ("tactics", _step_tactics), ("ontology", _step_ontology),
+           ("rules", _step_rules), ("cache", _step_cache), ("model", _step_model)]
+    if WARMUP_INFERENCE > 0:
+        out.append(("inference", _step_inference))
+    return out
+
+
+def run_warmup() -> Dict:
+    """Барлық қадамдарды ретімен орындау; бір қадамның қатесі қалғандарын тоқтатпайды."""
+    with _lock:
+        _state.update(status="warming", pid=os.getpid(), steps={}, started=time.time(), finished=None)
+    failed = []
+    for name, fn in steps():
+        if name == "inference" and "model" in failed:
+            _record(name, {"ok": False, "seconds": 0.0, "error": "модель жүктелмеді"})
+            continue
+        t0 = time.perf_counter()
+        try:
+            with timed(f"warmup.{name}"):
+                fn()
+            _record(name, {"ok": True, "seconds": round(time.perf_counter() - t0, 3)})
+        except Exception as e:
+            failed.append(name)
+            msg = str(e).splitlines()[0] if str(e) else type(e).__name__
+            logger.warning("Warm-up: %s қадамы сәтсіз: %s", name, msg)
+            _record(name, {"ok": False, "seconds": round(time.perf_counter() - t0, 3), "error": msg})
+    with _lock:
+        _state["status"] = "degraded" if failed else "ready"
+        _state["finished"] = time.time()
+        logger.info("Warm-up аяқталды: %s (%.1f с)", _state["status"], _state["finished"] - _state["started"])
+        return dict(_state)
+
+
+def _record(name: str, info: Dict) -> None:
+    with _lock:
+        _state["steps"][name] = info
+
+
+def _should_run(argv=None) -> bool:
+    argv = sys.argv if argv is None else argv
+    if WARMUP_MODE == "off":
+        return False
+    if argv and os.path.basename(argv[0]) == "manage.py":
+        cmd = argv[1] if len(argv) > 1 else ""
+        if cmd not in SERVER_COMMANDS:
+            return False
+        # autoreloader-дің ата-процесі сұрау қабылдамайды – тек RUN_MAIN=true баласында
+        if "--noreload" not in argv and os.environ.get("RUN_MAIN") != "true":
+            return False
+    return True
+
+
+def start_warmup(force: bool = False) -> None:
+    """AppConfig.ready()-тен: background – жеке ағында, sync – осы жерде бітіргенше күтеді."""
+    if not force and not _should_run():
+        return
+    with _lock:
+        if _state["pid"] == os.getpid() and _state["status"] in ("warming", "ready", "degraded"):
+            return
+        _state.update(status="warming", pid=os.getpid())
+    register_collector(_ready_metrics)
+    if WARMUP_MODE == "sync":
+        run_warmup()
+    else:
+        threading.Thread(target=run_warmup, name="polisent-warmup", daemon=True).start()
+
+
+def readiness() -> Tuple[bool, Dict]:
+    """(дайын ба, күй). preload + fork жағдайында ағын жаңа процеске өтпейді – қайта іске қосамыз."""
+    with _lock:
+        state = {**_state, "steps": dict(_state["steps"])}
+    if WARMUP_MODE == "off":
+        return True, {**state, "status": "lazy"}
+    if state["pid"] != os.getpid() and state["status"] not in ("ready", "degraded"):
+        start_warmup(force=True)
+        return False, {**state, "status": "warming"}
+    return _is_ready(state), state
+
+
+def _is_ready(state: Dict) -> bool:
+    return state["status"] == "ready" or (state["status"] == "degraded" and READY_ALLOW_DEGRADED)
+
+
+def _ready_metrics():
+    with _lock:
+        state = {**_state, "steps": dict(_state["steps"])}
+    yield "polisent_ready", "gauge", {}, 1.0 if _is_ready(state) else 0.0
+    for name, info in state["steps"].items():
+        yield "polisent_warmup_step_ok", "gauge", {"step": name}, 1.0 if info.get("ok") else 0.0